@@ -2,25 +2,17 @@
 import sqlite3
 from datetime import datetime
 
+import migrations
+import query_stats
+
 print("--- Запуск скрипта инициализации Users ---")
 
-conn = sqlite3.connect('hotel.db')
+conn = query_stats.connect('hotel.db')
 cursor = conn.cursor()
 
 try:
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        login TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL CHECK(role IN ('Администратор', 'Пользователь')),
-        is_blocked INTEGER DEFAULT 0,
-        failed_attempts INTEGER DEFAULT 0,
-        last_login TEXT, -- Храним как TEXT в формате YYYY-MM-DD HH:MM:SS
-        must_change_password INTEGER DEFAULT 1
-    );
-    """)
-    conn.commit()
+    # Users и остальные таблицы гостиницы - через миграции схемы
+    migrations.migrate(conn, migrations.HOTEL)
     print("Таблица Users проверена или создана успешно.")
 
     # Добавим первого администратора, если его нет
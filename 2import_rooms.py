@@ -1,40 +1,36 @@
-import sqlite3
-import pandas as pd
+import sys
+
+import excel_cache
+import excel_stream
+import migrations
+import query_stats
+import room_import
 
 DB_FILENAME = 'hotel.db'
 
 def init_rooms_db():
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
+    conn = query_stats.connect(DB_FILENAME)
     
-    # Создаем таблицу категорий номеров
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS RoomCategories (
-        id_category INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL
-    )
-    ''')
-    
-    # Создаем таблицу номеров
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Rooms (
-        id_room INTEGER PRIMARY KEY AUTOINCREMENT,
-        room_number TEXT NOT NULL,
-        floor INTEGER NOT NULL,
-        id_category INTEGER NOT NULL,
-        status TEXT DEFAULT 'Свободен',
-        FOREIGN KEY (id_category) REFERENCES RoomCategories (id_category)
-    )
-    ''')
+    # Категории, номера и остальные таблицы гостиницы - через миграции схемы
+    migrations.migrate(conn, migrations.HOTEL)
     
     conn.commit()
     conn.close()
 
-def import_rooms_from_excel(excel_file):
-    # Читаем данные из Excel
-    df = pd.read_excel(excel_file)
+def import_rooms_from_excel(excel_file, stream=False):
+    if stream:
+        # Очень большая книга: лист читается пачками, и каждая пачка сразу пишется в Rooms
+        conn = query_stats.connect(DB_FILENAME)
+        added, skipped = room_import.import_rooms_batches(conn, excel_stream.iter_batches(excel_file), status='Свободен')
+        conn.commit()
+        conn.close()
+        print(f"Данные успешно импортированы: добавлено номеров {added}, пропущено {skipped}")
+        return
+    
+    # Читаем данные из Excel (неизменённая книга - из кэша)
+    df = excel_cache.read_excel(excel_file)
     
-    conn = sqlite3.connect(DB_FILENAME)
+    conn = query_stats.connect(DB_FILENAME)
     cursor = conn.cursor()
     
     # Импортируем категории
@@ -64,5 +60,5 @@ def import_rooms_from_excel(excel_file):
 
 if __name__ == "__main__":
     init_rooms_db()
-    # Замените 'rooms.xlsx' на имя вашего Excel файла
-    import_rooms_from_excel('rooms.xlsx')
\ No newline at end of file
+    # Замените 'rooms.xlsx' на имя вашего Excel файла; --stream - потоковое чтение больших книг
+    import_rooms_from_excel('rooms.xlsx', stream='--stream' in sys.argv)
\ No newline at end of file
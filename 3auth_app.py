@@ -1,51 +1,48 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from tkinter import messagebox, simpledialog, ttk
 import sqlite3
 from datetime import datetime, timedelta
 import os
 
+import availability
+import change_watch
+import db_pool
+import db_worker
+import gui_widgets
+import migrations
+import occupancy_bitmap
+import query_stats
+import room_status
+import user_auth
+
 DB_FILENAME = 'hotel.db'
+# Бронирования номеров в памяти для поиска свободных номеров, общий для фоновых запросов
+availability_index = availability.AvailabilityIndex()
+# Битовая матрица занятости номеров по дням для календаря (файл рядом с базой)
+occupancy_calendar = occupancy_bitmap.OccupancyBitmap(occupancy_bitmap.bitmap_path(DB_FILENAME))
 
 def get_user(login):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
-    user = cursor.fetchone()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
+        user = cursor.fetchone()
     return user
 
 def update_user(user_id, **kwargs):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    for key, value in kwargs.items():
-        cursor.execute(f"UPDATE Users SET {key}=? WHERE id=?", (value, user_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        for key, value in kwargs.items():
+            cursor.execute(f"UPDATE Users SET {key}=? WHERE id=?", (value, user_id))
+        conn.commit()
 
 def check_user(login, password):
-    user = get_user(login)
-    if not user:
+    # Поиск, проверка блокировок и обновление счётчиков - одной транзакцией
+    status, user = user_auth.authenticate(DB_FILENAME, login, password)
+    if status == user_auth.LOGIN_OK:
+        return user, "Вы успешно авторизовались"
+    if status in (user_auth.LOGIN_NOT_FOUND, user_auth.LOGIN_WRONG_PASSWORD):
         return None, "Вы ввели неверный логин или пароль. Пожалуйста проверьте ещё раз введенные данные"
-    user_id, db_password, role, is_blocked, failed_attempts, last_login, must_change_password = user
-    # Проверка блокировки по неактивности
-    if last_login:
-        last_login_dt = datetime.strptime(last_login, "%Y-%m-%d %H:%M:%S")
-        if datetime.now() - last_login_dt > timedelta(days=30):
-            update_user(user_id, is_blocked=1)
-            return None, "Вы заблокированы. Обратитесь к администратору"
-    if is_blocked:
-        return None, "Вы заблокированы. Обратитесь к администратору"
-    if password == db_password:
-        update_user(user_id, failed_attempts=0, last_login=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        return (user_id, role, must_change_password), "Вы успешно авторизовались"
-    else:
-        failed_attempts += 1
-        if failed_attempts >= 3:
-            update_user(user_id, is_blocked=1)
-            return None, "Вы заблокированы. Обратитесь к администратору"
-        else:
-            update_user(user_id, failed_attempts=failed_attempts)
-            return None, "Вы ввели неверный логин или пароль. Пожалуйста проверьте ещё раз введенные данные"
+    return None, "Вы заблокированы. Обратитесь к администратору"
 
 def change_password(user_id, old_pwd, new_pwd, confirm_pwd):
     user = get_user_by_id(user_id)
@@ -61,24 +58,22 @@ def change_password(user_id, old_pwd, new_pwd, confirm_pwd):
     return True, "Пароль успешно изменён"
 
 def get_user_by_id(user_id):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Users WHERE id=?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Users WHERE id=?", (user_id,))
+        user = cursor.fetchone()
     return user
 
 def add_user(login, password, role):
     if get_user(login):
         return False, "Пользователь с таким логином уже существует"
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, ?, ?)",
-        (login, password, role, 1, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    )
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, ?, ?)",
+            (login, password, role, 1, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.commit()
     return True, "Пользователь успешно добавлен"
 
 def unblock_user(login):
@@ -92,77 +87,108 @@ def unblock_user(login):
 
 def get_rooms_info():
     """ Получает информацию обо всех номерах с категориями. """
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT
-            r.room_number,
-            r.floor,
-            rc.name, -- Название категории
-            r.status,
-            r.id_room -- Нужен для управления статусом
-        FROM Rooms r
-        JOIN RoomCategories rc ON r.id_category = rc.id_category
-        ORDER BY r.floor, r.room_number
-    """)
-    rooms = cursor.fetchall()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                r.room_number,
+                r.floor,
+                rc.name, -- Название категории
+                r.status,
+                r.id_room -- Нужен для управления статусом
+            FROM Rooms r
+            JOIN RoomCategories rc ON r.id_category = rc.id_category
+            ORDER BY r.floor, r.room_number
+        """)
+        rooms = cursor.fetchall()
     return rooms
 
-def calculate_occupancy():
-    """ Рассчитывает процент загруженности номеров. """
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    
-    # Общая загруженность
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_rooms,
-            SUM(CASE WHEN status = 'Занят' THEN 1 ELSE 0 END) as occupied_rooms
-        FROM Rooms
-    """)
-    total_rooms, occupied_rooms = cursor.fetchone()
-    total_occupancy = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
-
-    # Загруженность по категориям
-    cursor.execute("""
-        SELECT 
-            rc.name as category,
-            COUNT(*) as total_rooms,
-            SUM(CASE WHEN r.status = 'Занят' THEN 1 ELSE 0 END) as occupied_rooms
+def get_rooms_page(after_key=None, limit=gui_widgets.PAGE_SIZE):
+    """
+    Страница номеров в порядке (этаж, номер) после ключа after_key = (этаж, номер, id_room).
+    Keyset-пагинация: каждая страница - поиск по индексу, без OFFSET и без чтения всех номеров.
+    """
+    after_key = after_key or ('', '', 0)
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        # Условие "этаж >= ?" даёт поиск по индексу, сравнение кортежей отсекает уже показанные строки
+        cursor.execute("""
+            SELECT
+                r.room_number,
+                r.floor,
+                rc.name, -- Название категории
+                r.status,
+                r.id_room
+            FROM Rooms r
+            JOIN RoomCategories rc ON r.id_category = rc.id_category
+            WHERE COALESCE(r.floor, '') >= :floor
+              AND (COALESCE(r.floor, ''), r.room_number, r.id_room) > (:floor, :room_number, :id_room)
+            ORDER BY COALESCE(r.floor, ''), r.room_number, r.id_room
+            LIMIT :limit
+        """, {'floor': after_key[0], 'room_number': after_key[1], 'id_room': after_key[2], 'limit': limit})
+        rooms = cursor.fetchall()
+    return rooms
+
+def search_rooms(text, limit=gui_widgets.PICKER_LIMIT):
+    """
+    Номера, у которых номер или этаж начинается с text, в порядке (этаж, номер).
+    Начало строки ищется диапазоном [text, text + максимальный символ) по индексу,
+    поэтому время не зависит от числа номеров.
+    """
+    if not text:
+        return get_rooms_page(limit=limit)
+    bounds = {'low': text, 'high': text + '\U0010ffff', 'limit': limit}
+    select_rooms = """
+        SELECT r.room_number, r.floor, rc.name, r.status, r.id_room
         FROM Rooms r
         JOIN RoomCategories rc ON r.id_category = rc.id_category
-        GROUP BY rc.name
-    """)
-    category_occupancy = cursor.fetchall()
-
-    # Загруженность по этажам
-    cursor.execute("""
-        SELECT 
-            floor,
-            COUNT(*) as total_rooms,
-            SUM(CASE WHEN status = 'Занят' THEN 1 ELSE 0 END) as occupied_rooms
-        FROM Rooms
-        GROUP BY floor
-    """)
-    floor_occupancy = cursor.fetchall()
-
-    conn.close()
-    return total_occupancy, category_occupancy, floor_occupancy
+    """
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(select_rooms + """
+            WHERE r.room_number >= :low AND r.room_number < :high
+            ORDER BY r.room_number LIMIT :limit
+        """, bounds)
+        rooms = cursor.fetchall()
+        cursor.execute(select_rooms + """
+            WHERE COALESCE(r.floor, '') >= :low AND COALESCE(r.floor, '') < :high
+            ORDER BY COALESCE(r.floor, ''), r.room_number LIMIT :limit
+        """, bounds)
+        rooms += cursor.fetchall()
+    # Номер может подойти по обоим условиям
+    unique_rooms = {room[4]: room for room in rooms}.values()
+    return sorted(unique_rooms, key=lambda room: (room[1] or '', room[0], room[4]))[:limit]
+
+def calculate_occupancy():
+    """ Рассчитывает процент загруженности номеров по сводке RoomStatusSummary. """
+    with db_pool.connection(DB_FILENAME) as conn:
+        # Сводку ведут триггеры на Rooms, полного прохода по номерам нет
+        return room_status.occupancy_summary(conn)
+
+def get_room_categories():
+    with db_pool.connection(DB_FILENAME) as conn:
+        return conn.execute("SELECT id_category, name FROM RoomCategories ORDER BY name").fetchall()
+
+def get_users_list():
+    with db_pool.connection(DB_FILENAME) as conn:
+        return conn.execute("SELECT login, role, is_blocked, failed_attempts FROM Users").fetchall()
+
+def find_free_rooms(date_from, date_to, id_category=None):
+    """ Номера, свободные на период [date_from, date_to), по индексу бронирований в памяти. """
+    with db_pool.connection(DB_FILENAME) as conn:
+        return availability_index.free_rooms(conn, date_from, date_to, id_category)
 
 def update_room_status(room_id, new_status):
     """ Обновляет статус номера по его ID. """
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE Rooms SET status=? WHERE id_room=?", (new_status, room_id))
-        conn.commit()
-        return True, "Статус номера успешно обновлен."
-    except sqlite3.Error as e:
-        conn.rollback()
-        return False, f"Ошибка при обновлении статуса номера: {e}"
-    finally:
-        conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE Rooms SET status=? WHERE id_room=?", (new_status, room_id))
+            conn.commit()
+            return True, "Статус номера успешно обновлен."
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Ошибка при обновлении статуса номера: {e}"
 
 # --- Логика авторизации ---
 
@@ -172,7 +198,13 @@ def login_action():
     if not login or not password:
         messagebox.showerror("Ошибка", "Поля Логин и Пароль обязательны для заполнения")
         return
-    user, msg = check_user(login, password)
+    # Проверка идёт в фоновом потоке, окно входа не замирает
+    login_button.config(state=tk.DISABLED)
+    worker.submit(check_user, login, password, on_done=on_login_checked, on_error=on_login_error, key='login')
+
+def on_login_checked(result):
+    login_button.config(state=tk.NORMAL)
+    user, msg = result
     if user:
         user_id, role, must_change_password = user
         messagebox.showinfo("Успех", msg)
@@ -185,6 +217,10 @@ def login_action():
     else:
         messagebox.showerror("Ошибка", msg)
 
+def on_login_error(error):
+    login_button.config(state=tk.NORMAL)
+    messagebox.showerror("Ошибка", f"Ошибка при входе: {error}")
+
 # --- Логика смены пароля ---
 
 def show_change_password(user_id):
@@ -283,22 +319,20 @@ def show_users_list_window():
     users_list_win.transient(root)
     users_list_win.grab_set()
 
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT login, role, is_blocked, failed_attempts FROM Users")
-    users = cursor.fetchall()
-    conn.close()
-
     text_widget = tk.Text(users_list_win, wrap="word")
     text_widget.pack(expand=True, fill="both", padx=10, pady=10)
 
-    text_widget.insert(tk.END, "Логин\t\tРоль\t\tЗаблокирован\tПопытки\n")
-    text_widget.insert(tk.END, "--------------------------------------------------\n")
-    for login, role, is_blocked, failed_attempts in users:
-        status = "Да" if is_blocked else "Нет"
-        text_widget.insert(tk.END, f"{login}\t\t{role}\t\t{status}\t\t{failed_attempts}\n")
+    def fill(users):
+        text_widget.insert(tk.END, "Логин\t\tРоль\t\tЗаблокирован\tПопытки\n")
+        text_widget.insert(tk.END, "--------------------------------------------------\n")
+        for login, role, is_blocked, failed_attempts in users:
+            status = "Да" if is_blocked else "Нет"
+            text_widget.insert(tk.END, f"{login}\t\t{role}\t\t{status}\t\t{failed_attempts}\n")
+        text_widget.config(state="disabled")
 
-    text_widget.config(state="disabled")
+    worker.submit(get_users_list, on_done=fill,
+                  on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при загрузке пользователей: {e}", parent=users_list_win),
+                  key=('users_list', str(users_list_win)), loading_parent=users_list_win)
 
 def show_rooms_info_window():
     """ Отображает окно с информацией о номерах. """
@@ -308,39 +342,48 @@ def show_rooms_info_window():
     rooms_info_win.transient(root)
     rooms_info_win.grab_set()
 
-    rooms = get_rooms_info()
-
-    text_widget = tk.Text(rooms_info_win, wrap="word")
-    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
-
-    text_widget.insert(tk.END, "Номер\tЭтаж\tКатегория\t\tСтатус\n")
-    text_widget.insert(tk.END, "------------------------------------------------------------\n")
-    for room_number, floor, category_name, status, _ in rooms:
-        text_widget.insert(tk.END, f"{room_number}\t{floor}\t{category_name}\t\t{status}\n")
-
-    text_widget.config(state="disabled")
+    # Номера подгружаются страницами по мере прокрутки
+    rooms_table = gui_widgets.PagedTreeview(
+        rooms_info_win,
+        worker,
+        columns=('Номер', 'Этаж', 'Категория', 'Статус'),
+        fetch_page=get_rooms_page,
+        key_of=lambda room: (room[1] or '', room[0], room[4]),
+        values_of=lambda room: room[:4],
+        on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при загрузке номеров: {e}", parent=rooms_info_win),
+    )
+    rooms_table.pack(expand=True, fill="both", padx=10, pady=10)
 
 def show_manage_room_status_window():
     """ Отображает окно для управления статусами номеров. """
     manage_status_win = tk.Toplevel(root)
     manage_status_win.title("Управление статусами номеров")
-    manage_status_win.geometry("300x250")
+    manage_status_win.geometry("400x350")
     manage_status_win.transient(root)
     manage_status_win.grab_set()
 
-    rooms = get_rooms_info()
+    # Есть ли номера вообще, проверяется в фоне; форма строится по ответу
+    worker.submit(get_rooms_page, limit=1, on_done=lambda rooms: fill_manage_room_status(manage_status_win, rooms),
+                  on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при загрузке номеров: {e}", parent=manage_status_win),
+                  key=('manage_room_status', str(manage_status_win)), loading_parent=manage_status_win)
 
+def fill_manage_room_status(manage_status_win, rooms):
+    """ Строит форму смены статуса, когда известно, есть ли номера. """
     if not rooms:
         tk.Label(manage_status_win, text="Номера не найдены.").pack(pady=10)
         return
 
-    tk.Label(manage_status_win, text="Выберите номер:").pack(pady=5)
-    selected_room_display = tk.StringVar(manage_status_win)
-    room_options_dict = {f"Номер {r[0]} (Этаж {r[1]}, {r[2]}, Статус: {r[3]})": r[4] for r in rooms}
-    room_menu = tk.OptionMenu(manage_status_win, selected_room_display, *room_options_dict.keys())
-    room_menu.pack(pady=5)
-    if room_options_dict:
-        selected_room_display.set(list(room_options_dict.keys())[0])
+    tk.Label(manage_status_win, text="Номер или этаж:").pack(pady=5)
+    # Подсказки запрашиваются поиском по индексу при каждом изменении текста
+    room_picker = gui_widgets.SearchPicker(
+        manage_status_win,
+        worker,
+        search=search_rooms,
+        format_row=lambda r: f"Номер {r[0]} (Этаж {r[1]}, {r[2]}, Статус: {r[3]})",
+        height=6,
+        on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при поиске номеров: {e}", parent=manage_status_win),
+    )
+    room_picker.pack(pady=5, padx=10, fill='x')
 
     tk.Label(manage_status_win, text="Выберите новый статус:").pack(pady=5)
     new_status_var = tk.StringVar(manage_status_win)
@@ -350,8 +393,8 @@ def show_manage_room_status_window():
     new_status_var.set(status_options[0])
 
     def apply_status():
-        selected_display = selected_room_display.get()
-        room_id_to_update = room_options_dict.get(selected_display)
+        selected_room = room_picker.selected_row()
+        room_id_to_update = selected_room[4] if selected_room else None
         status_to_set = new_status_var.get()
 
         if room_id_to_update is None or not status_to_set:
@@ -375,28 +418,194 @@ def show_occupancy_window():
     occupancy_win.transient(root)
     occupancy_win.grab_set()
 
-    total_occupancy, category_occupancy, floor_occupancy = calculate_occupancy()
-
-    text_widget = tk.Text(occupancy_win, wrap="word")
-    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
-
-    text_widget.insert(tk.END, f"Общая загруженность: {total_occupancy:.1f}%\n\n")
-
-    text_widget.insert(tk.END, "Загруженность по категориям:\n")
-    text_widget.insert(tk.END, "Категория\t\tВсего номеров\tЗанято\tЗагруженность\n")
-    text_widget.insert(tk.END, "------------------------------------------------------------\n")
-    for category, total, occupied in category_occupancy:
-        occupancy = (occupied / total * 100) if total > 0 else 0
-        text_widget.insert(tk.END, f"{category}\t\t{total}\t\t{occupied}\t{occupancy:.1f}%\n")
-
-    text_widget.insert(tk.END, "\nЗагруженность по этажам:\n")
-    text_widget.insert(tk.END, "Этаж\tВсего номеров\tЗанято\tЗагруженность\n")
-    text_widget.insert(tk.END, "------------------------------------------------------------\n")
-    for floor, total, occupied in floor_occupancy:
+    total_label = tk.Label(occupancy_win, text="")
+    total_label.pack(anchor='w', padx=10, pady=5)
+
+    tk.Label(occupancy_win, text="Загруженность по категориям:").pack(anchor='w', padx=10)
+    category_tree = ttk.Treeview(occupancy_win, columns=('Категория', 'Всего номеров', 'Занято', 'Загруженность'),
+                                 show='headings', height=5)
+    floor_tree = ttk.Treeview(occupancy_win, columns=('Этаж', 'Всего номеров', 'Занято', 'Загруженность'),
+                              show='headings', height=5)
+    for tree in (category_tree, floor_tree):
+        for col in tree['columns']:
+            tree.heading(col, text=col)
+            tree.column(col, width=100)
+    category_tree.pack(expand=True, fill="both", padx=10, pady=5)
+    tk.Label(occupancy_win, text="Загруженность по этажам:").pack(anchor='w', padx=10)
+    floor_tree.pack(expand=True, fill="both", padx=10, pady=5)
+
+    def occupancy_values(row):
+        name, total, occupied = row
         occupancy = (occupied / total * 100) if total > 0 else 0
-        text_widget.insert(tk.END, f"{floor}\t{total}\t\t{occupied}\t{occupancy:.1f}%\n")
+        return name, total, occupied, f"{occupancy:.1f}%"
+
+    # Окно открывается сразу, сводка подставляется, когда запрос выполнится, и
+    # пересчитывается при каждом изменении номеров (в том числе с других рабочих мест);
+    # в таблицах меняются только строки категорий и этажей с другими значениями
+    category_shown, floor_shown = {}, {}
+    def fill(result):
+        total_occupancy, category_occupancy, floor_occupancy = result
+        total_label.config(text=f"Общая загруженность: {total_occupancy:.1f}%")
+        gui_widgets.sync_tree(category_tree, category_shown, category_occupancy, lambda row: row[0], occupancy_values)
+        gui_widgets.sync_tree(floor_tree, floor_shown, floor_occupancy, lambda row: row[0], occupancy_values)
+
+    def load(loading_text):
+        worker.submit(calculate_occupancy, on_done=fill,
+                      on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при расчете загруженности: {e}", parent=occupancy_win),
+                      key=('occupancy', str(occupancy_win)), loading_parent=occupancy_win, loading_text=loading_text)
+
+    load(db_worker.LOADING_TEXT)
+    watcher.watch_window(occupancy_win, ('Rooms', 'RoomCategories'), lambda changed: load(None))
+
+def show_free_rooms_window():
+    """ Поиск номеров категории, свободных на период проживания. """
+    free_rooms_win = tk.Toplevel(root)
+    free_rooms_win.title("Свободные номера")
+    free_rooms_win.geometry("550x400")
+    free_rooms_win.transient(root)
+
+    form = tk.Frame(free_rooms_win)
+    form.pack(fill='x', padx=10, pady=5)
+    today = datetime.now()
+    tk.Label(form, text="Заезд (ДД.ММ.ГГГГ):").grid(row=0, column=0, sticky='w')
+    entry_from = tk.Entry(form, width=12)
+    entry_from.insert(0, today.strftime("%d.%m.%Y"))
+    entry_from.grid(row=0, column=1, padx=5)
+    tk.Label(form, text="Выезд (ДД.ММ.ГГГГ):").grid(row=1, column=0, sticky='w')
+    entry_to = tk.Entry(form, width=12)
+    entry_to.insert(0, (today + timedelta(days=1)).strftime("%d.%m.%Y"))
+    entry_to.grid(row=1, column=1, padx=5)
+    tk.Label(form, text="Категория:").grid(row=2, column=0, sticky='w')
+    all_categories = "Все категории"
+    category_var = tk.StringVar(free_rooms_win, value=all_categories)
+    category_menu = tk.OptionMenu(form, category_var, all_categories)
+    category_menu.grid(row=2, column=1, padx=5, sticky='w')
+    category_ids = {}
+
+    def fill_categories(categories):
+        for id_category, name in categories:
+            category_ids[name] = id_category
+            category_menu['menu'].add_command(label=name, command=tk._setit(category_var, name))
+
+    worker.submit(get_room_categories, on_done=fill_categories,
+                  on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при загрузке категорий: {e}", parent=free_rooms_win),
+                  key=('room_categories', str(free_rooms_win)))
+
+    columns = ('Номер', 'Этаж', 'Категория', 'Статус')
+    tree = ttk.Treeview(free_rooms_win, columns=columns, show='headings')
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=100)
+    count_label = tk.Label(free_rooms_win, text="")
+
+    shown = {}
+    def fill(rooms):
+        gui_widgets.sync_tree(tree, shown, rooms, lambda room: room[4], lambda room: room[:4])
+        count_label.config(text=f"Свободно номеров: {len(rooms)}")
+
+    def search():
+        try:
+            date_from = datetime.strptime(entry_from.get().strip(), "%d.%m.%Y")
+            date_to = datetime.strptime(entry_to.get().strip(), "%d.%m.%Y")
+        except ValueError:
+            messagebox.showerror("Ошибка", "Даты должны быть в формате ДД.ММ.ГГГГ", parent=free_rooms_win)
+            return
+        if date_to <= date_from:
+            messagebox.showerror("Ошибка", "Дата выезда должна быть позже даты заезда", parent=free_rooms_win)
+            return
+        worker.submit(find_free_rooms, date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"),
+                      category_ids.get(category_var.get()), on_done=fill,
+                      on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при поиске номеров: {e}", parent=free_rooms_win),
+                      key=('free_rooms', str(free_rooms_win)), loading_parent=free_rooms_win)
+
+    tk.Button(form, text="Найти", command=search).grid(row=0, column=2, rowspan=3, padx=10)
+    count_label.pack(anchor='w', padx=10)
+    tree.pack(expand=True, fill="both", padx=10, pady=5)
+
+def get_occupancy_calendar(date_from, date_to):
+    """ Номера, сетка занятости по дням [date_from, date_to) и процент загрузки за период. """
+    with db_pool.connection(DB_FILENAME) as conn:
+        rooms = conn.execute(
+            "SELECT id_room, room_number, floor FROM Rooms ORDER BY COALESCE(floor, ''), room_number, id_room"
+        ).fetchall()
+        with occupancy_calendar.lock:
+            occupancy_calendar.refresh(conn, date_from, date_to)
+            # Номер, добавленный или удалённый между запросами, в матрицу ещё не попал
+            known = set(occupancy_calendar.room_ids.tolist())
+            rooms = [room for room in rooms if room[0] in known]
+            grid = occupancy_calendar.grid(date_from, date_to, [room[0] for room in rooms])
+            percent = occupancy_calendar.occupancy_percent(date_from, date_to)
+    return rooms, grid, percent
+
+def show_occupancy_calendar_window():
+    """ Календарь занятости номеров по дням месяца. """
+    calendar_win = tk.Toplevel(root)
+    calendar_win.title("Календарь занятости")
+    calendar_win.geometry("700x500")
+    calendar_win.transient(root)
+
+    form = tk.Frame(calendar_win)
+    form.pack(fill='x', padx=10, pady=5)
+    tk.Label(form, text="Месяц (ММ.ГГГГ):").pack(side=tk.LEFT)
+    entry_month = tk.Entry(form, width=10)
+    entry_month.insert(0, datetime.now().strftime("%m.%Y"))
+    entry_month.pack(side=tk.LEFT, padx=5)
+    summary_label = tk.Label(calendar_win, text="")
+    summary_label.pack(anchor='w', padx=10)
+    text_widget = tk.Text(calendar_win, wrap="none", font=("Courier", 10))
+
+    def fill(result, month_start):
+        rooms, grid, percent = result
+        summary_label.config(text=f"Загрузка за месяц: {percent:.1f}%, свободных номеро-ночей: {int((~grid).sum())}")
+        days = grid.shape[1]
+        lines = ["Номер  Этаж " + "".join(str((month_start + timedelta(days=day)).day % 10) for day in range(days))]
+        for (_, room_number, floor), row in zip(rooms, grid):
+            lines.append(f"{room_number:<6} {floor or '':<4} " + "".join('■' if occupied else '·' for occupied in row))
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert(tk.END, "\n".join(lines))
+        text_widget.config(state="disabled")
+
+    def show():
+        try:
+            month_start = datetime.strptime(entry_month.get().strip(), "%m.%Y")
+        except ValueError:
+            messagebox.showerror("Ошибка", "Месяц должен быть в формате ММ.ГГГГ", parent=calendar_win)
+            return
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        worker.submit(get_occupancy_calendar, month_start.strftime("%Y-%m-%d"), month_end.strftime("%Y-%m-%d"),
+                      on_done=lambda result: fill(result, month_start),
+                      on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при построении календаря: {e}", parent=calendar_win),
+                      key=('occupancy_calendar', str(calendar_win)), loading_parent=calendar_win)
 
-    text_widget.config(state="disabled")
+    tk.Button(form, text="Показать", command=show).pack(side=tk.LEFT, padx=5)
+    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
+    show()
+
+def show_query_stats_window():
+    """ Сводка замеров SQL-запросов (query_stats); сбор включается переменной QUERY_STATS=1. """
+    stats_win = tk.Toplevel(root)
+    stats_win.title("Статистика запросов")
+    stats_win.geometry("800x500")
+
+    text_widget = tk.Text(stats_win, wrap="none")
+
+    def refresh():
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert(tk.END, '\n'.join(query_stats.summary_lines()))
+        text_widget.config(state="disabled")
+
+    def reset():
+        query_stats.reset()
+        refresh()
+
+    buttons = tk.Frame(stats_win)
+    buttons.pack(side=tk.BOTTOM, fill='x')
+    tk.Button(buttons, text="Обновить", command=refresh).pack(side=tk.LEFT, padx=5, pady=5)
+    tk.Button(buttons, text="Сбросить", command=reset).pack(side=tk.LEFT, padx=5, pady=5)
+    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
+    refresh()
 
 def show_admin_panel_window():
     """ Создает и отображает главное окно администраторской панели. """
@@ -404,7 +613,7 @@ def show_admin_panel_window():
     if admin_window is None or not admin_window.winfo_exists():
         admin_window = tk.Toplevel(root)
         admin_window.title("Админ-панель")
-        admin_window.geometry("300x350")
+        admin_window.geometry("300x470")
         admin_window.transient(root)
         admin_window.protocol("WM_DELETE_WINDOW", lambda: admin_window.destroy())
 
@@ -415,60 +624,70 @@ def show_admin_panel_window():
         tk.Button(admin_window, text="Информация о номерах", command=show_rooms_info_window).pack(pady=5, padx=20, fill='x')
         tk.Button(admin_window, text="Управление статусами номеров", command=show_manage_room_status_window).pack(pady=5, padx=20, fill='x')
         tk.Button(admin_window, text="Загруженность номеров", command=show_occupancy_window).pack(pady=5, padx=20, fill='x')
+        tk.Button(admin_window, text="Свободные номера", command=show_free_rooms_window).pack(pady=5, padx=20, fill='x')
+        tk.Button(admin_window, text="Календарь занятости", command=show_occupancy_calendar_window).pack(pady=5, padx=20, fill='x')
         tk.Button(admin_window, text="Разблокировать пользователя", command=unblock_user_action).pack(pady=5, padx=20, fill='x')
+        tk.Button(admin_window, text="Статистика запросов", command=show_query_stats_window).pack(pady=5, padx=20, fill='x')
 
     else:
         admin_window.lift()
 
 def ensure_admin_exists():
     """Проверяет наличие администратора и создает его, если не существует"""
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    
-    # Проверяем, существует ли администратор
-    cursor.execute("SELECT COUNT(*) FROM Users WHERE role='Администратор'")
-    admin_count = cursor.fetchone()[0]
-    
-    if admin_count == 0:
-        # Создаем администратора
-        cursor.execute("""
-            INSERT INTO Users (login, password, role, is_blocked, failed_attempts, must_change_password, last_login)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, ('admin', 'admin', 'Администратор', 0, 0, 0, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        print("Администратор создан (логин: admin, пароль: admin)")
-    
-    conn.close()
-
-# --- GUI ---
-
-root = tk.Tk()
-root.title("Авторизация")
-root.geometry("300x150")
-
-# Проверяем наличие администратора при запуске
-ensure_admin_exists()
-
-# Центрируем окно
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
-x = (screen_width - 300) // 2
-y = (screen_height - 150) // 2
-root.geometry(f"300x150+{x}+{y}")
-
-tk.Label(root, text="Логин:").pack(pady=5)
-entry_login = tk.Entry(root)
-entry_login.pack(pady=5)
-
-tk.Label(root, text="Пароль:").pack(pady=5)
-entry_password = tk.Entry(root, show="*")
-entry_password.pack(pady=5)
-
-tk.Button(root, text="Войти", command=login_action).pack(pady=10)
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+
+        # Проверяем, существует ли администратор
+        cursor.execute("SELECT COUNT(*) FROM Users WHERE role='Администратор'")
+        admin_count = cursor.fetchone()[0]
+
+        if admin_count == 0:
+            # Создаем администратора
+            cursor.execute("""
+                INSERT INTO Users (login, password, role, is_blocked, failed_attempts, must_change_password, last_login)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, ('admin', 'admin', 'Администратор', 0, 0, 0, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+            print("Администратор создан (логин: admin, пароль: admin)")
 
 def on_closing():
     if messagebox.askokcancel("Выход", "Вы уверены, что хотите выйти?"):
+        watcher.close()
+        worker.shutdown()
         root.destroy()
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop() 
\ No newline at end of file
+# --- GUI ---
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Авторизация")
+    root.geometry("300x150")
+    # Запросы из обработчиков кнопок выполняются вне главного потока
+    worker = db_worker.DbWorker(root)
+
+    # Схема базы: таблицы, индексы списка номеров, сводки и счётчики изменений
+    migrations.ensure_schema(DB_FILENAME, migrations.HOTEL)
+    # Проверяем наличие администратора при запуске
+    ensure_admin_exists()
+    # Окно загруженности обновляется само при изменении номеров
+    watcher = change_watch.ChangeWatcher(root, DB_FILENAME)
+
+    # Центрируем окно
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x = (screen_width - 300) // 2
+    y = (screen_height - 150) // 2
+    root.geometry(f"300x150+{x}+{y}")
+
+    tk.Label(root, text="Логин:").pack(pady=5)
+    entry_login = tk.Entry(root)
+    entry_login.pack(pady=5)
+
+    tk.Label(root, text="Пароль:").pack(pady=5)
+    entry_password = tk.Entry(root, show="*")
+    entry_password.pack(pady=5)
+
+    login_button = tk.Button(root, text="Войти", command=login_action)
+    login_button.pack(pady=10)
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
\ No newline at end of file
@@ -1,51 +1,48 @@
 # auth_app.py
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-import sqlite3
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
+
+import db_pool
+import user_auth
 
 DB_FILENAME = 'hotel.db'
 
 # --- Функции для работы с базой данных Users ---
 
 def get_user(login):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
-    user = cursor.fetchone()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
+        user = cursor.fetchone()
     return user
 
 def update_user(user_id, **kwargs):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    update_fields = ', '.join([f"{key}=?" for key in kwargs.keys()])
-    query = f"UPDATE Users SET {update_fields} WHERE id=?"
-    values = list(kwargs.values()) + [user_id]
-    cursor.execute(query, values)
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        update_fields = ', '.join([f"{key}=?" for key in kwargs.keys()])
+        query = f"UPDATE Users SET {update_fields} WHERE id=?"
+        values = list(kwargs.values()) + [user_id]
+        cursor.execute(query, values)
+        conn.commit()
 
 def get_user_by_id(user_id):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Users WHERE id=?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM Users WHERE id=?", (user_id,))
+        user = cursor.fetchone()
     return user
 
 def add_user(login, password, role):
     if get_user(login):
         return False, "Пользователь с таким логином уже существует"
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, 1, ?)",
-        (login, password, role, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    )
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, 1, ?)",
+            (login, password, role, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.commit()
     return True, "Пользователь успешно добавлен"
 
 def unblock_user(login):
@@ -58,37 +55,18 @@ def unblock_user(login):
 # --- Логика авторизации ---
 
 def check_user(login, password):
-    user = get_user(login)
-    if not user:
-        return None, "Вы ввели неверный логин или пароль. Пожалуйста проверьте ещё раз введенные данные"
-
-    user_id, db_password, role, is_blocked, failed_attempts, last_login_str, must_change_password = user
-
-    # Проверка блокировки по неактивности
-    if last_login_str:
-        try:
-            last_login_dt = datetime.strptime(last_login_str, "%Y-%m-%d %H:%M:%S")
-            if datetime.now() - last_login_dt > timedelta(days=30) and not is_blocked:
-                update_user(user_id, is_blocked=1)
-                return None, "Вы заблокированы из-за долгого отсутствия. Обратитесь к администратору"
-        except (ValueError, TypeError):
-             pass # Игнорируем ошибку парсинга даты, если формат не соответствует
-
-    if is_blocked:
+    # Поиск, проверка блокировок и обновление счётчиков выполняются одной транзакцией
+    status, user = user_auth.authenticate(DB_FILENAME, login, password)
+
+    if status == user_auth.LOGIN_OK:
+        return user, "Вы успешно авторизовались"
+    if status == user_auth.LOGIN_INACTIVE:
+        return None, "Вы заблокированы из-за долгого отсутствия. Обратитесь к администратору"
+    if status == user_auth.LOGIN_LOCKED:
+        return None, "Вы заблокированы после 3-х неудачных попыток. Обратитесь к администратору"
+    if status == user_auth.LOGIN_BLOCKED:
         return None, "Вы заблокированы. Обратитесь к администратору"
-
-    # Проверка пароля
-    if password == db_password:
-        update_user(user_id, failed_attempts=0, last_login=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        return (user_id, role, must_change_password), "Вы успешно авторизовались"
-    else:
-        failed_attempts += 1
-        if failed_attempts >= 3:
-            update_user(user_id, is_blocked=1)
-            return None, "Вы заблокированы после 3-х неудачных попыток. Обратитесь к администратору"
-        else:
-            update_user(user_id, failed_attempts=failed_attempts)
-            return None, "Вы ввели неверный логин или пароль. Пожалуйста проверьте ещё раз введенные данные"
+    return None, "Вы ввели неверный логин или пароль. Пожалуйста проверьте ещё раз введенные данные"
 
 # --- Логика смены пароля ---
 
@@ -0,0 +1,188 @@
+"""
+Поиск свободных номеров на период [date_from, date_to).
+
+AvailabilityIndex держит в памяти бронирования каждого номера: отсортированные
+даты заезда и для каждой позиции - самую позднюю дату выезда среди
+бронирований до неё включительно. Период пересекается с бронированием, если
+среди бронирований с заездом раньше date_to есть выезд позже date_from, то
+есть проверка номера - один bisect, O(log n), без просмотра Bookings.
+
+Индекс строится по Bookings один раз и поддерживается в актуальном виде:
+триггеры на Bookings отмечают изменённые номера в AvailabilityChanges с
+возрастающим seq, и перед каждым поиском индекс перечитывает бронирования
+только тех номеров, чей seq больше уже учтённого (в том числе после записи
+с других рабочих мест). Номера и категории перечитываются, когда меняются
+их счётчики в ChangeCounters (change_watch).
+
+Ночь - это день заезда и все следующие дни до дня выезда (не включая его),
+отменённые бронирования номер не занимают - как в occupancy.
+
+    python availability.py hotel.db 2025-07-01 2025-07-05 [категория]
+"""
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left
+
+import change_watch
+from occupancy import CANCELLED_STATUS
+
+sql_create_changes = """
+CREATE TABLE IF NOT EXISTS AvailabilityChanges (
+    id_room INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL     -- Номер последнего изменения бронирований номера
+);
+CREATE INDEX IF NOT EXISTS idx_availability_changes_seq ON AvailabilityChanges (seq);
+"""
+
+
+def _mark_room_sql(booking):
+    """ Отмечает номер бронирования booking (NEW / OLD) следующим seq. """
+    return f"""
+        INSERT INTO AvailabilityChanges (id_room, seq)
+        VALUES ({booking}.id_room, (SELECT COALESCE(MAX(seq), 0) + 1 FROM AvailabilityChanges))
+        ON CONFLICT (id_room) DO UPDATE SET seq = excluded.seq;
+    """
+
+
+sql_create_triggers = f"""
+CREATE TRIGGER IF NOT EXISTS trg_availability_booking_insert AFTER INSERT ON Bookings
+BEGIN
+    {_mark_room_sql('NEW')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_availability_booking_delete AFTER DELETE ON Bookings
+BEGIN
+    {_mark_room_sql('OLD')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_availability_booking_update
+AFTER UPDATE OF check_in, check_out, status, id_room ON Bookings
+BEGIN
+    {_mark_room_sql('OLD')}
+    {_mark_room_sql('NEW')}
+END;
+"""
+
+sql_room_bookings = f"""
+SELECT id_room, date(check_in), date(check_out)
+FROM Bookings
+WHERE status IS NOT '{CANCELLED_STATUS}' AND date(check_out) > date(check_in)
+"""
+
+sql_rooms = """
+SELECT r.id_room, r.room_number, r.floor, rc.name, r.status, r.id_category
+FROM Rooms r
+JOIN RoomCategories rc ON r.id_category = rc.id_category
+ORDER BY COALESCE(r.floor, ''), r.room_number, r.id_room
+"""
+
+
+def install(conn):
+    """ Создаёт AvailabilityChanges и триггеры на Bookings. """
+    conn.executescript(sql_create_changes)
+    conn.executescript(sql_create_triggers)
+    conn.commit()
+
+
+def room_intervals(bookings):
+    """
+    Бронирования номера [(заезд, выезд)] -> (заезды по возрастанию, самый поздний выезд
+    среди бронирований до каждой позиции включительно).
+    """
+    bookings.sort()
+    starts, reach = [], []
+    latest = ''
+    for check_in, check_out in bookings:
+        latest = max(latest, check_out)
+        starts.append(check_in)
+        reach.append(latest)
+    return starts, reach
+
+
+def is_free(intervals, date_from, date_to):
+    """ Свободен ли номер с интервалами room_intervals() на весь период [date_from, date_to). """
+    if intervals is None:
+        return True
+    starts, reach = intervals
+    # Бронирования starts[:count] начинаются раньше date_to; пересечение есть, если одно из них заканчивается позже date_from
+    count = bisect_left(starts, date_to)
+    return count == 0 or reach[count - 1] <= date_from
+
+
+class AvailabilityIndex:
+    """ Бронирования номеров в памяти для поиска свободных номеров; общий для потоков приложения. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.intervals = None   # {id_room: (заезды, самые поздние выезды)}
+        self.seq = 0            # Последнее учтённое изменение AvailabilityChanges
+        self.rooms = None       # {id_category: [(id_room, номер, этаж, категория, статус)]}, None - все номера; в порядке этажа
+        self.room_versions = None
+
+    def load(self, conn):
+        """ Строит индекс по всем бронированиям. """
+        # seq читается до бронирований: изменения между двумя запросами будут перечитаны при следующем refresh
+        self.seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM AvailabilityChanges").fetchone()[0]
+        by_room = {}
+        for id_room, check_in, check_out in conn.execute(sql_room_bookings):
+            # Одинаковые даты разных номеров - одна строка в памяти
+            by_room.setdefault(id_room, []).append((sys.intern(check_in), sys.intern(check_out)))
+        self.intervals = {id_room: room_intervals(bookings) for id_room, bookings in by_room.items()}
+
+    def refresh(self, conn):
+        """ Перечитывает бронирования номеров, изменённых после последней проверки, и при необходимости номера. """
+        if self.intervals is None:
+            self.load(conn)
+        else:
+            changed = conn.execute(
+                "SELECT id_room, seq FROM AvailabilityChanges WHERE seq > ?", (self.seq,)
+            ).fetchall()
+            for id_room, seq in changed:
+                bookings = [(sys.intern(check_in), sys.intern(check_out)) for _, check_in, check_out in
+                            conn.execute(sql_room_bookings + " AND id_room = ?", (id_room,))]
+                if bookings:
+                    self.intervals[id_room] = room_intervals(bookings)
+                else:
+                    self.intervals.pop(id_room, None)
+                self.seq = max(self.seq, seq)
+
+        versions = change_watch.read_versions(conn)
+        room_versions = (versions.get('Rooms'), versions.get('RoomCategories'))
+        if self.rooms is None or room_versions != self.room_versions:
+            self.rooms = {None: []}
+            for *room, id_category in conn.execute(sql_rooms):
+                self.rooms[None].append(room)
+                self.rooms.setdefault(id_category, []).append(room)
+            self.room_versions = room_versions
+
+    def free_rooms(self, conn, date_from, date_to, id_category=None):
+        """
+        Номера категории id_category (None - всех), свободные на весь период [date_from, date_to)
+        ('YYYY-MM-DD'), в порядке этажа и номера: [(номер, этаж, категория, статус, id_room)].
+        """
+        if date_from >= date_to:
+            raise ValueError("Дата выезда должна быть позже даты заезда")
+        with self.lock:
+            self.refresh(conn)
+            return [(room_number, floor, category, status, id_room)
+                    for id_room, room_number, floor, category, status in self.rooms.get(id_category, [])
+                    if is_free(self.intervals.get(id_room), date_from, date_to)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Использование: python availability.py hotel.db ГГГГ-ММ-ДД ГГГГ-ММ-ДД [категория]")
+        sys.exit(1)
+    conn = sqlite3.connect(sys.argv[1])
+    id_category = None
+    if len(sys.argv) > 4:
+        row = conn.execute("SELECT id_category FROM RoomCategories WHERE name = ?", (sys.argv[4],)).fetchone()
+        if row is None:
+            print(f"Категория '{sys.argv[4]}' не найдена")
+            sys.exit(1)
+        id_category = row[0]
+    rooms = AvailabilityIndex().free_rooms(conn, sys.argv[2], sys.argv[3], id_category)
+    for room_number, floor, category, status, _ in rooms:
+        print(f"Номер {room_number}, этаж {floor}, {category}, {status}")
+    print(f"Свободно номеров: {len(rooms)}")
@@ -0,0 +1,142 @@
+"""
+Сравнение накладных расходов: новое соединение на каждый вызов против пула db_pool.
+
+Создаёт временную базу hotel.db с пользователями и номерами и замеряет
+путь входа (check_user) и список номеров (get_rooms_info) из 3auth_app.py
+в двух вариантах. Запуск:
+    python bench_db_pool.py [--rooms 2000] [--repeat 2000]
+"""
+import argparse
+import importlib
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+
+def create_fixture(db_filename, rooms_count):
+    """ Создаёт минимальную схему гостиницы и заполняет её тестовыми данными. """
+    conn = sqlite3.connect(db_filename)
+    conn.executescript("""
+    CREATE TABLE Users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        login TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        is_blocked INTEGER DEFAULT 0,
+        failed_attempts INTEGER DEFAULT 0,
+        last_login TEXT,
+        must_change_password INTEGER DEFAULT 0
+    );
+    CREATE TABLE RoomCategories (
+        id_category INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    );
+    CREATE TABLE Rooms (
+        id_room INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_number TEXT NOT NULL,
+        floor TEXT,
+        status TEXT,
+        id_category INTEGER NOT NULL
+    );
+    """)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute(
+        "INSERT INTO Users (login, password, role, last_login) VALUES (?, ?, ?, ?)",
+        ('bench', 'bench', 'Пользователь', now)
+    )
+    categories = ['Стандарт', 'Комфорт', 'Люкс', 'Апартаменты']
+    conn.executemany("INSERT INTO RoomCategories (name) VALUES (?)", [(c,) for c in categories])
+    conn.executemany(
+        "INSERT INTO Rooms (room_number, floor, status, id_category) VALUES (?, ?, ?, ?)",
+        [(str(100 + i), str(i // 50 + 1), 'Чистый', i % len(categories) + 1) for i in range(rooms_count)]
+    )
+    conn.commit()
+    conn.close()
+
+
+# --- Прежний вариант: соединение на каждый вызов (как было в 3auth_app.py) ---
+
+def legacy_get_user(db_filename, login):
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+
+def legacy_update_user(db_filename, user_id, **kwargs):
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
+    for key, value in kwargs.items():
+        cursor.execute(f"UPDATE Users SET {key}=? WHERE id=?", (value, user_id))
+    conn.commit()
+    conn.close()
+
+
+def legacy_login(db_filename, login, password):
+    user = legacy_get_user(db_filename, login)
+    if user and user[1] == password:
+        legacy_update_user(db_filename, user[0], failed_attempts=0,
+                           last_login=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def legacy_get_rooms_info(db_filename):
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.room_number, r.floor, rc.name, r.status, r.id_room
+        FROM Rooms r
+        JOIN RoomCategories rc ON r.id_category = rc.id_category
+        ORDER BY r.floor, r.room_number
+    """)
+    rooms = cursor.fetchall()
+    conn.close()
+    return rooms
+
+
+def timed(func, repeat):
+    """ Возвращает среднее время одного вызова в микросекундах. """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=2000, help="Количество номеров в тестовой базе")
+    parser.add_argument('--repeat', type=int, default=2000, help="Количество повторов каждого сценария")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_filename = os.path.join(tmp, 'hotel.db')
+        create_fixture(db_filename, args.rooms)
+
+        app = importlib.import_module('3auth_app')
+        app.DB_FILENAME = db_filename
+
+        scenarios = [
+            ("Вход (check_user)",
+             lambda: legacy_login(db_filename, 'bench', 'bench'),
+             lambda: app.check_user('bench', 'bench')),
+            ("Список номеров (get_rooms_info)",
+             lambda: legacy_get_rooms_info(db_filename),
+             lambda: app.get_rooms_info()),
+        ]
+
+        print(f"Номеров: {args.rooms}, повторов: {args.repeat}")
+        print(f"{'Сценарий':<32}{'connect/вызов, мкс':>20}{'пул, мкс':>12}{'ускорение':>12}")
+        for title, legacy, pooled in scenarios:
+            legacy(), pooled()  # Прогрев
+            legacy_us = timed(legacy, args.repeat)
+            pooled_us = timed(pooled, args.repeat)
+            print(f"{title:<32}{legacy_us:>20.1f}{pooled_us:>12.1f}{legacy_us / pooled_us:>11.1f}x")
+
+        app.db_pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Нагрузочный тест входа: сколько входов в секунду выдерживает одна база hotel.db.
+
+Каждый "терминал" - отдельный процесс (или поток с --threads), который в цикле
+вызывает user_auth.authenticate() для своего пользователя. В конце проверяется,
+что одновременные неверные пароли для одной учётной записи блокируют её ровно
+после MAX_FAILED_ATTEMPTS попыток, без потерянных обновлений счётчика.
+Запуск:
+    python bench_login.py [--terminals 8] [--seconds 5] [--threads]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import user_auth
+from bench_db_pool import create_fixture
+
+
+def add_users(db_filename, logins):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(db_filename)
+    conn.executemany(
+        "INSERT INTO Users (login, password, role, last_login) VALUES (?, ?, 'Пользователь', ?)",
+        [(login, login, now) for login in logins]
+    )
+    conn.commit()
+    conn.close()
+
+
+def login_loop(db_filename, login, seconds):
+    """ Входит под пользователем login до истечения времени, возвращает число входов. """
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        status, _ = user_auth.authenticate(db_filename, login, login)
+        if status != user_auth.LOGIN_OK:
+            raise RuntimeError(f"Неожиданный результат входа {login}: {status}")
+        count += 1
+    return count
+
+
+def wrong_password(db_filename, login):
+    return user_auth.authenticate(db_filename, login, 'неверный')[0]
+
+
+def run(executor_cls, workers, func, args_list):
+    with executor_cls(workers) as executor:
+        return list(executor.map(func, *zip(*args_list)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--terminals', type=int, default=8, help="Количество одновременных терминалов")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Длительность замера")
+    parser.add_argument('--threads', action='store_true', help="Терминалы - потоки одного процесса, а не процессы")
+    args = parser.parse_args()
+
+    executor_cls = ThreadPoolExecutor if args.threads else ProcessPoolExecutor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_filename = os.path.join(tmp, 'hotel.db')
+        create_fixture(db_filename, rooms_count=0)
+        logins = [f"terminal{i}" for i in range(args.terminals)]
+        add_users(db_filename, logins + ['victim'])
+
+        # 1. Пропускная способность: каждый терминал входит под своим пользователем
+        counts = run(executor_cls, args.terminals, login_loop,
+                     [(db_filename, login, args.seconds) for login in logins])
+        total = sum(counts)
+        print(f"Терминалов: {args.terminals} ({'потоки' if args.threads else 'процессы'})")
+        print(f"Входов за {args.seconds:.1f} с: {total}, входов в секунду: {total / args.seconds:.0f}")
+
+        # 2. Корректность: много одновременных неверных паролей для одного пользователя
+        attempts = max(args.terminals, user_auth.MAX_FAILED_ATTEMPTS) * 4
+        statuses = run(executor_cls, args.terminals, wrong_password,
+                       [(db_filename, 'victim')] * attempts)
+        conn = sqlite3.connect(db_filename)
+        is_blocked, failed_attempts = conn.execute(
+            "SELECT is_blocked, failed_attempts FROM Users WHERE login='victim'").fetchone()
+        conn.close()
+        wrong = statuses.count(user_auth.LOGIN_WRONG_PASSWORD)
+        ok = (is_blocked == 1 and failed_attempts == user_auth.MAX_FAILED_ATTEMPTS
+              and wrong == user_auth.MAX_FAILED_ATTEMPTS - 1)
+        print(f"Одновременных неверных попыток: {attempts}, заблокирован: {bool(is_blocked)}, "
+              f"счётчик: {failed_attempts} -> {'OK' if ok else 'ОШИБКА'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Набор замеров производительности обоих приложений на синтетических данных.
+
+Создаёт во временной папке базы гостиницы и автопарка (synthetic_data) и
+замеряет основные пути: список номеров, загруженность, вход, процент
+загрузки автопарка, запросы RoomNightsDaily, импорт Excel и TXT. Результаты
+пишутся в JSON вместе с версией кода (git), Python и SQLite, чтобы замеры
+разных версий можно было сравнить:
+    python benchmarks.py [--size small|medium|large] [--repeat 20] [--output bench.json]
+    python benchmarks.py --compare bench_old.json --output bench_new.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import fleet_txt_import
+import migrations
+import occupancy
+import room_import
+import synthetic_data
+
+# Приложение автопарка лежит в yy/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yy'))
+
+SIZES = {
+    'small': {'rooms': 200, 'vehicles': 50, 'days': 180, 'import_rows': 1000},
+    'medium': {'rooms': 2000, 'vehicles': 500, 'days': 365, 'import_rows': 10000},
+    'large': {'rooms': 10000, 'vehicles': 5000, 'days': 730, 'import_rows': 100000},
+}
+REPEAT = 20
+
+
+def measure(func, repeat, setup=None):
+    """
+    Время вызовов func в миллисекундах: минимум, медиана, среднее.
+    setup() выполняется перед каждым вызовом вне замера, его результат передаётся в func.
+    """
+    times = []
+    for i in range(repeat + 1):
+        context = setup() if setup else None
+        start = time.perf_counter()
+        func(context) if setup else func()
+        if i:  # Первый вызов - прогрев
+            times.append((time.perf_counter() - start) * 1000)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'mean_ms': round(statistics.mean(times), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fresh_db(tmp, name, kind=None):
+    """ Пустая база для одного прогона импорта; kind - схема из migrations (только таблицы). """
+    path = os.path.join(tmp, name)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    if kind:
+        migrations.migrate(conn, kind, target=1)
+    return conn
+
+
+def import_rooms_excel(conn, excel_path):
+    """ Импорт номерного фонда как в 1.py: чтение Excel и пакетная вставка. """
+    import pandas as pd
+
+    df = pd.read_excel(excel_path)
+    room_import.import_rooms_bulk(conn, df)
+    conn.commit()
+    conn.close()
+
+
+def import_txt(conn, txt_path):
+    fleet_txt_import.import_txt(conn, txt_path)
+    conn.close()
+
+
+def run(size, repeat, tmp):
+    """ Создаёт данные и выполняет все замеры; возвращает словарь для JSON. """
+    params = SIZES[size]
+    hotel_db = os.path.join(tmp, 'hotel.db')
+    fleet_db = os.path.join(tmp, 'autopark.db')
+    rooms_xlsx = os.path.join(tmp, 'Номерной фонд.xlsx')
+    mileage_txt = os.path.join(tmp, 'Данные по пробегу.txt')
+
+    print(f"Создаю данные ({size})...")
+    rows = {
+        'hotel': synthetic_data.generate_hotel(hotel_db, rooms=params['rooms'], days=params['days']),
+        'fleet': synthetic_data.generate_fleet(fleet_db, vehicles=params['vehicles'], days=params['days']),
+    }
+    synthetic_data.write_rooms_excel(rooms_xlsx, rooms=params['import_rows'])
+    synthetic_data.write_mileage_txt(mileage_txt, vehicles=params['import_rows'])
+
+    hotel_app = importlib.import_module('3auth_app')
+    hotel_app.DB_FILENAME = hotel_db
+    fleet_app = importlib.import_module('autopark_app')
+    fleet_app.DB_FILENAME = fleet_db
+
+    period_end = datetime.strptime(synthetic_data.PERIOD_END, "%Y-%m-%d")
+    month_from = (period_end - timedelta(days=30)).strftime("%Y-%m-%d")
+    year_from = (period_end - timedelta(days=min(params['days'], 365))).strftime("%Y-%m-%d")
+    conn = sqlite3.connect(hotel_db)
+
+    scenarios = [
+        ('get_rooms_info', lambda: hotel_app.get_rooms_info(), None),
+        ('calculate_occupancy', lambda: hotel_app.calculate_occupancy(), None),
+        ('check_user', lambda: hotel_app.check_user('user1', 'user1'), None),
+        ('calculate_vehicle_usage', lambda: fleet_app.calculate_vehicle_usage(synthetic_data.PERIOD_END), None),
+        ('occupancy_percent_month',
+         lambda: occupancy.occupancy_percent(conn, month_from, synthetic_data.PERIOD_END), None),
+        ('occupancy_by_category_year',
+         lambda: occupancy.occupancy(conn, year_from, synthetic_data.PERIOD_END, by=occupancy.BY_CATEGORY), None),
+        ('import_rooms_excel', lambda c: import_rooms_excel(c, rooms_xlsx),
+         lambda: fresh_db(tmp, 'import_rooms.db', migrations.HOTEL)),
+        ('import_mileage_txt', lambda c: import_txt(c, mileage_txt),
+         lambda: fresh_db(tmp, 'import_txt.db')),
+    ]
+
+    results = {}
+    for name, func, setup in scenarios:
+        # Импорт на больших файлах идёт секундами, ему хватит меньшего числа повторов
+        results[name] = measure(func, repeat if setup is None else max(repeat // 5, 1), setup)
+        print(f"{name:<30}{results[name]['median_ms']:>12.2f} мс")
+
+    conn.close()
+    hotel_app.db_pool.close_all()
+    return {
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'size': size,
+        'params': params,
+        'rows': rows,
+        'results': results,
+    }
+
+
+def compare(report, previous):
+    """ Печатает медианы рядом с прежним замером. """
+    print(f"\nСравнение с {previous.get('commit')} ({previous.get('created')}):")
+    print(f"{'Замер':<30}{'было, мс':>12}{'стало, мс':>12}{'изменение':>12}")
+    for name, result in report['results'].items():
+        old = previous.get('results', {}).get(name)
+        if old is None:
+            print(f"{name:<30}{'-':>12}{result['median_ms']:>12.2f}")
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"{name:<30}{old['median_ms']:>12.2f}{result['median_ms']:>12.2f}{ratio:>11.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=list(SIZES), default='small', help="Объём синтетических данных")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Повторов каждого замера")
+    parser.add_argument('--output', default='benchmarks.json', help="Файл результатов JSON")
+    parser.add_argument('--compare', help="JSON прежнего замера для сравнения")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(args.size, args.repeat, tmp)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(report, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Таблица-календарь Calendar(day) с одной строкой на каждые сутки.
+
+Нужна триггерам, которые раскладывают интервал (бронирование, аренда) по дням:
+внутри триггеров SQLite не поддерживает WITH RECURSIVE, а соединение с
+календарём по диапазону дат работает и там.
+"""
+CALENDAR_START = '2000-01-01'  # Интервалы вне [CALENDAR_START, CALENDAR_END) по дням не раскладываются
+CALENDAR_END = '2100-01-01'
+
+sql_create_calendar = """
+CREATE TABLE IF NOT EXISTS Calendar (
+    day TEXT PRIMARY KEY -- 'YYYY-MM-DD'
+) WITHOUT ROWID;
+"""
+
+
+def ensure_calendar(conn, start=CALENDAR_START, end=CALENDAR_END):
+    """ Создаёт Calendar и заполняет её днями из [start, end), если их ещё нет. """
+    conn.execute(sql_create_calendar)
+    present, expected = conn.execute(
+        "SELECT COUNT(*), CAST(JULIANDAY(:end) - JULIANDAY(:start) AS INTEGER) FROM Calendar "
+        "WHERE day >= :start AND day < :end",
+        {'start': start, 'end': end}
+    ).fetchone()
+    if present >= expected:
+        return
+    conn.execute("""
+        WITH RECURSIVE days(day) AS (
+            SELECT date(:start)
+            UNION ALL
+            SELECT date(day, '+1 day') FROM days WHERE day < date(:end, '-1 day')
+        )
+        INSERT OR IGNORE INTO Calendar (day) SELECT day FROM days
+    """, {'start': start, 'end': end})
@@ -0,0 +1,137 @@
+"""
+Обнаружение изменений в базе для окон, которые должны обновляться сами.
+
+Триггеры на отслеживаемых таблицах увеличивают счётчик таблицы в
+ChangeCounters при каждой вставке, изменении и удалении строки. ChangeWatcher
+раз в POLL_MS опрашивает базу через отдельное соединение:
+PRAGMA data_version меняется, только если кто-то (в том числе другой процесс
+на другом рабочем месте) зафиксировал транзакцию, поэтому в спокойном
+состоянии опрос не читает ни одной таблицы. Когда версия изменилась,
+читается маленькая таблица счётчиков и вызываются только подписчики,
+чьи таблицы действительно изменились.
+
+Пример:
+    with db_pool.connection(DB_FILENAME) as conn:
+        change_watch.install(conn, ('Vehicles', 'Usage'))
+    watcher = change_watch.ChangeWatcher(root, DB_FILENAME)
+    watcher.watch_window(win, ('Vehicles',), refresh)
+"""
+import logging
+import sqlite3
+
+import query_stats
+
+log = logging.getLogger(__name__)
+
+POLL_MS = 1000  # Период опроса базы
+
+sql_create_counters = """
+CREATE TABLE IF NOT EXISTS ChangeCounters (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+sql_counter_trigger = """
+CREATE TRIGGER IF NOT EXISTS trg_changes_{table}_{event} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO ChangeCounters (table_name, version) VALUES ('{table}', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+"""
+
+
+def install(conn, tables):
+    """ Создаёт ChangeCounters и триггеры-счётчики на таблицах tables. """
+    conn.executescript(sql_create_counters)
+    for table in tables:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.executescript(sql_counter_trigger.format(table=table, event=event))
+    conn.commit()
+
+
+def read_versions(conn):
+    """ Текущие счётчики {таблица: версия}. """
+    return dict(conn.execute("SELECT table_name, version FROM ChangeCounters"))
+
+
+class ChangeWatcher:
+    """ Опрашивает базу через root.after и оповещает подписчиков об изменённых таблицах. """
+
+    def __init__(self, root, db_filename, poll_ms=POLL_MS, on_error=None):
+        """
+        on_error(ошибка) вызывается, когда опрос базы перестаёт получаться; повторные
+        ошибки до следующего удачного опроса не сообщаются. По умолчанию - запись в лог.
+        """
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_error = on_error
+        self.failing = False
+        # Своё соединение: data_version отражает фиксации всех остальных соединений
+        self.conn = query_stats.connect(db_filename)
+        self.data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.versions = read_versions(self.conn)
+        self.subscribers = {}
+        self.next_id = 0
+        self.after_id = self.root.after(self.poll_ms, self.poll)
+
+    def subscribe(self, tables, callback):
+        """ callback(изменённые таблицы) будет вызываться при изменении tables. Возвращает id подписки. """
+        self.next_id += 1
+        self.subscribers[self.next_id] = (frozenset(tables), callback)
+        return self.next_id
+
+    def unsubscribe(self, subscription_id):
+        self.subscribers.pop(subscription_id, None)
+
+    def watch_window(self, window, tables, callback):
+        """ Подписка, которая снимается при закрытии окна window. """
+        subscription_id = self.subscribe(tables, callback)
+
+        def on_destroy(event):
+            if event.widget is window:
+                self.unsubscribe(subscription_id)
+
+        window.bind('<Destroy>', on_destroy, add='+')
+        return subscription_id
+
+    def check(self):
+        """ Проверяет базу; возвращает множество изменённых таблиц и оповещает подписчиков. """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return set()
+        self.data_version = data_version
+        versions = read_versions(self.conn)
+        changed = {table for table, version in versions.items() if self.versions.get(table) != version}
+        self.versions = versions
+        if changed:
+            # Копия: подписчик может закрыть окно и отписаться прямо в обработчике
+            for tables, callback in list(self.subscribers.values()):
+                affected = tables & changed
+                if affected:
+                    callback(affected)
+        return changed
+
+    def poll(self):
+        try:
+            self.check()
+        except sqlite3.Error as e:
+            # База заблокирована или недоступна: сообщаем один раз, а не на каждом опросе
+            if not self.failing:
+                self.failing = True
+                if self.on_error:
+                    self.on_error(e)
+                else:
+                    log.warning("Ошибка при проверке изменений в базе: %s", e)
+        else:
+            if self.failing:
+                self.failing = False
+                log.info("Проверка изменений в базе снова работает")
+        self.after_id = self.root.after(self.poll_ms, self.poll)
+
+    def close(self):
+        """ Останавливает опрос и закрывает соединение. """
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.conn.close()
@@ -0,0 +1,234 @@
+"""
+Поиск пересечений интервалов: двойные бронирования одного номера (Bookings)
+и пересекающиеся аренды одного автомобиля (Usage), в том числе две
+незакрытые аренды.
+
+Проверка всей таблицы векторизована в NumPy: интервалы читаются пачками
+по CHUNK_ROWS строк (group_concat + np.fromstring, как в fleet_utilization),
+сортируются один раз по (ресурс, начало), дальше - накопленный максимум
+конца: интервал конфликтует, если начинается раньше, чем закончился самый
+поздний из предыдущих интервалов того же ресурса. Итого O(n log n) на сортировку,
+остальное - линейные операции над массивами; десятки миллионов строк
+проверяются за время чтения таблицы, поэтому проверку можно ставить на ночь:
+    python conflicts.py hotel.db              - отчёт, код возврата 1 при конфликтах
+    python conflicts.py autopark.db --guard   - включить защиту от новых конфликтов
+    python conflicts.py autopark.db --unguard - выключить её
+
+Защита - триггеры BEFORE INSERT / UPDATE, которые отклоняют запись,
+пересекающуюся с уже существующей. Они используют те же индексы (ресурс,
+начало) из миграций: среди непересекающихся интервалов ресурса достаточно
+проверить один - последний начавшийся раньше конца нового, поэтому
+проверка - один поиск по индексу. Даты в триггерах сравниваются как текст,
+в формате 'ГГГГ-ММ-ДД[ ЧЧ:ММ:СС]'.
+
+Интервал - [начало, конец): выезд в день заезда следующего гостя
+конфликтом не считается. Отменённые бронирования номер не занимают,
+незакрытая аренда (end_time IS NULL) длится бесконечно.
+"""
+import sqlite3
+import sys
+
+import numpy as np
+
+from fleet_utilization import EPOCH_SQL
+from occupancy import CANCELLED_STATUS
+
+CHUNK_ROWS = 1000000  # Строк в одной выборке group_concat
+
+OPEN_END = -1         # Конец не задан - интервал ещё идёт
+INVALID_TIME = -2     # Дата не распознана
+
+BOOKINGS = 'Bookings'
+USAGE = 'Usage'
+
+# Таблица: (ключ, ресурс, начало, конец, условие, название ресурса, название интервала)
+TABLES = {
+    BOOKINGS: ('id_booking', 'id_room', 'check_in', 'check_out', f"status IS NOT '{CANCELLED_STATUS}'",
+               'Номер', 'бронирование'),
+    USAGE: ('id_usage', 'id_vehicle', 'start_time', 'end_time', '1',
+            'Автомобиль', 'аренда'),
+}
+
+
+def _select_sql(table):
+    key, resource, start, end, condition = TABLES[table][:5]
+    # NULL в group_concat пропускается, поэтому все четыре столбца заполнены всегда
+    return f"""
+        SELECT group_concat({key}),
+               group_concat(COALESCE({resource}, {INVALID_TIME})),
+               group_concat(COALESCE({EPOCH_SQL.format(start)}, {INVALID_TIME})),
+               group_concat(CASE WHEN {end} IS NULL THEN {OPEN_END}
+                                 ELSE COALESCE({EPOCH_SQL.format(end)}, {INVALID_TIME}) END)
+        FROM {table}
+        WHERE {key} >= :low AND {key} < :high AND {condition}
+    """
+
+
+def load_intervals(conn, table, chunk_rows=CHUNK_ROWS):
+    """
+    Интервалы таблицы table: массивы (ключи, ресурсы, начала, концы) в секундах.
+    Строки с нераспознанными датами или без ресурса отбрасываются; возвращается
+    также их число.
+    """
+    key = TABLES[table][0]
+    low, high = conn.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}").fetchone()
+    parts = []
+    if low is not None:
+        sql = _select_sql(table)
+        for chunk_low in range(low, high + 1, chunk_rows):
+            columns = conn.execute(sql, {'low': chunk_low, 'high': chunk_low + chunk_rows}).fetchone()
+            parts.append([np.fromstring(column or '', dtype=np.int64, sep=',') for column in columns])
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return (empty, empty, empty, empty), 0
+    keys, resources, starts, ends = (np.concatenate(column) for column in zip(*parts))
+    valid = (resources != INVALID_TIME) & (starts != INVALID_TIME) & (ends != INVALID_TIME)
+    return (keys[valid], resources[valid], starts[valid], ends[valid]), int(len(keys) - valid.sum())
+
+
+def find_overlaps(resources, starts, ends):
+    """
+    Пересечения интервалов [начало, конец) одного ресурса; конец OPEN_END - бесконечность.
+    Возвращает позиции (раньше, позже): каждый интервал, который начинается до окончания
+    предыдущих интервалов своего ресурса, - один раз, в паре с тем из них, что заканчивается позже всех.
+    Из интервалов с одинаковым началом позже считается любой. Пустые интервалы
+    (конец не позже начала) пропускаются.
+    """
+    positions = np.nonzero((ends == OPEN_END) | (ends > starts))[0]
+    if len(positions) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    resources, starts, ends = resources[positions], starts[positions], ends[positions].copy()
+    base = starts.min()
+    ends[ends == OPEN_END] = max(starts.max(), ends.max()) + 1
+    span = ends.max() - base + 1
+
+    # Каждый ресурс сдвигается в свой отрезок оси времени: одна сортировка
+    # упорядочивает по (ресурс, начало), а накопленный максимум не переходит
+    # между ресурсами - начало следующего ресурса всегда позже конца предыдущего.
+    # Ключи ресурсов перенумеровываются, только если иначе сдвиг не помещается в int64
+    if resources.min() < 0 or int(resources.max()) * int(span) >= 2 ** 62:
+        resources = np.unique(resources, return_inverse=True)[1]
+    shift = resources.astype(np.int64) * span - base
+    starts, ends = starts + shift, ends + shift
+    order = np.argsort(starts)
+    starts, ends = starts[order], ends[order]
+
+    covered_until = np.maximum.accumulate(ends)
+    later = np.nonzero(starts[1:] < covered_until[:-1])[0] + 1
+    # Интервал, на котором достигнут максимум, - первая позиция с таким значением накопленного максимума
+    latest = np.searchsorted(covered_until, covered_until[later - 1])
+    return positions[order[latest]], positions[order[later]]
+
+
+def table_conflicts(conn, table, chunk_rows=CHUNK_ROWS):
+    """ Конфликты таблицы table: ([(ресурс, ключ раньше, ключ позже)], число пропущенных строк). """
+    (keys, resources, starts, ends), skipped = load_intervals(conn, table, chunk_rows)
+    earlier, later = find_overlaps(resources, starts, ends)
+    conflicts = list(zip(resources[later].tolist(), keys[earlier].tolist(), keys[later].tolist()))
+    return sorted(conflicts), skipped
+
+
+def describe(conn, table, conflicts):
+    """ Строки отчёта по конфликтам table_conflicts(). """
+    key, resource, start, end = TABLES[table][:4]
+    resource_name, interval_name = TABLES[table][5:]
+    ids = sorted({key_value for _, earlier, later in conflicts for key_value in (earlier, later)})
+    dates = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        dates.update((row[0], row[1:]) for row in conn.execute(
+            f"SELECT {key}, {start}, {end} FROM {table} WHERE {key} IN ({', '.join('?' * len(chunk))})", chunk))
+
+    def interval(key_value):
+        begin, finish = dates.get(key_value, ('?', '?'))
+        return f"{interval_name} {key_value} ({begin} - {finish or 'не закрыта'})"
+
+    return [f"{resource_name} {resource_value}: {interval(later)} пересекается с {interval(earlier)}"
+            for resource_value, earlier, later in conflicts]
+
+
+def _guard_trigger_sql(name, timing, when, message):
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS {name} {timing}
+        WHEN {when}
+        BEGIN
+            SELECT RAISE(ABORT, '{message}');
+        END;
+    """
+
+
+def _bookings_overlap_sql(same_row):
+    """ Последнее бронирование номера, начавшееся до выезда нового, заканчивается после его заезда. """
+    return f"""NEW.status IS NOT '{CANCELLED_STATUS}' AND (
+            SELECT b.check_out FROM Bookings b
+            WHERE b.id_room = NEW.id_room AND b.check_in < NEW.check_out
+              AND b.status IS NOT '{CANCELLED_STATUS}' {same_row}
+            ORDER BY b.check_in DESC LIMIT 1
+        ) > NEW.check_in"""
+
+
+def _usage_overlap_sql(same_row):
+    """ Последняя аренда автомобиля, начавшаяся до конца новой, заканчивается после её начала. """
+    return f"""(
+            SELECT COALESCE(u.end_time, '9999-12-31') FROM Usage u
+            WHERE u.id_vehicle = NEW.id_vehicle AND (NEW.end_time IS NULL OR u.start_time < NEW.end_time) {same_row}
+            ORDER BY u.start_time DESC LIMIT 1
+        ) > NEW.start_time"""
+
+
+GUARDS = {
+    BOOKINGS: [
+        _guard_trigger_sql('trg_guard_bookings_insert', 'BEFORE INSERT ON Bookings',
+                           _bookings_overlap_sql(''), 'Номер уже забронирован на эти даты'),
+        _guard_trigger_sql('trg_guard_bookings_update',
+                           'BEFORE UPDATE OF check_in, check_out, status, id_room ON Bookings',
+                           _bookings_overlap_sql('AND b.id_booking <> NEW.id_booking'), 'Номер уже забронирован на эти даты'),
+    ],
+    USAGE: [
+        _guard_trigger_sql('trg_guard_usage_insert', 'BEFORE INSERT ON Usage',
+                           _usage_overlap_sql(''), 'Автомобиль уже в аренде в это время'),
+        _guard_trigger_sql('trg_guard_usage_update',
+                           'BEFORE UPDATE OF start_time, end_time, id_vehicle ON Usage',
+                           _usage_overlap_sql('AND u.id_usage <> NEW.id_usage'), 'Автомобиль уже в аренде в это время'),
+    ],
+}
+
+
+def install_guard(conn, table):
+    """ Триггеры, отклоняющие новые конфликты в table. Существующие конфликты не проверяются. """
+    for sql in GUARDS[table]:
+        conn.executescript(sql)
+    conn.commit()
+
+
+def drop_guard(conn, table):
+    for event in ('insert', 'update'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_guard_{table.lower()}_{event}")
+    conn.commit()
+
+
+def present_tables(conn):
+    """ Проверяемые таблицы, которые есть в базе. """
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [table for table in TABLES if table in names]
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_filename = args[0] if args else 'hotel.db'
+    conn = sqlite3.connect(db_filename)
+    tables = present_tables(conn)
+    if '--guard' in sys.argv or '--unguard' in sys.argv:
+        for table in tables:
+            (install_guard if '--guard' in sys.argv else drop_guard)(conn, table)
+            print(f"{table}: защита {'включена' if '--guard' in sys.argv else 'выключена'}")
+        sys.exit(0)
+    total = 0
+    for table in tables:
+        conflicts, skipped = table_conflicts(conn, table)
+        for line in describe(conn, table, conflicts):
+            print(line)
+        print(f"{table}: конфликтов {len(conflicts)}" + (f", пропущено строк с неверными датами: {skipped}" if skipped else ""))
+        total += len(conflicts)
+    sys.exit(1 if total else 0)
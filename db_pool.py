@@ -0,0 +1,163 @@
+"""
+Общий слой доступа к SQLite для приложений гостиницы и автопарка.
+
+Вместо sqlite3.connect() на каждый вызов держим небольшой пул долгоживущих
+соединений на каждый файл базы данных. Поток получает соединение через
+connection(), вложенные вызовы в том же потоке используют то же самое
+соединение, а после выхода из самого внешнего блока оно возвращается в пул.
+Подготовленные выражения кэшируются самим sqlite3 на уровне соединения
+(параметр cached_statements), поэтому повторные запросы не компилируются заново.
+
+Пример:
+    with db_pool.connection(DB_FILENAME) as conn:
+        user = conn.execute("SELECT * FROM Users WHERE id=?", (user_id,)).fetchone()
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import query_stats
+
+POOL_SIZE = 4              # Сколько соединений максимум держим на один файл базы
+BUSY_TIMEOUT = 5.0         # Сколько секунд ждать снятия блокировки базы / свободного соединения
+STATEMENT_CACHE_SIZE = 256 # Размер кэша подготовленных выражений на одно соединение
+
+
+class ConnectionPool:
+    """ Пул соединений с одним файлом базы данных SQLite. """
+
+    def __init__(self, db_filename, size=POOL_SIZE, timeout=BUSY_TIMEOUT):
+        self.db_filename = db_filename
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # LIFO: чаще используем "тёплые" соединения
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_filename,
+            timeout=self.timeout,
+            check_same_thread=False,  # Соединение может переходить между потоками, но не одновременно
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=query_stats.connection_factory(),  # Замер запросов, если включён (QUERY_STATS=1)
+        )
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"Пул соединений для {self.db_filename} закрыт")
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Нет свободного соединения с {self.db_filename} за {self.timeout} с"
+            ) from None
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            # Незавершённая транзакция не должна "переехать" к следующему владельцу
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдаёт соединение текущему потоку.
+        Вложенные вызовы в одном потоке получают то же соединение.
+        При исключении незафиксированные изменения откатываются.
+        """
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None:
+            local.depth += 1
+            try:
+                yield conn
+            finally:
+                local.depth -= 1
+            return
+
+        conn = self._acquire()
+        local.conn = conn
+        local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            local.conn = None
+            local.depth = 0
+            self._release(conn)
+
+    def close(self):
+        """ Закрывает все соединения пула. """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_filename):
+    """ Возвращает (и при необходимости создаёт) пул для файла базы данных. """
+    key = os.path.abspath(db_filename)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key)
+                _pools[key] = pool
+    return pool
+
+
+def connection(db_filename):
+    """ Сокращение для get_pool(db_filename).connection(). """
+    return get_pool(db_filename).connection()
+
+
+def close_all():
+    """ Закрывает все пулы (вызывается автоматически при выходе из программы). """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_all)
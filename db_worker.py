@@ -0,0 +1,150 @@
+"""
+Выполнение запросов к базе вне главного потока tkinter.
+
+DbWorker запускает функции в пуле рабочих потоков, а результаты возвращает
+в главный поток: очередь результатов опрашивается через root.after, и
+обработчики on_done / on_error вызываются уже там, где можно трогать виджеты.
+Пока запрос выполняется, в окне показывается надпись "Загрузка...".
+
+Запрос, отправленный с ключом key, отменяет предыдущий запрос с тем же
+ключом: ещё не начатый не запускается, результат уже идущего отбрасывается.
+Так повторное открытие отчёта не выводит устаревшие данные.
+
+Соединения db_pool закреплены за потоком, поэтому каждый рабочий поток
+работает со своим соединением из пула.
+"""
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 2    # Рабочих потоков: длинный отчёт не задерживает вход в систему
+POLL_MS = 30   # Период опроса очереди результатов главным потоком
+LOADING_TEXT = "Загрузка..."
+
+
+class Job:
+    """ Запрос, отправленный в DbWorker. """
+
+    def __init__(self, key, loading_parent, loading_label):
+        self.key = key
+        self.loading_parent = loading_parent
+        self.loading_label = loading_label
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        """ Отменяет запрос: не начатый не выполнится, результат идущего не будет доставлен. """
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class DbWorker:
+    """ Пул потоков для запросов к базе с доставкой результатов через root.after. """
+
+    def __init__(self, root, workers=WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db_worker')
+        self.results = queue.Queue()
+        self.jobs_by_key = {}
+        self.lock = threading.Lock()
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None, loading_parent=None,
+               loading_text=LOADING_TEXT, **kwargs):
+        """
+        Выполняет func(*args, **kwargs) в рабочем потоке.
+        on_done(result) / on_error(exception) вызываются в главном потоке.
+        key - ключ для отмены устаревших запросов; loading_parent - окно,
+        в котором показывается надпись о загрузке (если его закроют до
+        окончания запроса, обработчики не вызываются); loading_text=None -
+        без надписи, например при тихом обновлении уже заполненного окна.
+        """
+        loading_label = None
+        if loading_parent is not None and loading_text is not None:
+            loading_label = tk.Label(loading_parent, text=loading_text)
+            loading_label.pack(side=tk.TOP, pady=5)
+
+        job = Job(key, loading_parent, loading_label)
+        if key is not None:
+            with self.lock:
+                previous = self.jobs_by_key.get(key)
+                self.jobs_by_key[key] = job
+            if previous is not None:
+                self.cancel_job(previous)
+
+        def run():
+            if job.cancelled:
+                return
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.results.put((job, None, e, on_done, on_error))
+            else:
+                self.results.put((job, result, None, on_done, on_error))
+
+        job.future = self.executor.submit(run)
+        return job
+
+    def cancel(self, key):
+        """ Отменяет текущий запрос с ключом key. """
+        with self.lock:
+            job = self.jobs_by_key.pop(key, None)
+        if job is not None:
+            self.cancel_job(job)
+
+    def cancel_job(self, job):
+        job.cancel()
+        self.hide_loading(job)
+
+    def hide_loading(self, job):
+        if job.loading_label is not None:
+            try:
+                job.loading_label.destroy()
+            except tk.TclError:
+                pass  # Окно уже закрыто
+            job.loading_label = None
+
+    @staticmethod
+    def window_exists(window):
+        if window is None:
+            return True
+        try:
+            return bool(window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def poll(self):
+        """ Доставляет готовые результаты в главном потоке и планирует следующий опрос. """
+        try:
+            while True:
+                job, result, error, on_done, on_error = self.results.get_nowait()
+                self.deliver(job, result, error, on_done, on_error)
+        except queue.Empty:
+            pass
+        if self.executor is not None:
+            self.root.after(self.poll_ms, self.poll)
+
+    def deliver(self, job, result, error, on_done, on_error):
+        if job.key is not None:
+            with self.lock:
+                if self.jobs_by_key.get(job.key) is job:
+                    del self.jobs_by_key[job.key]
+        self.hide_loading(job)
+        if job.cancelled or not self.window_exists(job.loading_parent):
+            return
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                self.root.report_callback_exception(type(error), error, error.__traceback__)
+        elif on_done is not None:
+            on_done(result)
+
+    def shutdown(self):
+        """ Останавливает пул; незапущенные запросы отменяются. """
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,216 @@
+"""
+Кэш разобранных книг Excel.
+
+pd.read_excel разбирает XML книги средствами openpyxl, и на больших файлах
+это основная часть времени импорта. read_excel() отсюда сохраняет уже
+разобранный DataFrame в Parquet (колоночный двоичный формат, читается за
+доли секунды) и при следующем импорте того же файла берёт его из кэша.
+
+Ключ записи - SHA-256 содержимого книги вместе с параметрами чтения. Чтобы не
+хешировать книгу при каждом запуске, для каждого пути запоминаются размер и
+mtime: если они не изменились, хеш берётся из индекса, иначе файл хешируется
+заново (книга, сохранённая без изменений или скопированная, по-прежнему
+найдётся в кэше). Если Parquet недоступен (нет pyarrow) или столбец не
+переводится в него (например, числа вперемешку с текстом), запись
+сохраняется в pickle.
+
+Кэш лежит в .excel_cache в корне проекта (EXCEL_CACHE_DIR - другой каталог).
+Давно не использованные записи удаляются, когда их больше MAX_ENTRIES или
+они занимают больше MAX_BYTES. Переменная EXCEL_CACHE=refresh заставляет
+разобрать книги заново, EXCEL_CACHE=off отключает кэш.
+
+    python excel_cache.py info                  - записи кэша
+    python excel_cache.py refresh file.xlsx ... - забыть записи этих книг
+    python excel_cache.py clear                 - очистить кэш
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get('EXCEL_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.excel_cache')
+CACHE_MODE = os.environ.get('EXCEL_CACHE', '')   # '' - обычный режим, 'refresh' - разобрать заново, 'off' - без кэша
+CACHE_VERSION = 1           # Меняется при изменении формата записей
+MAX_ENTRIES = 64
+MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+INDEX_FILENAME = 'index.json'
+
+
+def normalize_columns(df):
+    """ Имена столбцов как в таблицах базы: без пробелов по краям и точек, пробелы -> '_', нижний регистр. """
+    df.columns = (df.columns.astype(str).str.strip()
+                  .str.replace('.', '', regex=False)
+                  .str.replace(' ', '_', regex=False)
+                  .str.lower())
+    return df
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILENAME), encoding='utf-8') as file:
+            index = json.load(file)
+        if index.get('version') == CACHE_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'files': {}, 'entries': {}}
+
+
+def save_index(cache_dir, index):
+    """ Записывает индекс целиком через временный файл: параллельный импорт не прочитает его наполовину. """
+    temp_path = os.path.join(cache_dir, f"{INDEX_FILENAME}.{os.getpid()}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False)
+    os.replace(temp_path, os.path.join(cache_dir, INDEX_FILENAME))
+
+
+def source_hash(index, path):
+    """ Хеш содержимого книги: из индекса, если размер и mtime не изменились, иначе - заново. """
+    stat = os.stat(path)
+    known = index['files'].get(path)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+    sha256 = file_hash(path)
+    index['files'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return sha256
+
+
+def entry_key(sha256, normalize, read_kwargs):
+    """ Ключ записи: содержимое книги и всё, что влияет на результат разбора. """
+    params = repr((CACHE_VERSION, sha256, bool(normalize), sorted(read_kwargs.items())))
+    return hashlib.sha256(params.encode('utf-8')).hexdigest()[:32]
+
+
+def write_frame(cache_dir, key, df):
+    """ Сохраняет df в Parquet, а если не получается - в pickle. Возвращает имя файла. """
+    filename = f"{key}.parquet"
+    temp_path = os.path.join(cache_dir, f"{filename}.{os.getpid()}.tmp")
+    try:
+        df.to_parquet(temp_path, engine='pyarrow')
+    except (ImportError, ValueError, TypeError, NotImplementedError):
+        # Нет pyarrow или столбец смешанного типа: pickle сохраняет DataFrame как есть
+        filename = f"{key}.pkl"
+        df.to_pickle(temp_path)
+    os.replace(temp_path, os.path.join(cache_dir, filename))
+    return filename
+
+
+def read_frame(cache_dir, filename):
+    path = os.path.join(cache_dir, filename)
+    if filename.endswith('.parquet'):
+        return pd.read_parquet(path, engine='pyarrow')
+    return pd.read_pickle(path)
+
+
+def evict(cache_dir, index, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """ Удаляет давно не использованные записи сверх max_entries / max_bytes и сведения об удалённых книгах. """
+    entries = sorted(index['entries'].items(), key=lambda item: item[1]['used'], reverse=True)
+    kept, total = {}, 0
+    for key, entry in entries:
+        if len(kept) < max_entries and total + entry['bytes'] <= max_bytes:
+            kept[key] = entry
+            total += entry['bytes']
+        else:
+            try:
+                os.remove(os.path.join(cache_dir, entry['file']))
+            except OSError:
+                pass
+    index['entries'] = kept
+    index['files'] = {path: known for path, known in index['files'].items() if os.path.exists(path)}
+
+
+def read_excel(path, normalize=False, refresh=None, cache_dir=None, **read_kwargs):
+    """
+    pd.read_excel(path, **read_kwargs) через кэш; normalize - привести имена столбцов
+    normalize_columns(). refresh=True - разобрать книгу заново и обновить запись
+    (по умолчанию - если EXCEL_CACHE=refresh).
+    """
+    if CACHE_MODE == 'off':
+        df = pd.read_excel(path, **read_kwargs)
+        return normalize_columns(df) if normalize else df
+    if refresh is None:
+        refresh = CACHE_MODE == 'refresh'
+    cache_dir = cache_dir or CACHE_DIR
+    path = os.path.abspath(path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    index = load_index(cache_dir)
+    key = entry_key(source_hash(index, path), normalize, read_kwargs)
+    entry = index['entries'].get(key)
+    df = None
+    if entry is not None and not refresh:
+        try:
+            df = read_frame(cache_dir, entry['file'])
+        except (OSError, ValueError, pickle.UnpicklingError):
+            df = None   # Файл записи удалён или повреждён - разбираем книгу заново
+    if df is None:
+        df = pd.read_excel(path, **read_kwargs)
+        if normalize:
+            normalize_columns(df)
+        filename = write_frame(cache_dir, key, df)
+        entry = {'file': filename, 'bytes': os.path.getsize(os.path.join(cache_dir, filename)), 'source': path}
+
+    # Индекс перечитывается перед записью: между чтением и записью его мог обновить другой процесс
+    current = load_index(cache_dir)
+    current['files'][path] = index['files'][path]
+    current['entries'][key] = dict(entry, used=time.time())
+    evict(cache_dir, current)
+    save_index(cache_dir, current)
+    return df
+
+
+def invalidate(path, cache_dir=None):
+    """ Удаляет записи книги path: следующее чтение разберёт её заново. Возвращает число записей. """
+    cache_dir = cache_dir or CACHE_DIR
+    path = os.path.abspath(path)
+    index = load_index(cache_dir)
+    removed = [key for key, entry in index['entries'].items() if entry.get('source') == path]
+    for key in removed:
+        try:
+            os.remove(os.path.join(cache_dir, index['entries'].pop(key)['file']))
+        except OSError:
+            pass
+    index['files'].pop(path, None)
+    if os.path.isdir(cache_dir):
+        save_index(cache_dir, index)
+    return len(removed)
+
+
+def clear(cache_dir=None):
+    """ Удаляет все записи кэша. """
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return
+    for filename in os.listdir(cache_dir):
+        if filename == INDEX_FILENAME or filename.endswith(('.parquet', '.pkl', '.tmp')):
+            os.remove(os.path.join(cache_dir, filename))
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+    if command == 'clear':
+        clear()
+        print(f"Кэш {CACHE_DIR} очищен")
+    elif command == 'refresh':
+        for excel_path in sys.argv[2:]:
+            print(f"{excel_path}: удалено записей {invalidate(excel_path)}")
+    else:
+        index = load_index(CACHE_DIR)
+        for key, entry in sorted(index['entries'].items(), key=lambda item: -item[1]['used']):
+            used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['used']))
+            print(f"{entry['source']}  {entry['file']}  {entry['bytes'] / 1024:.0f} КБ  {used}")
+        total = sum(entry['bytes'] for entry in index['entries'].values())
+        print(f"Записей: {len(index['entries'])}, {total / 1024 / 1024:.1f} МБ в {CACHE_DIR}")
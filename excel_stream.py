@@ -0,0 +1,81 @@
+"""
+Потоковое чтение больших книг Excel пачками строк.
+
+pd.read_excel разбирает лист целиком и только потом отдаёт DataFrame, так что
+и память, и задержка до первой записи в базу растут вместе с файлом.
+iter_batches() открывает книгу openpyxl в режиме read_only (XML листа
+читается по мере обхода) и отдаёт DataFrame по batch_rows строк: значения
+уже типизированы openpyxl (числа, даты, текст), столбцы - из первой строки
+листа, как у pd.read_excel. Пачки можно сразу передавать в пакетные
+импортёры (room_import.import_rooms_batches, fleet_import.sync_table_batches):
+первые строки попадают в SQLite, пока остаток листа ещё не прочитан.
+
+В памяти одновременно - одна пачка, таблица общих строк книги
+(sharedStrings), которую openpyxl загружает целиком, и пустые элементы уже
+прочитанных строк (openpyxl очищает их, но не удаляет из дерева) - около
+80 байт на строку, не больше ~85 МБ на лист предельного размера Excel;
+pd.read_excel на той же книге занимает в несколько раз больше. Если в
+листе нет <dimension> (его не пишут потоковые генераторы, например openpyxl
+в режиме write_only), ширину листа узнаём, один раз просмотрев его
+целиком, и первая пачка появляется только после этого.
+"""
+import pandas as pd
+from openpyxl import load_workbook
+
+import excel_cache
+
+BATCH_ROWS = 5000
+
+
+def header_names(header):
+    """ Имена столбцов как у pd.read_excel: пустые - 'Unnamed: i', повторы - 'имя.1', 'имя.2'. """
+    names, seen = [], {}
+    for index, value in enumerate(header):
+        name = f"Unnamed: {index}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_batches(path, batch_rows=BATCH_ROWS, sheet=None, normalize=False):
+    """
+    DataFrame по batch_rows строк листа sheet (по умолчанию первого).
+    Полностью пустые строки пропускаются; normalize - имена столбцов через
+    excel_cache.normalize_columns(), как в кэше книг.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Ширина - по размерам листа, как у pd.read_excel: столбцы с пустой
+        # ячейкой в шапке, но с данными ниже, получают имя 'Unnamed: i'
+        if worksheet.max_column is None:
+            worksheet.calculate_dimension(force=True)
+        width = max(worksheet.max_column or 0, len(header))
+        columns = header_names(header + (None,) * (width - len(header)))
+
+        def frame(batch):
+            df = pd.DataFrame.from_records(batch, columns=columns)
+            return excel_cache.normalize_columns(df) if normalize else df
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            # В файлах без размеров листа строки бывают разной длины
+            row = row[:width] if len(row) >= width else row + (None,) * (width - len(row))
+            batch.append(row)
+            if len(batch) == batch_rows:
+                yield frame(batch)
+                batch = []
+        if batch:
+            yield frame(batch)
+    finally:
+        workbook.close()
@@ -0,0 +1,207 @@
+"""
+Средний доход с одного автомобиля (по брифингу заказчика): доход от аренды
+за период после вычета скидок и косвенных налогов, делённый на число дней,
+в которые автомобиль работал.
+
+Оплаты аренды хранятся в RentalPayments (ссылка на Usage и Vehicles).
+Триггеры на RentalPayments и Usage ведут суточную сводку VehicleDailyStats:
+чистый доход, число оплат и число аренд автомобиля за каждый день. Отчёт за
+любой период читает только диапазон первичного ключа сводки и не
+просматривает оплаты заново.
+
+Рабочий день - день, который задевает хотя бы одна аренда автомобиля
+(с даты начала по дату окончания включительно; незакрытая - только день начала).
+"""
+from datetime import datetime, timedelta
+
+import calendar_days
+
+sql_create_tables = """
+CREATE TABLE IF NOT EXISTS RentalPayments (
+    id_payment INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_usage INTEGER NOT NULL,
+    id_vehicle INTEGER NOT NULL,
+    payment_date TEXT NOT NULL,
+    amount REAL NOT NULL,          -- Сумма по договору
+    discount REAL DEFAULT 0,       -- Скидка
+    tax REAL DEFAULT 0,            -- Косвенные налоги (НДС и т.п.)
+    FOREIGN KEY (id_usage) REFERENCES Usage (id_usage),
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rental_payments_usage ON RentalPayments (id_usage);
+
+CREATE TABLE IF NOT EXISTS VehicleDailyStats (
+    day TEXT NOT NULL,             -- 'YYYY-MM-DD'
+    id_vehicle INTEGER NOT NULL,
+    net_revenue REAL NOT NULL DEFAULT 0,
+    payments_count INTEGER NOT NULL DEFAULT 0,
+    usage_count INTEGER NOT NULL DEFAULT 0, -- Аренд, задевающих этот день
+    PRIMARY KEY (day, id_vehicle)
+) WITHOUT ROWID;
+"""
+
+NET_AMOUNT_SQL = "({row}.amount - COALESCE({row}.discount, 0) - COALESCE({row}.tax, 0))"
+
+
+def _payment_sql(payment, sign):
+    """ Учитывает оплату payment (NEW / OLD) в сводке её дня со знаком sign. """
+    return f"""
+        INSERT INTO VehicleDailyStats (day, id_vehicle, net_revenue, payments_count)
+        VALUES (date({payment}.payment_date), {payment}.id_vehicle,
+                {sign} * {NET_AMOUNT_SQL.format(row=payment)}, {sign})
+        ON CONFLICT (day, id_vehicle) DO UPDATE SET
+            net_revenue = net_revenue + excluded.net_revenue,
+            payments_count = payments_count + excluded.payments_count;
+    """
+
+
+def _usage_sql(usage, sign):
+    """ Учитывает аренду usage (NEW / OLD) во всех днях, которые она задевает, со знаком sign. """
+    return f"""
+        INSERT INTO VehicleDailyStats (day, id_vehicle, usage_count)
+        SELECT c.day, {usage}.id_vehicle, {sign}
+        FROM Calendar c
+        WHERE {usage}.id_vehicle IS NOT NULL
+          AND c.day >= date({usage}.start_time)
+          AND c.day <= date(COALESCE({usage}.end_time, {usage}.start_time))
+        ON CONFLICT (day, id_vehicle) DO UPDATE SET usage_count = usage_count + excluded.usage_count;
+    """
+
+
+# Обнулившиеся строки сводки не нужны
+sql_drop_empty = """
+    DELETE FROM VehicleDailyStats
+    WHERE day >= date({row}.{begin}) AND day <= date(COALESCE({row}.{end}, {row}.{begin}))
+      AND id_vehicle = {row}.id_vehicle
+      AND payments_count = 0 AND usage_count = 0 AND ABS(net_revenue) < 1e-9;
+"""
+
+sql_create_triggers = f"""
+CREATE TRIGGER IF NOT EXISTS trg_daily_payment_insert AFTER INSERT ON RentalPayments
+BEGIN
+    {_payment_sql('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_payment_delete AFTER DELETE ON RentalPayments
+BEGIN
+    {_payment_sql('OLD', -1)}
+    {sql_drop_empty.format(row='OLD', begin='payment_date', end='payment_date')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_payment_update
+AFTER UPDATE OF id_vehicle, payment_date, amount, discount, tax ON RentalPayments
+BEGIN
+    {_payment_sql('OLD', -1)}
+    {_payment_sql('NEW', 1)}
+    {sql_drop_empty.format(row='OLD', begin='payment_date', end='payment_date')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_usage_insert AFTER INSERT ON Usage
+BEGIN
+    {_usage_sql('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_usage_delete AFTER DELETE ON Usage
+BEGIN
+    {_usage_sql('OLD', -1)}
+    {sql_drop_empty.format(row='OLD', begin='start_time', end='end_time')}
+END;
+
+-- Закрытие аренды (end_time) или исправление дат / автомобиля
+CREATE TRIGGER IF NOT EXISTS trg_daily_usage_update AFTER UPDATE OF id_vehicle, start_time, end_time ON Usage
+BEGIN
+    {_usage_sql('OLD', -1)}
+    {_usage_sql('NEW', 1)}
+    {sql_drop_empty.format(row='OLD', begin='start_time', end='end_time')}
+END;
+"""
+
+sql_rebuild = f"""
+INSERT INTO VehicleDailyStats (day, id_vehicle, net_revenue, payments_count, usage_count)
+SELECT day, id_vehicle, SUM(net_revenue), SUM(payments_count), SUM(usage_count)
+FROM (
+    SELECT date(p.payment_date) AS day, p.id_vehicle, {NET_AMOUNT_SQL.format(row='p')} AS net_revenue,
+           1 AS payments_count, 0 AS usage_count
+    FROM RentalPayments p
+    UNION ALL
+    SELECT c.day, u.id_vehicle, 0, 0, 1
+    FROM Usage u CROSS JOIN Calendar c -- CROSS JOIN: сначала аренды, затем их дни
+    WHERE u.id_vehicle IS NOT NULL
+      AND c.day >= date(u.start_time) AND c.day <= date(COALESCE(u.end_time, u.start_time))
+)
+GROUP BY day, id_vehicle
+"""
+
+
+def install(conn):
+    """
+    Создаёт RentalPayments, VehicleDailyStats, Calendar и триггеры.
+    Новая сводка сразу заполняется по уже существующим арендам и оплатам.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='VehicleDailyStats'"
+    ).fetchone()
+    calendar_days.ensure_calendar(conn)
+    conn.executescript(sql_create_tables)
+    conn.executescript(sql_create_triggers)
+    if not exists:
+        rebuild(conn)
+    conn.commit()
+
+
+def rebuild(conn):
+    """ Пересчитывает VehicleDailyStats целиком. Фиксацию выполняет вызывающий код. """
+    conn.execute("DELETE FROM VehicleDailyStats")
+    conn.execute(sql_rebuild)
+
+
+def add_payment(conn, id_usage, amount, discount=0, tax=0, payment_date=None):
+    """
+    Регистрирует оплату аренды id_usage; автомобиль берётся из Usage.
+    Возвращает id оплаты. Фиксацию выполняет вызывающий код.
+    """
+    row = conn.execute("SELECT id_vehicle FROM Usage WHERE id_usage=?", (id_usage,)).fetchone()
+    if row is None or row[0] is None:
+        raise ValueError(f"Аренда {id_usage} не найдена или не привязана к автомобилю")
+    payment_date = payment_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor = conn.execute(
+        "INSERT INTO RentalPayments (id_usage, id_vehicle, payment_date, amount, discount, tax) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (id_usage, row[0], payment_date, amount, discount, tax)
+    )
+    return cursor.lastrowid
+
+
+def average_revenue(conn, date_from, date_to):
+    """
+    Средний доход в рабочий день за [date_from, date_to) (даты 'YYYY-MM-DD').
+    Возвращает (по автомобилям, по автопарку):
+        [(id_vehicle, номер, модель, категория, чистый доход, рабочих дней, доход в день)]
+        (чистый доход, автомобиле-дней работы, доход в день)
+    """
+    stats = {row[0]: row[1:] for row in conn.execute("""
+        SELECT id_vehicle, SUM(net_revenue), SUM(usage_count > 0)
+        FROM VehicleDailyStats
+        WHERE day >= ? AND day < ?
+        GROUP BY id_vehicle
+    """, (date_from, date_to))}
+
+    by_vehicle = []
+    for id_vehicle, number, model, category in conn.execute(
+        "SELECT id_vehicle, vehicle_number, model, category FROM Vehicles ORDER BY vehicle_number"
+    ):
+        revenue, working_days = stats.get(id_vehicle, (0.0, 0))
+        per_day = revenue / working_days if working_days else 0.0
+        by_vehicle.append((id_vehicle, number, model, category, revenue, working_days, per_day))
+
+    total_revenue = sum(row[4] for row in by_vehicle)
+    total_days = sum(row[5] for row in by_vehicle)
+    return by_vehicle, (total_revenue, total_days, total_revenue / total_days if total_days else 0.0)
+
+
+def average_revenue_as_of(conn, as_of, period_days=30):
+    """ То же за period_days суток, заканчивая днём as_of включительно ('YYYY-MM-DD'). """
+    date_to = datetime.strptime(as_of, "%Y-%m-%d") + timedelta(days=1)
+    date_from = date_to - timedelta(days=period_days)
+    return average_revenue(conn, date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"))
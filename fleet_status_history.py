@@ -0,0 +1,276 @@
+"""
+История статусов автопарка и "Отчет по состоянию автопарка на дату".
+
+В Vehicles хранится только текущее состояние, поэтому каждое изменение
+(добавление, смена статуса / даты возврата / категории, удаление) триггеры
+дописывают в журнал VehicleStatusEvents. Журнал только пополняется: изменение
+и удаление его строк запрещены триггерами.
+
+Раз в CHECKPOINT_EVERY событий состояние всего автопарка сохраняется
+контрольной точкой. Состояние на прошедшую дату - ближайшая предыдущая
+точка плюс события после неё, то есть не больше CHECKPOINT_EVERY строк
+журнала при любой длине истории. Точки создаются импортами после каждой
+фиксации и приложением при изменении автопарка (maybe_checkpoint).
+
+История начинается с первой контрольной точки (установка журнала); состояние
+на более раннюю дату неизвестно, и status_on в этом случае поднимает ValueError.
+
+    python fleet_status_history.py ДД.ММ.ГГГГ [autopark.db] [файл отчета]
+"""
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+CHECKPOINT_EVERY = 5000  # Событий между контрольными точками
+
+sql_create_tables = """
+CREATE TABLE IF NOT EXISTS VehicleStatusEvents (
+    id_event INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_vehicle INTEGER NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    vehicle_number TEXT,
+    model TEXT,
+    category TEXT,
+    status TEXT,
+    return_date TEXT,          -- 'YYYY-MM-DD'
+    is_deleted INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS VehicleStatusCheckpoints (
+    id_checkpoint INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at TEXT NOT NULL,
+    last_event_id INTEGER NOT NULL -- Точка включает все события с id_event <= last_event_id
+);
+
+CREATE INDEX IF NOT EXISTS idx_status_checkpoints_taken_at ON VehicleStatusCheckpoints (taken_at);
+
+CREATE TABLE IF NOT EXISTS VehicleStatusCheckpointRows (
+    id_checkpoint INTEGER NOT NULL,
+    id_vehicle INTEGER NOT NULL,
+    vehicle_number TEXT,
+    model TEXT,
+    category TEXT,
+    status TEXT,
+    return_date TEXT,
+    PRIMARY KEY (id_checkpoint, id_vehicle),
+    FOREIGN KEY (id_checkpoint) REFERENCES VehicleStatusCheckpoints (id_checkpoint)
+) WITHOUT ROWID;
+"""
+
+
+def _event_sql(row, is_deleted):
+    """ Запись в журнал полного состояния автомобиля row (NEW / OLD). """
+    return f"""
+        INSERT INTO VehicleStatusEvents (id_vehicle, vehicle_number, model, category, status, return_date, is_deleted)
+        VALUES ({row}.id_vehicle, {row}.vehicle_number, {row}.model, {row}.category,
+                {row}.status, {row}.return_date, {is_deleted});
+    """
+
+
+sql_create_triggers = f"""
+CREATE TRIGGER IF NOT EXISTS trg_status_events_insert AFTER INSERT ON Vehicles
+BEGIN
+    {_event_sql('NEW', 0)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_status_events_update
+AFTER UPDATE OF vehicle_number, model, category, status, return_date ON Vehicles
+WHEN OLD.vehicle_number IS NOT NEW.vehicle_number OR OLD.model IS NOT NEW.model
+  OR OLD.category IS NOT NEW.category OR OLD.status IS NOT NEW.status
+  OR OLD.return_date IS NOT NEW.return_date
+BEGIN
+    {_event_sql('NEW', 0)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_status_events_delete AFTER DELETE ON Vehicles
+BEGIN
+    {_event_sql('OLD', 1)}
+END;
+
+-- Журнал только дописывается
+CREATE TRIGGER IF NOT EXISTS trg_status_events_no_update BEFORE UPDATE ON VehicleStatusEvents
+BEGIN
+    SELECT RAISE(ABORT, 'Журнал статусов нельзя изменять');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_status_events_no_delete BEFORE DELETE ON VehicleStatusEvents
+BEGIN
+    SELECT RAISE(ABORT, 'Журнал статусов нельзя изменять');
+END;
+"""
+
+
+def install(conn):
+    """
+    Добавляет в Vehicles столбец return_date (если его нет), создаёт журнал,
+    таблицы контрольных точек и триггеры. При первой установке текущее
+    состояние автопарка сохраняется начальной контрольной точкой.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(Vehicles)")}
+    if 'return_date' not in columns:
+        conn.execute("ALTER TABLE Vehicles ADD COLUMN return_date TEXT")
+    conn.executescript(sql_create_tables)
+    conn.executescript(sql_create_triggers)
+    if conn.execute("SELECT 1 FROM VehicleStatusCheckpoints LIMIT 1").fetchone() is None:
+        create_checkpoint(conn)
+    conn.commit()
+
+
+def create_checkpoint(conn):
+    """
+    Сохраняет текущее состояние Vehicles контрольной точкой.
+    Триггеры пишут каждое изменение, поэтому Vehicles совпадает с журналом
+    на момент последнего события. Возвращает id точки; фиксацию выполняет вызывающий код.
+    """
+    last_event_id = conn.execute("SELECT COALESCE(MAX(id_event), 0) FROM VehicleStatusEvents").fetchone()[0]
+    cursor = conn.execute(
+        "INSERT INTO VehicleStatusCheckpoints (taken_at, last_event_id) VALUES (?, ?)",
+        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), last_event_id)
+    )
+    id_checkpoint = cursor.lastrowid
+    conn.execute("""
+        INSERT INTO VehicleStatusCheckpointRows
+            (id_checkpoint, id_vehicle, vehicle_number, model, category, status, return_date)
+        SELECT ?, id_vehicle, vehicle_number, model, category, status, return_date FROM Vehicles
+    """, (id_checkpoint,))
+    return id_checkpoint
+
+
+def maybe_checkpoint(conn, every=CHECKPOINT_EVERY):
+    """
+    Создаёт контрольную точку, если после предыдущей накопилось every событий.
+    В базе без журнала статусов ничего не делает.
+    """
+    if history_start(conn) is None:
+        return False
+    pending = conn.execute("""
+        SELECT COUNT(*) FROM VehicleStatusEvents
+        WHERE id_event > (SELECT COALESCE(MAX(last_event_id), 0) FROM VehicleStatusCheckpoints)
+    """).fetchone()[0]
+    if pending >= every:
+        create_checkpoint(conn)
+        conn.commit()
+        return True
+    return False
+
+
+def history_start(conn):
+    """ Время первой контрольной точки ('YYYY-MM-DD HH:MM:SS') или None, если журнал не установлен. """
+    installed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'VehicleStatusCheckpoints'"
+    ).fetchone()
+    if installed is None:
+        return None
+    return conn.execute("SELECT MIN(taken_at) FROM VehicleStatusCheckpoints").fetchone()[0]
+
+
+def status_on(conn, moment):
+    """
+    Состояние автопарка на момент moment ('YYYY-MM-DD HH:MM:SS', включительно).
+    Возвращает [(id_vehicle, номер, модель, категория, статус, дата возврата)]
+    в порядке id_vehicle. Момент раньше начала истории - ValueError.
+    """
+    start = history_start(conn)
+    if start is None:
+        raise ValueError("История статусов автопарка в этой базе не ведётся")
+    if moment < start:
+        raise ValueError(f"История статусов ведётся с {format_date(start)}, состояние на более раннюю дату неизвестно")
+    checkpoint = conn.execute("""
+        SELECT id_checkpoint, last_event_id FROM VehicleStatusCheckpoints
+        WHERE taken_at <= ? ORDER BY taken_at DESC, id_checkpoint DESC LIMIT 1
+    """, (moment,)).fetchone()
+
+    state = {}
+    last_event_id = 0
+    if checkpoint is not None:
+        id_checkpoint, last_event_id = checkpoint
+        for row in conn.execute("""
+            SELECT id_vehicle, vehicle_number, model, category, status, return_date
+            FROM VehicleStatusCheckpointRows WHERE id_checkpoint = ?
+        """, (id_checkpoint,)):
+            state[row[0]] = row
+
+    # Все события до moment лежат не дальше следующей точки, поэтому читается
+    # только диапазон первичного ключа между двумя точками
+    next_checkpoint = conn.execute("""
+        SELECT last_event_id FROM VehicleStatusCheckpoints
+        WHERE taken_at > ? ORDER BY taken_at, id_checkpoint LIMIT 1
+    """, (moment,)).fetchone()
+    upper_event_id = next_checkpoint[0] if next_checkpoint else sys.maxsize
+
+    for *row, is_deleted in conn.execute("""
+        SELECT id_vehicle, vehicle_number, model, category, status, return_date, is_deleted
+        FROM VehicleStatusEvents
+        WHERE id_event > ? AND id_event <= ? AND changed_at <= ?
+        ORDER BY id_event
+    """, (last_event_id, upper_event_id, moment)):
+        if is_deleted:
+            state.pop(row[0], None)
+        else:
+            state[row[0]] = tuple(row)
+
+    return [state[key] for key in sorted(state)]
+
+
+def format_date(iso_date):
+    """ 'YYYY-MM-DD' -> 'ДД.ММ.ГГГГ'; пустое значение - пустая строка. """
+    if not iso_date:
+        return ''
+    try:
+        return datetime.strptime(iso_date[:10], "%Y-%m-%d").strftime("%d.%m.%Y")
+    except ValueError:
+        return iso_date
+
+
+def report_lines(rows, report_date):
+    """
+    Строки отчёта в формате заказчика (разделитель - табуляция): заголовок с датой,
+    шапка таблицы, затем по каждой категории строка-раздел и её автомобили.
+    Категории идут в порядке первого автомобиля категории.
+    """
+    lines = [
+        f"Отчет по состоянию автопарка на {report_date.strftime('%d.%m.%Y')}\t\t\t",
+        "\t\t\t",
+        "Номер\tАвтомобиль\tСтатус\tДата возврата",
+    ]
+    by_category = {}
+    for _, number, model, category, status, return_date in rows:
+        by_category.setdefault(category or '', []).append((number, model, status or '', format_date(return_date)))
+    for category, vehicles in by_category.items():
+        lines.append(f"{category}\t\t\t")
+        lines.extend('\t'.join(vehicle) for vehicle in vehicles)
+    return lines
+
+
+def build_report(conn, report_date):
+    """ Отчёт на дату report_date (datetime / 'ДД.ММ.ГГГГ'): состояние на конец этого дня. """
+    if isinstance(report_date, str):
+        report_date = datetime.strptime(report_date, "%d.%m.%Y")
+    end_of_day = report_date.replace(hour=0, minute=0, second=0) + timedelta(days=1, seconds=-1)
+    return report_lines(status_on(conn, end_of_day.strftime("%Y-%m-%d %H:%M:%S")), report_date)
+
+
+def write_report(conn, report_date, path):
+    """ Сохраняет отчёт в TXT как у заказчика: UTF-8, строки через CRLF. """
+    lines = build_report(conn, report_date)
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python fleet_status_history.py ДД.ММ.ГГГГ [autopark.db] [файл отчета]")
+        sys.exit(1)
+    conn = sqlite3.connect(sys.argv[2] if len(sys.argv) > 2 else 'autopark.db')
+    install(conn)
+    try:
+        if len(sys.argv) > 3:
+            write_report(conn, sys.argv[1], sys.argv[3])
+            print(f"Отчет сохранен в {sys.argv[3]}")
+        else:
+            print('\n'.join(build_report(conn, sys.argv[1])))
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
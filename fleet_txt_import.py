@@ -0,0 +1,293 @@
+"""
+Потоковый импорт выгрузок заказчика в формате TXT (разделитель - табуляция).
+
+Поддерживаются три формата из папки 'Документы заказчика':
+    Автопарк.txt                    - Категория / Марка / Номерной знак
+    Данные по пробегу.txt           - Категория / Марка / Номерной знак / Пробег ("34578,0")
+    Отчет по автопарку на дату.txt  - заголовок с датой, строки-разделы с категорией,
+                                      затем Номер / Автомобиль / Статус / Дата возврата
+
+Файл читается построчно генераторами, строки группируются в пачки по
+BATCH_SIZE и пишутся через executemany, фиксация - каждые COMMIT_EVERY строк.
+Память не зависит от размера файла, поэтому многогигабайтные выгрузки
+импортируются без загрузки в ОЗУ.
+
+Повторный импорт не дублирует строки: пробег уникален по (автомобиль, дата
+показания), отчёт - по (дата отчёта, автомобиль), совпадающие строки
+обновляются. В выгрузке пробега нет даты, показание датируется днём импорта;
+если пробег автомобиля не изменился с последнего показания, новое не
+записывается, поэтому повторный импорт того же файла в другой день тоже
+ничего не добавляет.
+"""
+import itertools
+import logging
+import re
+from datetime import datetime
+
+import fleet_status_history
+
+BATCH_SIZE = 5000      # Строк в одном executemany
+COMMIT_EVERY = 100000  # Фиксировать транзакцию каждые N строк
+ENCODING = 'utf-8-sig' # Выгрузки в UTF-8, возможно с BOM
+
+KIND_AUTOPARK = 'autopark'
+KIND_MILEAGE = 'mileage'
+KIND_REPORT = 'report'
+
+log = logging.getLogger(__name__)
+
+sql_create_tables = """
+CREATE TABLE IF NOT EXISTS Vehicles (
+    id_vehicle INTEGER PRIMARY KEY AUTOINCREMENT,
+    vehicle_number TEXT UNIQUE NOT NULL,
+    model TEXT NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT DEFAULT 'Свободен',
+    total_hours REAL DEFAULT 0,
+    return_date TEXT
+);
+
+-- Показания пробега из "Данные по пробегу"
+CREATE TABLE IF NOT EXISTS VehicleMileage (
+    id_mileage INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_vehicle INTEGER NOT NULL,
+    mileage REAL NOT NULL,
+    recorded_on TEXT NOT NULL,
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+
+-- Строки "Отчета по автопарку на дату"
+CREATE TABLE IF NOT EXISTS FleetStatusReport (
+    id_report_row INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_date TEXT NOT NULL,
+    id_vehicle INTEGER NOT NULL,
+    status TEXT,
+    return_date TEXT,
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+"""
+
+# Строки, повторённые прежними импортами, удаляются перед созданием ключей (остаётся последняя)
+sql_create_keys = """
+DELETE FROM VehicleMileage WHERE id_mileage NOT IN
+    (SELECT MAX(id_mileage) FROM VehicleMileage GROUP BY id_vehicle, recorded_on);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mileage_vehicle_date ON VehicleMileage (id_vehicle, recorded_on);
+DELETE FROM FleetStatusReport WHERE id_report_row NOT IN
+    (SELECT MAX(id_report_row) FROM FleetStatusReport GROUP BY report_date, id_vehicle);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_report_date_vehicle ON FleetStatusReport (report_date, id_vehicle);
+"""
+
+# Автомобили из пробега и отчёта, которых ещё нет в справочнике, добавляются по номеру
+sql_insert_vehicle = "INSERT OR IGNORE INTO Vehicles (vehicle_number, model, category) VALUES (?, ?, ?)"
+# Показание пишется, только если отличается от последнего на эту дату или раньше
+sql_insert_mileage = """
+INSERT INTO VehicleMileage (id_vehicle, mileage, recorded_on)
+SELECT ?1, ?2, ?3
+WHERE ?2 IS NOT (SELECT mileage FROM VehicleMileage WHERE id_vehicle = ?1 AND recorded_on <= ?3
+                 ORDER BY recorded_on DESC LIMIT 1)
+ON CONFLICT (id_vehicle, recorded_on) DO UPDATE SET mileage = excluded.mileage
+"""
+sql_insert_report = """
+INSERT INTO FleetStatusReport (report_date, id_vehicle, status, return_date) VALUES (?, ?, ?, ?)
+ON CONFLICT (report_date, id_vehicle) DO UPDATE SET status = excluded.status, return_date = excluded.return_date
+"""
+
+REPORT_DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')
+
+
+def parse_decimal(text):
+    """ '34578,0' / '1 234,5' -> float; пустая строка -> None. """
+    text = text.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    return float(text) if text else None
+
+
+def parse_date(text):
+    """ 'ДД.ММ.ГГГГ' -> 'ГГГГ-ММ-ДД'; пустая или ошибочная дата (например '02.02.205') -> None. """
+    try:
+        return datetime.strptime(text.strip(), "%d.%m.%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def iter_fields(path, encoding=ENCODING):
+    """
+    Построчно отдаёт списки полей, пустые строки пропускаются.
+    Разделитель - табуляция; файлы старого формата без табуляций в первой
+    строке (Номер,Модель,Категория) читаются с разделителем-запятой.
+    """
+    with open(path, 'r', encoding=encoding, newline='') as file:
+        delimiter = None
+        for line in file:
+            line = line.rstrip('\r\n')
+            if delimiter is None:
+                delimiter = '\t' if '\t' in line or ',' not in line else ','
+            fields = [field.strip() for field in line.split(delimiter)]
+            if any(fields):
+                yield fields
+
+
+def detect_kind(path, encoding=ENCODING):
+    """ Определяет формат выгрузки по первой непустой строке. """
+    return kind_of(next(iter_fields(path, encoding), []))
+
+
+def kind_of(first):
+    """ Формат выгрузки по полям её первой непустой строки. """
+    if first and first[0].startswith('Отчет'):
+        return KIND_REPORT
+    if 'Пробег' in first:
+        return KIND_MILEAGE
+    return KIND_AUTOPARK
+
+
+def parse_autopark(path, encoding=ENCODING, rows=None):
+    """
+    Отдаёт (номер, марка, категория) из Автопарк.txt; порядок столбцов берётся из заголовка.
+    rows - уже разобранные строки полей (например, листа Excel) вместо чтения path; так же у остальных parse_*.
+    """
+    rows = iter(rows) if rows is not None else iter_fields(path, encoding)
+    header = next(rows, [])
+    number_col = next((header.index(name) for name in ('Номерной знак', 'Номер') if name in header), 2)
+    model_col = next((header.index(name) for name in ('Марка', 'Модель') if name in header), 1)
+    category_col = header.index('Категория') if 'Категория' in header else 0
+    width = max(number_col, model_col, category_col) + 1
+    for fields in rows:
+        if len(fields) < width:
+            continue  # Неполная строка
+        yield fields[number_col], fields[model_col], fields[category_col]
+
+
+def parse_mileage(path, encoding=ENCODING, rows=None):
+    """ Отдаёт (номер, марка, категория, пробег) из 'Данные по пробегу.txt'. """
+    for fields in rows if rows is not None else iter_fields(path, encoding):
+        if fields[0] == 'Категория' or len(fields) < 4:
+            continue
+        category, model, number, mileage = fields[:4]
+        try:
+            value = parse_decimal(mileage)
+        except ValueError:
+            log.warning("Пробег '%s' автомобиля %s не распознан, строка пропущена", mileage, number)
+            continue
+        if value is not None:
+            yield number, model, category, value
+
+
+def parse_report(path, encoding=ENCODING, rows=None):
+    """
+    Отдаёт (дата отчёта, номер, марка, категория, статус, дата возврата)
+    из 'Отчет по автопарку на дату.txt'. Строка, где заполнено только первое
+    поле, задаёт категорию для следующих строк.
+    """
+    report_date = None
+    category = None
+    for fields in rows if rows is not None else iter_fields(path, encoding):
+        fields += [''] * (4 - len(fields))
+        if fields[0].startswith('Отчет'):
+            match = REPORT_DATE_RE.search(fields[0])
+            report_date = parse_date(match.group(1)) if match else None
+        elif fields[0] == 'Номер':
+            continue  # Заголовок таблицы
+        elif not any(fields[1:]):
+            category = fields[0]
+        else:
+            number, model, status, return_date = fields[:4]
+            yield report_date, number, model, category, status or None, parse_date(return_date)
+
+
+def install(conn):
+    """ Создаёт таблицы выгрузок и их уникальные ключи; повторный вызов ничего не меняет. """
+    conn.executescript(sql_create_tables)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_report_date_vehicle'").fetchone() is None:
+        conn.executescript(sql_create_keys)
+    conn.commit()
+
+
+class VehicleIds:
+    """
+    Кэш соответствия гос. номер -> id_vehicle на время импорта.
+    Растёт с числом автомобилей, а не строк файла; неизвестные номера
+    добавляются в Vehicles одной пачкой.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.ids = {}
+
+    def resolve(self, vehicles):
+        """ vehicles - пары (номер, (марка, категория)); возвращает словарь номер -> id. """
+        missing = {number: info for number, info in vehicles if number not in self.ids}
+        if missing:
+            self.cursor.executemany(sql_insert_vehicle, ((number, model, category or '')
+                                                         for number, (model, category) in missing.items()))
+            numbers = list(missing)
+            for start in range(0, len(numbers), 500):  # Ограничение на число параметров в запросе
+                chunk = numbers[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT vehicle_number, id_vehicle FROM Vehicles WHERE vehicle_number IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                self.ids.update(self.cursor.fetchall())
+        return self.ids
+
+
+def write_autopark(vehicle_ids, batch, today):
+    vehicle_ids.resolve((number, (model, category)) for number, model, category in batch)
+
+
+def write_mileage(vehicle_ids, batch, today):
+    ids = vehicle_ids.resolve((number, (model, category)) for number, model, category, _ in batch)
+    vehicle_ids.cursor.executemany(sql_insert_mileage, ((ids[number], mileage, today)
+                                                        for number, _, _, mileage in batch))
+
+
+def write_report(vehicle_ids, batch, today):
+    ids = vehicle_ids.resolve((number, (model, category)) for _, number, model, category, _, _ in batch)
+    vehicle_ids.cursor.executemany(sql_insert_report, ((report_date or today, ids[number], status, return_date)
+                                                       for report_date, number, _, _, status, return_date in batch))
+
+
+FORMATS = {
+    KIND_AUTOPARK: (parse_autopark, write_autopark),
+    KIND_MILEAGE: (parse_mileage, write_mileage),
+    KIND_REPORT: (parse_report, write_report),
+}
+
+
+def batched(rows, size):
+    """ Разбивает поток строк на списки по size штук. """
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_txt(conn, path, kind=None, encoding=ENCODING, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY):
+    """
+    Импортирует выгрузку path в базу. Формат определяется автоматически, если kind не задан.
+    Возвращает количество прочитанных строк данных.
+    """
+    kind = kind or detect_kind(path, encoding)
+    parser, writer = FORMATS[kind]
+    install(conn)
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    vehicle_ids = VehicleIds(conn.cursor())
+    total = 0
+    since_commit = 0
+    try:
+        for batch in batched(parser(path, encoding), batch_size):
+            writer(vehicle_ids, batch, today)
+            total += len(batch)
+            since_commit += len(batch)
+            if since_commit >= commit_every:
+                conn.commit()
+                fleet_status_history.maybe_checkpoint(conn)
+                since_commit = 0
+        conn.commit()
+        fleet_status_history.maybe_checkpoint(conn)
+    except BaseException:
+        conn.rollback()
+        raise
+    return total
@@ -0,0 +1,135 @@
+"""
+Процент загрузки автомобилей на дату (по брифингу заказчика): отношение
+арендованных часов к часам, в течение которых автомобиль мог быть арендован.
+
+Окно расчёта - [as_of - window_days, as_of). Интервалы из Usage обрезаются по
+окну, незакрытая аренда (end_time IS NULL) считается длящейся до as_of,
+пересекающиеся аренды одного автомобиля не считаются дважды. Расчёт
+векторизован в NumPy: из базы одним запросом читаются только интервалы,
+задевающие окно, дальше - сортировка, накопленный максимум и bincount.
+
+Интервалы читаются тремя строками group_concat (id, начало, конец в секундах)
+и разбираются np.fromstring: на год истории тысяч автомобилей (порядка
+миллиона аренд) построчная выборка кортежей Python стоила бы больше, чем
+весь остальной расчёт.
+"""
+import calendar
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+
+WINDOW_DAYS = 30  # Окно по умолчанию
+
+OPEN_END = -1     # end_time IS NULL - аренда ещё идёт
+INVALID_TIME = -2 # Дата не распознана
+
+# unixepoch() (SQLite 3.38+) заметно быстрее strftime('%s', ...) на миллионе строк
+EPOCH_SQL = "unixepoch({})" if sqlite3.sqlite_version_info >= (3, 38) else "strftime('%s', {})"
+
+# NULL в group_concat пропускается, поэтому все три столбца заполнены всегда
+sql_select_usage = f"""
+SELECT group_concat(COALESCE(id_vehicle, {INVALID_TIME})),
+       group_concat(COALESCE({EPOCH_SQL.format('start_time')}, {INVALID_TIME})),
+       group_concat(CASE WHEN end_time IS NULL THEN {OPEN_END}
+                         ELSE COALESCE({EPOCH_SQL.format('end_time')}, {INVALID_TIME}) END)
+FROM Usage
+WHERE start_time < :to_text AND (end_time IS NULL OR end_time >= :from_text)
+"""
+
+
+def parse_as_of(as_of):
+    """
+    Момент расчёта: datetime, 'ГГГГ-ММ-ДД ЧЧ:ММ:СС' или 'ГГГГ-ММ-ДД'
+    (дата без времени включается целиком - окно заканчивается в полночь следующего дня).
+    None - текущий момент.
+    """
+    if as_of is None:
+        return datetime.now().replace(microsecond=0)
+    if isinstance(as_of, datetime):
+        return as_of
+    text = str(as_of).strip()
+    if len(text) == 10:
+        return datetime.strptime(text, "%Y-%m-%d") + timedelta(days=1)
+    return datetime.strptime(text[:19].replace('T', ' '), "%Y-%m-%d %H:%M:%S")
+
+
+def to_seconds(moment):
+    """ Секунды так же, как strftime('%s', ...) в SQLite: время без пояса считается UTC. """
+    return float(calendar.timegm(moment.timetuple()))
+
+
+def merged_hours(vehicle_index, starts, ends, vehicles_count, window_start, window_length):
+    """
+    Сумма длин объединения интервалов по каждому автомобилю, в часах.
+    Интервалы уже обрезаны по окну [window_start, window_start + window_length].
+    """
+    # Сдвигаем каждый автомобиль в свой отрезок оси времени: одна сортировка
+    # упорядочивает по (автомобиль, начало), а накопленный максимум по всему
+    # массиву не переходит между автомобилями
+    shift = vehicle_index * (window_length + 1.0) - window_start
+    starts, ends = starts + shift, ends + shift
+    order = np.argsort(starts, kind='stable')
+    vehicle_index, starts, ends = vehicle_index[order], starts[order], ends[order]
+    covered_until = np.maximum.accumulate(ends)
+    previous = np.concatenate(([-np.inf], covered_until[:-1]))
+    covered = np.clip(ends - np.maximum(starts, previous), 0, None)
+    return np.bincount(vehicle_index, weights=covered, minlength=vehicles_count) / 3600.0
+
+
+def utilization(conn, as_of=None, window_days=WINDOW_DAYS):
+    """
+    Загрузка автопарка (таблицы Vehicles / Usage) за окно window_days суток до as_of.
+    Возвращает (по автомобилям, по категориям):
+        [(id_vehicle, номер, модель, категория, часов в аренде, доступно часов, процент, число аренд)]
+        [(категория, автомобилей, часов в аренде, доступно часов, процент)]
+    """
+    window_end = parse_as_of(as_of)
+    window_begin = window_end - timedelta(days=window_days)
+    window_start = to_seconds(window_begin)
+    window_length = to_seconds(window_end) - window_start
+
+    vehicles = conn.execute(
+        "SELECT id_vehicle, vehicle_number, model, category FROM Vehicles ORDER BY id_vehicle"
+    ).fetchall()
+    if not vehicles:
+        return [], []
+    vehicle_ids = np.array([row[0] for row in vehicles], dtype=np.int64)
+
+    # Текстовый фильтр с запасом в сутки (формат дат в Usage может отличаться), точная обрезка - ниже
+    columns = conn.execute(sql_select_usage, {
+        'from_text': (window_begin - timedelta(days=1)).strftime("%Y-%m-%d"),
+        'to_text': (window_end + timedelta(days=1)).strftime("%Y-%m-%d"),
+    }).fetchone()
+    ids, starts, ends = (np.fromstring(column or '', dtype=np.int64, sep=',') for column in columns)
+    valid = (ids >= 0) & (starts >= 0) & (ends != INVALID_TIME)
+    ids, starts, ends = ids[valid], starts[valid].astype(float), ends[valid].astype(float)
+    ends[ends == OPEN_END] = window_start + window_length
+
+    starts = np.maximum(starts, window_start)
+    ends = np.minimum(ends, window_start + window_length)
+    position = np.minimum(np.searchsorted(vehicle_ids, ids), len(vehicle_ids) - 1)
+    # Аренды неизвестных автомобилей и не попавшие в окно отбрасываются
+    keep = (vehicle_ids[position] == ids) & (ends > starts)
+    vehicle_index, starts, ends = position[keep], starts[keep], ends[keep]
+
+    rented = merged_hours(vehicle_index, starts, ends, len(vehicles), window_start, window_length)
+    usage_count = np.bincount(vehicle_index, minlength=len(vehicles))
+    available = np.full(len(vehicles), window_length / 3600.0)
+    percent = rented / available * 100 if window_length > 0 else np.zeros(len(vehicles))
+
+    by_vehicle = [
+        (row[0], row[1], row[2], row[3], float(rented[i]), float(available[i]), float(percent[i]), int(usage_count[i]))
+        for i, row in enumerate(vehicles)
+    ]
+
+    categories, category_index = np.unique([row[3] or '' for row in vehicles], return_inverse=True)
+    category_rented = np.bincount(category_index, weights=rented, minlength=len(categories))
+    category_available = np.bincount(category_index, weights=available, minlength=len(categories))
+    category_count = np.bincount(category_index, minlength=len(categories))
+    by_category = [
+        (str(name), int(category_count[i]), float(category_rented[i]), float(category_available[i]),
+         float(category_rented[i] / category_available[i] * 100) if category_available[i] > 0 else 0.0)
+        for i, name in enumerate(categories)
+    ]
+    return by_vehicle, by_category
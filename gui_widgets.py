@@ -0,0 +1,212 @@
+"""
+Общие виджеты tkinter для окон приложений.
+
+PagedTreeview - таблица ttk.Treeview, которая подгружает строки страницами
+по мере прокрутки. Данные запрашиваются функцией fetch_page(after_key, limit)
+с keyset-пагинацией (WHERE ключ > последний показанный ключ ... LIMIT),
+поэтому открытие окна стоит одну страницу независимо от размера таблицы.
+
+SearchPicker - поле ввода со списком подсказок: на каждое изменение текста
+вызывается search(text, limit) и показываются не больше limit совпадений.
+
+sync_tree - обновление уже заполненного Treeview новой выборкой: меняются
+только отличающиеся строки, поэтому выделение и прокрутка сохраняются.
+
+Запросы PagedTreeview и SearchPicker выполняются в рабочих потоках
+db_worker.DbWorker, а строки попадают в виджет, когда запрос выполнится:
+прокрутка и ввод не ждут базу. Новый запрос виджета отменяет его
+предыдущий, ещё не выполненный.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+PAGE_SIZE = 200        # Строк в одной подгрузке
+PREFETCH_FRACTION = 0.8 # Подгружать, когда прокручено дальше этой доли списка
+PICKER_LIMIT = 20      # Подсказок в SearchPicker
+
+
+class PagedTreeview(ttk.Frame):
+    """
+    Treeview со скроллбаром и подгрузкой страниц.
+        fetch_page(after_key, limit) - возвращает не больше limit строк после after_key
+                                       (after_key=None - с начала);
+        key_of(row)                  - ключ пагинации строки;
+        values_of(row)               - значения столбцов для Treeview.
+    Строка хранится в self.rows по iid элемента дерева. fetch_page выполняется
+    в worker (db_worker.DbWorker); on_error(exception) - обработчик ошибки запроса.
+    """
+
+    def __init__(self, master, worker, columns, fetch_page, key_of, values_of, page_size=PAGE_SIZE,
+                 on_error=None, **tree_options):
+        super().__init__(master)
+        self.worker = worker
+        self.fetch_page = fetch_page
+        self.key_of = key_of
+        self.values_of = values_of
+        self.page_size = page_size
+        self.on_error = on_error
+        self.rows = {}
+        self.last_key = None
+        self.exhausted = False
+        self.load_scheduled = False
+        self.loading = False
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', **tree_options)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.load_next_page()
+
+    def on_scroll(self, first, last):
+        """ Двигает скроллбар и подгружает следующую страницу у конца списка. """
+        self.scrollbar.set(first, last)
+        if not self.exhausted and not self.load_scheduled and float(last) >= PREFETCH_FRACTION:
+            # after_idle: не вставлять строки внутри обработчика прокрутки самого дерева
+            self.load_scheduled = True
+            self.after_idle(self.load_next_page)
+
+    def load_next_page(self):
+        """ Запрашивает следующую страницу в фоне; строки дописываются в add_page. """
+        self.load_scheduled = False
+        if self.exhausted or self.loading:
+            return
+        self.loading = True
+        self.worker.submit(self.fetch_page, self.last_key, self.page_size, on_done=self.add_page,
+                           on_error=self.page_failed, key=('paged_treeview', str(self)),
+                           loading_parent=self, loading_text=None)
+
+    def add_page(self, rows):
+        """ Дописывает в дерево полученную страницу; следующую подгрузит прокрутка (on_scroll). """
+        self.loading = False
+        for row in rows:
+            iid = self.tree.insert('', 'end', values=self.values_of(row))
+            self.rows[iid] = row
+        if rows:
+            self.last_key = self.key_of(rows[-1])
+        if len(rows) < self.page_size:
+            self.exhausted = True
+
+    def page_failed(self, error):
+        self.loading = False
+        report_error(self.worker, self.on_error, error)
+
+    def reload(self):
+        """ Очищает дерево и загружает первую страницу заново; недополученная страница отбрасывается. """
+        self.tree.delete(*self.tree.get_children())
+        self.rows.clear()
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.load_next_page()
+
+    def selected_row(self):
+        """ Строка данных выделенного элемента или None. """
+        selection = self.tree.selection()
+        return self.rows.get(selection[0]) if selection else None
+
+
+class SearchPicker(ttk.Frame):
+    """
+    Выбор записи поиском по мере ввода.
+        search(text, limit) - не больше limit строк, подходящих под text;
+        format_row(row)     - текст строки в списке подсказок.
+    Несколько нажатий подряд дают один запрос: поиск запускается в after_idle
+    и выполняется в worker (db_worker.DbWorker); ответ на устаревший текст
+    отбрасывается. on_error(exception) - обработчик ошибки запроса.
+    """
+
+    def __init__(self, master, worker, search, format_row, limit=PICKER_LIMIT, height=8, on_error=None):
+        super().__init__(master)
+        self.worker = worker
+        self.search = search
+        self.format_row = format_row
+        self.limit = limit
+        self.on_error = on_error
+        self.rows = []
+        self.search_scheduled = False
+
+        self.text_var = tk.StringVar(self)
+        self.entry = ttk.Entry(self, textvariable=self.text_var)
+        self.listbox = tk.Listbox(self, height=height, exportselection=False)
+        self.entry.pack(fill=tk.X)
+        self.listbox.pack(fill=tk.BOTH, expand=True)
+
+        self.text_var.trace_add('write', self.on_text_changed)
+        self.refresh()
+
+    def on_text_changed(self, *_):
+        if not self.search_scheduled:
+            self.search_scheduled = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        """ Перезапрашивает подсказки по текущему тексту в фоне. """
+        self.search_scheduled = False
+        self.worker.submit(self.search, self.text_var.get().strip(), self.limit, on_done=self.show_rows,
+                           on_error=lambda e: report_error(self.worker, self.on_error, e),
+                           key=('search_picker', str(self)), loading_parent=self, loading_text=None)
+
+    def show_rows(self, rows):
+        """ Заменяет список подсказок строками rows. """
+        self.rows = rows
+        self.listbox.delete(0, tk.END)
+        for row in self.rows:
+            self.listbox.insert(tk.END, self.format_row(row))
+        if self.rows:
+            self.listbox.selection_set(0)
+
+    def selected_row(self):
+        """ Выбранная строка или None. """
+        selection = self.listbox.curselection()
+        return self.rows[selection[0]] if selection else None
+
+
+def report_error(worker, on_error, error):
+    """ Ошибка фонового запроса виджета: в on_error, если он задан, иначе как у DbWorker без обработчика. """
+    if on_error is not None:
+        on_error(error)
+    else:
+        worker.root.report_callback_exception(type(error), error, error.__traceback__)
+
+
+def sync_tree(tree, shown, rows, key_of, values_of):
+    """
+    Приводит строки верхнего уровня tree к rows, трогая только изменившиеся элементы.
+    iid элемента - str(key_of(row)); shown - словарь {iid: значения}, который
+    вызывающий код хранит между вызовами (вначале пустой).
+    Возвращает число вставленных, изменённых и удалённых элементов.
+    """
+    wanted = {}
+    for row in rows:
+        wanted[str(key_of(row))] = tuple(values_of(row))
+
+    changes = 0
+    stale = [iid for iid in shown if iid not in wanted]
+    if stale:
+        tree.delete(*stale)
+        for iid in stale:
+            del shown[iid]
+        changes += len(stale)
+
+    for iid, values in wanted.items():
+        if iid not in shown:
+            tree.insert('', 'end', iid=iid, values=values)
+        elif shown[iid] != values:
+            tree.item(iid, values=values)
+        else:
+            continue
+        shown[iid] = values
+        changes += 1
+
+    # Порядок восстанавливается, только если он действительно нарушился
+    order = list(wanted)
+    if changes and list(tree.get_children()) != order:
+        for index, iid in enumerate(order):
+            tree.move(iid, '', index)
+    return changes
@@ -0,0 +1,412 @@
+"""
+Версионированные миграции схем hotel.db и autopark.db.
+
+Номер применённой миграции хранится в PRAGMA user_version самого файла базы.
+Миграция - функция step(conn); после каждой user_version увеличивается на
+единицу и изменения фиксируются, поэтому прерванный запуск продолжается с
+той же миграции. Все шаги повторяемы (IF NOT EXISTS, проверка столбцов), и
+любая существующая база - созданная 1.py, 2import_rooms.py, 2.py,
+1users_init.py или init_db.py - приводится к одной канонической схеме с
+индексами.
+
+Большие таблицы перестраиваются пачками (rebuild_table): строки копируются
+по BATCH_SIZE с фиксацией после каждой пачки, а изменения, сделанные за это
+время другими рабочими местами, переносятся триггерами. Блокировка записи
+держится только на время одной пачки и финальной замены таблицы.
+
+При запуске приложения достаточно ensure_schema(): одно чтение
+PRAGMA user_version, если база уже актуальна.
+"""
+import sys
+
+import availability
+import change_watch
+import fleet_revenue
+import fleet_status_history
+import fleet_txt_import
+import occupancy
+import query_stats
+import room_status
+
+HOTEL = 'hotel'
+FLEET = 'autopark'
+BATCH_SIZE = 20000  # Строк в одной пачке при перестройке таблицы
+
+# --- Гостиница ---
+
+sql_hotel_tables = """
+-- Категории номеров
+CREATE TABLE IF NOT EXISTS RoomCategories (
+    id_category INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    description TEXT,
+    base_price REAL,
+    capacity INTEGER
+);
+
+-- Номера
+CREATE TABLE IF NOT EXISTS Rooms (
+    id_room INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_number TEXT NOT NULL,
+    floor TEXT,
+    status TEXT, -- Например: Чистый, Грязный, Занят, Назначен к уборке
+    id_category INTEGER NOT NULL,
+    FOREIGN KEY (id_category) REFERENCES RoomCategories(id_category)
+);
+
+-- Гости
+CREATE TABLE IF NOT EXISTS Guests (
+    id_guest INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL,
+    contact_info TEXT,
+    passport_info TEXT,
+    stay_history TEXT
+);
+
+-- Бронирования
+CREATE TABLE IF NOT EXISTS Bookings (
+    id_booking INTEGER PRIMARY KEY AUTOINCREMENT,
+    check_in DATE NOT NULL,
+    check_out DATE NOT NULL,
+    status TEXT, -- Например: Активно, Завершено, Отменено
+    id_guest INTEGER NOT NULL,
+    id_room INTEGER NOT NULL,
+    FOREIGN KEY (id_guest) REFERENCES Guests(id_guest),
+    FOREIGN KEY (id_room) REFERENCES Rooms(id_room)
+);
+
+-- Сотрудники
+CREATE TABLE IF NOT EXISTS Employees (
+    id_employee INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name TEXT NOT NULL,
+    position TEXT,
+    contact_info TEXT,
+    schedule TEXT
+);
+
+-- Уборка
+CREATE TABLE IF NOT EXISTS Cleaning (
+    id_cleaning INTEGER PRIMARY KEY AUTOINCREMENT,
+    cleaning_date DATE NOT NULL,
+    status TEXT, -- Например: Выполнено, В процессе, Требуется проверка
+    id_room INTEGER NOT NULL,
+    id_employee INTEGER NOT NULL,
+    FOREIGN KEY (id_room) REFERENCES Rooms(id_room),
+    FOREIGN KEY (id_employee) REFERENCES Employees(id_employee)
+);
+
+-- Платежи
+CREATE TABLE IF NOT EXISTS Payments (
+    id_payment INTEGER PRIMARY KEY AUTOINCREMENT,
+    payment_date DATE NOT NULL,
+    amount REAL,
+    payment_type TEXT, -- Например: Наличные, Карта
+    id_booking INTEGER NOT NULL,
+    FOREIGN KEY (id_booking) REFERENCES Bookings(id_booking)
+);
+
+-- Пользователи системы (для авторизации)
+CREATE TABLE IF NOT EXISTS Users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    login TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('Администратор', 'Пользователь')),
+    is_blocked INTEGER DEFAULT 0,
+    failed_attempts INTEGER DEFAULT 0,
+    last_login DATE,
+    must_change_password INTEGER DEFAULT 1
+);
+"""
+
+# Столбцы, которых нет в базах, созданных старыми скриптами (2import_rooms.py, 1users_init.py)
+hotel_columns = {
+    'RoomCategories': {'description': 'TEXT', 'base_price': 'REAL', 'capacity': 'INTEGER'},
+    'Rooms': {'floor': 'TEXT', 'status': 'TEXT'},
+    'Users': {'is_blocked': 'INTEGER DEFAULT 0', 'failed_attempts': 'INTEGER DEFAULT 0',
+              'last_login': 'DATE', 'must_change_password': 'INTEGER DEFAULT 1'},
+}
+
+# Каноническая Rooms для перестройки: {name} - имя создаваемой таблицы
+sql_rooms_table = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id_room INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_number TEXT NOT NULL,
+    floor TEXT,
+    status TEXT,
+    id_category INTEGER NOT NULL,
+    FOREIGN KEY (id_category) REFERENCES RoomCategories(id_category)
+)
+"""
+
+sql_hotel_indexes = """
+-- Поиск бронирований, пересекающих период
+CREATE INDEX IF NOT EXISTS idx_bookings_dates ON Bookings (check_in, check_out);
+-- Бронирования номера по датам
+CREATE INDEX IF NOT EXISTS idx_bookings_room ON Bookings (id_room, check_in);
+-- Сортировка списка номеров (этаж, номер) для постраничного вывода
+CREATE INDEX IF NOT EXISTS idx_rooms_floor_number ON Rooms (COALESCE(floor, ''), room_number);
+-- Поиск номера по номеру и по началу строки
+CREATE INDEX IF NOT EXISTS idx_rooms_number ON Rooms (room_number);
+-- История уборки номера
+CREATE INDEX IF NOT EXISTS idx_cleaning_room ON Cleaning (id_room, cleaning_date);
+-- Платежи по бронированию
+CREATE INDEX IF NOT EXISTS idx_payments_booking ON Payments (id_booking);
+"""
+
+
+def hotel_base_tables(conn):
+    conn.executescript(sql_hotel_tables)
+    for table, columns in hotel_columns.items():
+        ensure_columns(conn, table, columns)
+
+
+def hotel_rooms_floor_text(conn):
+    """ 2import_rooms.py создавал Rooms.floor INTEGER: этаж приводится к TEXT, как в остальных скриптах. """
+    if column_types(conn, 'Rooms').get('floor', 'TEXT') != 'TEXT':
+        rebuild_table(conn, 'Rooms', sql_rooms_table)
+
+
+def hotel_indexes(conn):
+    conn.executescript(sql_hotel_indexes)
+
+
+def hotel_summaries(conn):
+    """ Сводки, которые ведут триггеры: загрузка по дням, статусы номеров, счётчики изменений. """
+    occupancy.install(conn)
+    room_status.install(conn)
+    change_watch.install(conn, ('Rooms', 'RoomCategories'))
+
+
+def hotel_availability(conn):
+    """ Отметки изменённых бронирований для индекса свободных номеров. """
+    availability.install(conn)
+
+
+# --- Автопарк ---
+
+sql_fleet_tables = """
+CREATE TABLE IF NOT EXISTS Users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    login TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    is_blocked INTEGER DEFAULT 0,
+    failed_attempts INTEGER DEFAULT 0,
+    last_login TEXT,
+    must_change_password INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Vehicles (
+    id_vehicle INTEGER PRIMARY KEY AUTOINCREMENT,
+    vehicle_number TEXT UNIQUE NOT NULL,
+    model TEXT NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT DEFAULT 'Свободен',
+    total_hours REAL DEFAULT 0,
+    return_date TEXT
+);
+
+-- Использование (аренды) автомобилей
+CREATE TABLE IF NOT EXISTS Usage (
+    id_usage INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_vehicle INTEGER,
+    start_time TEXT NOT NULL,
+    end_time TEXT,
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+
+-- Показания пробега из "Данные по пробегу"
+CREATE TABLE IF NOT EXISTS VehicleMileage (
+    id_mileage INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_vehicle INTEGER NOT NULL,
+    mileage REAL NOT NULL,
+    recorded_on TEXT NOT NULL,
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+
+-- Строки "Отчета по автопарку на дату"
+CREATE TABLE IF NOT EXISTS FleetStatusReport (
+    id_report_row INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_date TEXT NOT NULL,
+    id_vehicle INTEGER NOT NULL,
+    status TEXT,
+    return_date TEXT,
+    FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
+);
+"""
+
+fleet_columns = {
+    'Vehicles': {'status': "TEXT DEFAULT 'Свободен'", 'total_hours': 'REAL DEFAULT 0', 'return_date': 'TEXT'},
+    'Users': {'is_blocked': 'INTEGER DEFAULT 0', 'failed_attempts': 'INTEGER DEFAULT 0',
+              'last_login': 'TEXT', 'must_change_password': 'INTEGER DEFAULT 0'},
+}
+
+sql_fleet_indexes = """
+-- Аренды автомобиля по времени
+CREATE INDEX IF NOT EXISTS idx_usage_vehicle_start ON Usage (id_vehicle, start_time);
+-- Аренды, задевающие окно расчёта загрузки
+CREATE INDEX IF NOT EXISTS idx_usage_start ON Usage (start_time);
+-- Показания пробега автомобиля по датам
+CREATE INDEX IF NOT EXISTS idx_mileage_vehicle ON VehicleMileage (id_vehicle, recorded_on);
+"""
+
+
+def fleet_base_tables(conn):
+    conn.executescript(sql_fleet_tables)
+    for table, columns in fleet_columns.items():
+        ensure_columns(conn, table, columns)
+
+
+def fleet_indexes(conn):
+    conn.executescript(sql_fleet_indexes)
+
+
+def fleet_summaries(conn):
+    """ Доход по дням, журнал статусов, счётчики изменений. """
+    fleet_revenue.install(conn)
+    fleet_status_history.install(conn)
+    change_watch.install(conn, ('Vehicles', 'Usage', 'RentalPayments'))
+
+
+def fleet_import_keys(conn):
+    """ Уникальные ключи пробега и строк отчёта: повторный импорт обновляет строки, а не дублирует. """
+    fleet_txt_import.install(conn)
+    # Уникальный индекс по тем же столбцам заменяет обычный
+    conn.execute("DROP INDEX IF EXISTS idx_mileage_vehicle")
+
+
+# Порядок миграций менять нельзя, новые дописываются в конец
+MIGRATIONS = {
+    HOTEL: [hotel_base_tables, hotel_rooms_floor_text, hotel_indexes, hotel_summaries, hotel_availability],
+    FLEET: [fleet_base_tables, fleet_indexes, fleet_summaries, fleet_import_keys],
+}
+
+
+# --- Общие функции ---
+
+def column_types(conn, table):
+    """ {столбец: объявленный тип в верхнем регистре} """
+    return {row[1]: (row[2] or '').upper() for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def ensure_columns(conn, table, columns):
+    """ Добавляет в table недостающие столбцы {имя: объявление}. """
+    existing = column_types(conn, table)
+    for name, declaration in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {name} {declaration}')
+
+
+def rebuild_table(conn, table, create_sql, batch_size=BATCH_SIZE):
+    """
+    Пересоздаёт table по create_sql (с {name} вместо имени) с сохранением строк,
+    индексов и триггеров. Строки копируются пачками в порядке первичного ключа
+    (INTEGER PRIMARY KEY), каждая пачка фиксируется отдельно; прерванная
+    перестройка продолжается с последней скопированной строки. Пока идёт
+    копирование, триггеры переносят в новую таблицу изменения уже скопированных строк.
+    """
+    new = f"{table}_migrating"
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute(create_sql.format(name=f'"{new}"'))
+
+    old_columns = column_types(conn, table)
+    columns = [name for name in column_types(conn, new) if name in old_columns]
+    pk = next(row[1] for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5] == 1)
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    new_values = ', '.join(f'NEW."{name}"' for name in columns)
+    copied = f'(SELECT COALESCE(MAX("{pk}"), 0) FROM "{new}")'
+
+    # Индексы и триггеры исходной таблицы создаются заново после замены
+    schema = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL AND name NOT LIKE 'trg_migrating_%'", (table,)
+    )]
+
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS "trg_migrating_{table}_insert" AFTER INSERT ON "{table}"
+        WHEN NEW."{pk}" <= {copied}
+        BEGIN
+            INSERT OR REPLACE INTO "{new}" ({column_list}) VALUES ({new_values});
+        END;
+        CREATE TRIGGER IF NOT EXISTS "trg_migrating_{table}_update" AFTER UPDATE ON "{table}"
+        BEGIN
+            DELETE FROM "{new}" WHERE "{pk}" = OLD."{pk}";
+            INSERT OR REPLACE INTO "{new}" ({column_list}) SELECT {new_values} WHERE NEW."{pk}" <= {copied};
+        END;
+        CREATE TRIGGER IF NOT EXISTS "trg_migrating_{table}_delete" AFTER DELETE ON "{table}"
+        BEGIN
+            DELETE FROM "{new}" WHERE "{pk}" = OLD."{pk}";
+        END;
+    """)
+
+    sql_copy_batch = f"""
+        INSERT INTO "{new}" ({column_list})
+        SELECT {column_list} FROM "{table}" WHERE "{pk}" > {copied} ORDER BY "{pk}" LIMIT ?
+    """
+    while conn.execute(sql_copy_batch, (batch_size,)).rowcount > 0:
+        conn.commit()
+    conn.commit()
+
+    # Замена одной транзакцией: догоняем последние строки, удаляем старую таблицу, переименовываем новую.
+    # legacy_alter_table: не перепроверять триггеры других таблиц, ссылающиеся на table
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        while conn.execute(sql_copy_batch, (batch_size,)).rowcount > 0:
+            pass
+        conn.execute(f'DROP TABLE "{table}"')
+        conn.execute(f'ALTER TABLE "{new}" RENAME TO "{table}"')
+        for sql in schema:
+            conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, kind, target=None):
+    """
+    Применяет к базе миграции kind (HOTEL / FLEET) до версии target (по умолчанию - последней).
+    Возвращает список применённых версий.
+    """
+    steps = MIGRATIONS[kind]
+    target = len(steps) if target is None else target
+    applied = []
+    version = schema_version(conn)
+    while version < target:
+        steps[version](conn)
+        version += 1
+        # PRAGMA не принимает параметры; version - число
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+        applied.append(version)
+    return applied
+
+
+def ensure_schema(db_filename, kind):
+    """
+    Проверка при запуске приложения: одно чтение user_version, миграции - только если база отстала.
+    Возвращает список применённых версий.
+    """
+    conn = query_stats.connect(db_filename)
+    try:
+        if schema_version(conn) >= len(MIGRATIONS[kind]):
+            return []
+        return migrate(conn, kind)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in MIGRATIONS:
+        print(f"Использование: python migrations.py {HOTEL}|{FLEET} файл.db")
+        sys.exit(1)
+    applied = ensure_schema(sys.argv[2], sys.argv[1])
+    print(f"Применены миграции: {applied}" if applied else "Схема уже актуальна")
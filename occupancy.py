@@ -0,0 +1,179 @@
+"""
+Загрузка номерного фонда за произвольный период [date_from, date_to).
+
+Проданные номеро-ночи хранятся по дням в RoomNightsDaily с разбивкой по
+категории и этажу. Таблицу ведут триггеры на Bookings и Rooms, поэтому отчёт
+за месяц или год - это сумма по диапазону первичного ключа, а не полный
+просмотр Bookings с JULIANDAY(MIN/MAX(...)) на каждый запрос.
+
+Ночь - это день заезда и все следующие дни до дня выезда (не включая его).
+Отменённые бронирования ночей не занимают.
+"""
+import calendar_days
+
+CANCELLED_STATUS = 'Отменено'
+
+BY_CATEGORY = 'category'
+BY_FLOOR = 'floor'
+
+sql_create_nights = """
+CREATE TABLE IF NOT EXISTS RoomNightsDaily (
+    day TEXT NOT NULL,          -- 'YYYY-MM-DD'
+    id_category INTEGER NOT NULL,
+    floor TEXT NOT NULL,        -- Rooms.floor, NULL хранится как ''
+    sold_nights INTEGER NOT NULL,
+    PRIMARY KEY (day, id_category, floor)
+) WITHOUT ROWID;
+"""
+
+
+def _add_nights_sql(booking, sign):
+    """ Ночи бронирования booking (NEW / OLD) в корзине его номера, со знаком sign. """
+    return f"""
+        INSERT INTO RoomNightsDaily (day, id_category, floor, sold_nights)
+        SELECT c.day, r.id_category, COALESCE(r.floor, ''), {sign}
+        FROM Calendar c JOIN Rooms r ON r.id_room = {booking}.id_room
+        WHERE {booking}.status IS NOT '{CANCELLED_STATUS}'
+          AND c.day >= date({booking}.check_in) AND c.day < date({booking}.check_out)
+        ON CONFLICT (day, id_category, floor) DO UPDATE SET sold_nights = sold_nights + excluded.sold_nights;
+    """
+
+
+def _move_room_nights_sql(room, sign):
+    """ Все ночи номера room (NEW / OLD) в его корзине, со знаком sign. """
+    return f"""
+        INSERT INTO RoomNightsDaily (day, id_category, floor, sold_nights)
+        SELECT c.day, {room}.id_category, COALESCE({room}.floor, ''), {sign} * COUNT(*)
+        FROM Bookings b CROSS JOIN Calendar c -- CROSS JOIN: сначала бронирования номера, затем их дни
+        WHERE c.day >= date(b.check_in) AND c.day < date(b.check_out)
+          AND b.id_room = {room}.id_room AND b.status IS NOT '{CANCELLED_STATUS}'
+        GROUP BY c.day
+        ON CONFLICT (day, id_category, floor) DO UPDATE SET sold_nights = sold_nights + excluded.sold_nights;
+    """
+
+
+def _drop_empty_sql(booking):
+    """ Удаляет обнулившиеся строки в диапазоне дат бронирования booking. """
+    return (f"DELETE FROM RoomNightsDaily WHERE day >= date({booking}.check_in) "
+            f"AND day < date({booking}.check_out) AND sold_nights = 0;")
+
+
+# Строки с нулём не мешают суммированию, но и не нужны
+sql_drop_empty = "DELETE FROM RoomNightsDaily WHERE sold_nights = 0;"
+
+sql_create_triggers = f"""
+CREATE TRIGGER IF NOT EXISTS trg_nights_booking_insert AFTER INSERT ON Bookings
+BEGIN
+    {_add_nights_sql('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_nights_booking_delete AFTER DELETE ON Bookings
+BEGIN
+    {_add_nights_sql('OLD', -1)}
+    {_drop_empty_sql('OLD')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_nights_booking_update
+AFTER UPDATE OF check_in, check_out, status, id_room ON Bookings
+BEGIN
+    {_add_nights_sql('OLD', -1)}
+    {_add_nights_sql('NEW', 1)}
+    {_drop_empty_sql('OLD')}
+END;
+
+-- Номер перевели в другую категорию или на другой этаж: его ночи переезжают в новую корзину
+CREATE TRIGGER IF NOT EXISTS trg_nights_room_update AFTER UPDATE OF id_category, floor ON Rooms
+BEGIN
+    {_move_room_nights_sql('OLD', -1)}
+    {_move_room_nights_sql('NEW', 1)}
+    {sql_drop_empty}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_nights_room_delete AFTER DELETE ON Rooms
+BEGIN
+    {_move_room_nights_sql('OLD', -1)}
+    {sql_drop_empty}
+END;
+"""
+
+sql_rebuild = f"""
+INSERT INTO RoomNightsDaily (day, id_category, floor, sold_nights)
+SELECT c.day, r.id_category, COALESCE(r.floor, ''), COUNT(*)
+FROM Bookings b
+JOIN Rooms r ON r.id_room = b.id_room
+CROSS JOIN Calendar c
+WHERE c.day >= date(b.check_in) AND c.day < date(b.check_out)
+  AND b.status IS NOT '{CANCELLED_STATUS}'
+GROUP BY c.day, r.id_category, COALESCE(r.floor, '')
+"""
+
+
+def install(conn):
+    """
+    Создаёт Calendar, RoomNightsDaily и триггеры. Если таблица ночей создаётся
+    впервые, она заполняется по уже существующим бронированиям.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='RoomNightsDaily'"
+    ).fetchone()
+    calendar_days.ensure_calendar(conn)
+    conn.execute(sql_create_nights)
+    conn.executescript(sql_create_triggers)
+    if not exists:
+        rebuild(conn)
+    conn.commit()
+
+
+def rebuild(conn):
+    """ Пересчитывает RoomNightsDaily целиком по Bookings. Фиксацию выполняет вызывающий код. """
+    conn.execute("DELETE FROM RoomNightsDaily")
+    conn.execute(sql_rebuild)
+
+
+def occupancy(conn, date_from, date_to, by=None):
+    """
+    Загрузка за [date_from, date_to) (даты 'YYYY-MM-DD').
+    by: None - по всему фонду, BY_CATEGORY - по категориям, BY_FLOOR - по этажам.
+    Возвращает список (ключ, продано ночей, номеров, процент загрузки);
+    ключ - название категории, этаж или None для всего фонда.
+    """
+    days = conn.execute(
+        "SELECT CAST(JULIANDAY(?) - JULIANDAY(?) AS INTEGER)", (date_to, date_from)
+    ).fetchone()[0]
+    if days is None or days <= 0:
+        raise ValueError(f"Пустой или некорректный период: [{date_from}, {date_to})")
+
+    if by == BY_CATEGORY:
+        rooms_sql = """
+            SELECT r.id_category, COALESCE(rc.name, r.id_category), COUNT(*)
+            FROM Rooms r LEFT JOIN RoomCategories rc ON rc.id_category = r.id_category
+            GROUP BY r.id_category
+        """
+        group_column = "id_category"
+    elif by == BY_FLOOR:
+        rooms_sql = "SELECT COALESCE(floor, ''), COALESCE(floor, ''), COUNT(*) FROM Rooms GROUP BY 1"
+        group_column = "floor"
+    elif by is None:
+        rooms_sql = "SELECT NULL, NULL, COUNT(*) FROM Rooms"
+        group_column = "NULL"
+    else:
+        raise ValueError(f"Неизвестная разбивка: {by}")
+
+    sold = dict(conn.execute(
+        f"SELECT {group_column}, SUM(sold_nights) FROM RoomNightsDaily "
+        f"WHERE day >= ? AND day < ? GROUP BY {group_column}",
+        (date_from, date_to)
+    ).fetchall())
+
+    result = []
+    for group_key, name, room_count in conn.execute(rooms_sql).fetchall():
+        nights = sold.get(group_key) or 0
+        percent = nights * 100.0 / (room_count * days) if room_count else 0.0
+        result.append((name, nights, room_count, round(percent, 2)))
+    return result
+
+
+def occupancy_percent(conn, date_from, date_to):
+    """ Процент загрузки всего номерного фонда за [date_from, date_to). """
+    rows = occupancy(conn, date_from, date_to)
+    return rows[0][3] if rows else 0.0
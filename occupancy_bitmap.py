@@ -0,0 +1,258 @@
+"""
+Занятость номеров по дням в виде битовой матрицы (номера x дни) для
+календаря на стойке регистрации и быстрых запросов по диапазону дат.
+
+Каждый номер - строка битов, по биту на сутки окна [start, start + days),
+упакованная np.packbits (8 суток в байте). 10000 номеров на два года -
+меньше 1 МБ. Матрица хранится в файле .npy и открывается как memmap, рядом -
+описание в .json (начало окна, id номеров по строкам, последний учтённый
+seq AvailabilityChanges). Сетка календаря, число свободных ночей и процент
+загрузки - срезы матрицы, маски крайних байтов и подсчёт единичных битов,
+без обращения к Bookings.
+
+Матрица строится по Bookings одним проходом NumPy (разностный массив и
+накопленная сумма), дальше обновляется по строкам: изменённые номера
+берутся из AvailabilityChanges (см. availability), их бронирования
+перечитываются по индексу (id_room, check_in). Окно расширяется, если
+запрошен период вне его; при изменении набора номеров матрица
+перестраивается.
+
+Ночь - это день заезда и все следующие дни до дня выезда (не включая его),
+отменённые бронирования номер не занимают - как в occupancy.
+
+    python occupancy_bitmap.py hotel.db 2025-07-01 2025-08-01
+"""
+import json
+import os
+import sys
+import threading
+from datetime import date
+
+import numpy as np
+
+import change_watch
+from conflicts import BOOKINGS, load_intervals
+from fleet_utilization import EPOCH_SQL
+from occupancy import CANCELLED_STATUS
+
+DAYS_BEFORE = 31   # Окно строится на месяц назад ...
+DAYS_AHEAD = 366   # ... и год вперёд от сегодняшнего дня
+MIN_AHEAD = 183    # Окно перестраивается, когда вперёд остаётся меньше
+CHUNK_ROOMS = 4096 # Номеров в одном проходе построения
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(packed):
+        return np.bitwise_count(packed)
+else:
+    _POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+    def popcount(packed):
+        return _POPCOUNT[packed]
+
+sql_room_bookings = f"""
+SELECT {EPOCH_SQL.format('check_in')}, {EPOCH_SQL.format('check_out')}
+FROM Bookings
+WHERE id_room = ? AND status IS NOT '{CANCELLED_STATUS}'
+"""
+
+
+def bitmap_path(db_filename):
+    """ Файл матрицы рядом с базой: hotel.db -> hotel.occupancy.npy. """
+    return os.path.splitext(db_filename)[0] + '.occupancy.npy'
+
+
+def to_ordinal(day):
+    """ 'ГГГГ-ММ-ДД' или date -> номер дня. """
+    return (day if isinstance(day, date) else date.fromisoformat(str(day)[:10])).toordinal()
+
+
+def fill_rows(rows, starts, ends, rows_count, days):
+    """
+    Упакованные строки битов rows_count x days по интервалам [starts, ends) в днях окна
+    (строка интервала - rows). Интервалы уже обрезаны по окну.
+    """
+    width = days + 1
+    # Разностный массив: +1 в день заезда, -1 в день выезда, накопленная сумма > 0 - ночь занята
+    marks = (np.bincount(rows * width + starts, minlength=rows_count * width)
+             - np.bincount(rows * width + ends, minlength=rows_count * width))
+    occupied = np.cumsum(marks.reshape(rows_count, width), axis=1)[:, :days] > 0
+    return np.packbits(occupied, axis=1)
+
+
+class OccupancyBitmap:
+    """ Матрица занятости в файле path; общая для потоков приложения. """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.splitext(path)[0] + '.json'
+        self.lock = threading.Lock()
+        self.bits = None        # uint8 [номера, ceil(days / 8)], memmap или массив в памяти
+        self.start = None       # Номер первого дня окна
+        self.days = 0
+        self.room_ids = None    # id_room по строкам, по возрастанию
+        self.seq = 0            # Последнее учтённое изменение AvailabilityChanges
+        self.room_version = None
+
+    # --- Построение и обновление ---
+
+    def load(self):
+        """ Открывает сохранённую матрицу; False, если файла нет или он не сходится с описанием. """
+        try:
+            with open(self.meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+            bits = np.load(self.path, mmap_mode='r+')
+        except (OSError, ValueError):
+            return False
+        if bits.shape != (len(meta['room_ids']), (meta['days'] + 7) // 8):
+            return False
+        self.bits, self.start, self.days = bits, to_ordinal(meta['start']), meta['days']
+        self.room_ids = np.array(meta['room_ids'], dtype=np.int64)
+        self.seq = meta['seq']
+        return True
+
+    def save_meta(self):
+        meta = {'start': date.fromordinal(self.start).isoformat(), 'days': self.days,
+                'room_ids': self.room_ids.tolist(), 'seq': self.seq}
+        with open(self.meta_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+    def build(self, conn, start, days, room_ids):
+        """ Строит матрицу по всем бронированиям и сохраняет её. """
+        # seq читается до бронирований: изменения между запросами будут перечитаны при следующем refresh
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM AvailabilityChanges").fetchone()[0]
+        (_, rooms, starts, ends), _ = load_intervals(conn, BOOKINGS)
+        starts = starts // 86400 + EPOCH_ORDINAL - start
+        ends = ends // 86400 + EPOCH_ORDINAL - start
+        rows = np.searchsorted(room_ids, rooms)
+        keep = (rows < len(room_ids)) & (ends > 0) & (starts < days) & (ends > starts)
+        rows, starts, ends = rows[keep], np.clip(starts[keep], 0, days), np.clip(ends[keep], 0, days)
+        keep = room_ids[rows] == rooms[keep]
+        rows, starts, ends = rows[keep], starts[keep], ends[keep]
+
+        bits = np.zeros((len(room_ids), (days + 7) // 8), dtype=np.uint8)
+        order = np.argsort(rows, kind='stable')
+        rows, starts, ends = rows[order], starts[order], ends[order]
+        for first in range(0, len(room_ids), CHUNK_ROOMS):
+            low, high = np.searchsorted(rows, [first, first + CHUNK_ROOMS])
+            count = min(CHUNK_ROOMS, len(room_ids) - first)
+            bits[first:first + count] = fill_rows(rows[low:high] - first, starts[low:high], ends[low:high], count, days)
+
+        # Прежний memmap закрывается до замены файла
+        self.bits, self.start, self.days, self.room_ids, self.seq = None, start, days, room_ids, seq
+        try:
+            # Открытый memmap (в том числе в другом процессе) не даст заменить файл - тогда матрица остаётся в памяти
+            np.save(self.path + '.tmp.npy', bits)
+            os.replace(self.path + '.tmp.npy', self.path)
+            self.save_meta()
+            self.bits = np.load(self.path, mmap_mode='r+')
+        except OSError:
+            self.bits = bits
+
+    def update_room(self, conn, row, id_room):
+        """ Перечитывает бронирования одного номера в строку row. """
+        intervals = np.array([interval for interval in conn.execute(sql_room_bookings, (id_room,))
+                              if None not in interval], dtype=np.int64).reshape(-1, 2)
+        starts = np.clip(intervals[:, 0] // 86400 + EPOCH_ORDINAL - self.start, 0, self.days)
+        ends = np.clip(intervals[:, 1] // 86400 + EPOCH_ORDINAL - self.start, 0, self.days)
+        keep = ends > starts
+        self.bits[row] = fill_rows(np.zeros(keep.sum(), dtype=np.int64), starts[keep], ends[keep], 1, self.days)[0]
+
+    def refresh(self, conn, date_from=None, date_to=None):
+        """
+        Приводит матрицу к текущим Bookings: перестраивает, если окно не покрывает
+        [date_from, date_to) или изменился набор номеров, иначе обновляет изменённые номера.
+        """
+        if self.bits is None:
+            self.load()
+
+        version = change_watch.read_versions(conn).get('Rooms')
+        room_ids = self.room_ids
+        if room_ids is None or version != self.room_version:
+            room_ids = np.array([row[0] for row in conn.execute("SELECT id_room FROM Rooms ORDER BY id_room")],
+                                dtype=np.int64)
+
+        today = date.today().toordinal()
+        need_start = today if date_from is None else min(today, to_ordinal(date_from))
+        need_end = today + MIN_AHEAD if date_to is None else max(today + MIN_AHEAD, to_ordinal(date_to))
+        covered = self.bits is not None and self.start <= need_start and need_end <= self.start + self.days
+
+        if not covered or not np.array_equal(room_ids, self.room_ids):
+            start = min(need_start, today - DAYS_BEFORE)
+            self.build(conn, start, max(need_end, today + DAYS_AHEAD) - start, room_ids)
+        else:
+            changed = conn.execute("SELECT id_room, seq FROM AvailabilityChanges WHERE seq > ?", (self.seq,)).fetchall()
+            for id_room, seq in changed:
+                row = np.searchsorted(self.room_ids, id_room)
+                if row < len(self.room_ids) and self.room_ids[row] == id_room:
+                    self.update_room(conn, row, id_room)
+                self.seq = max(self.seq, seq)
+            if changed:
+                if isinstance(self.bits, np.memmap):
+                    self.bits.flush()
+                    self.save_meta()
+        self.room_version = version
+
+    # --- Запросы (после refresh, под lock) ---
+
+    def rows_of(self, id_rooms):
+        """ Строки матрицы номеров id_rooms (None - все номера); неизвестные номера пропускаются. """
+        if id_rooms is None:
+            return np.arange(len(self.room_ids))
+        id_rooms = np.asarray(id_rooms, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.room_ids, id_rooms), len(self.room_ids) - 1)
+        return rows[self.room_ids[rows] == id_rooms]
+
+    def day_range(self, date_from, date_to):
+        first, last = to_ordinal(date_from) - self.start, to_ordinal(date_to) - self.start
+        if not 0 <= first <= last <= self.days:
+            raise ValueError("Период вне окна календаря")
+        return first, last
+
+    def grid(self, date_from, date_to, id_rooms=None):
+        """ Сетка календаря: bool [номера, дни периода], True - ночь занята. """
+        first, last = self.day_range(date_from, date_to)
+        packed = self.bits[self.rows_of(id_rooms), first // 8:(last + 7) // 8]
+        days = np.unpackbits(packed, axis=1)
+        return days[:, first % 8:first % 8 + last - first].astype(bool)
+
+    def occupied_nights(self, date_from, date_to, id_rooms=None):
+        """ Занятых ночей за [date_from, date_to) по номерам: int [номера]. """
+        first, last = self.day_range(date_from, date_to)
+        if first == last:
+            return np.zeros(len(self.rows_of(id_rooms)), dtype=np.int64)
+        packed = np.array(self.bits[self.rows_of(id_rooms), first // 8:(last + 7) // 8])
+        # Биты крайних байтов вне периода гасятся масками (старший бит байта - первые сутки)
+        packed[:, 0] &= 0xFF >> (first % 8)
+        if last % 8:
+            packed[:, -1] &= (0xFF << (8 - last % 8)) & 0xFF
+        return popcount(packed).sum(axis=1, dtype=np.int64)
+
+    def free_nights(self, date_from, date_to, id_rooms=None):
+        """ Свободных ночей за [date_from, date_to) по номерам. """
+        first, last = self.day_range(date_from, date_to)
+        return (last - first) - self.occupied_nights(date_from, date_to, id_rooms)
+
+    def occupancy_percent(self, date_from, date_to, id_rooms=None):
+        """ Процент занятых номеро-ночей за [date_from, date_to). """
+        occupied = self.occupied_nights(date_from, date_to, id_rooms)
+        first, last = self.day_range(date_from, date_to)
+        total = len(occupied) * (last - first)
+        return float(occupied.sum()) / total * 100 if total else 0.0
+
+
+if __name__ == "__main__":
+    import sqlite3
+
+    if len(sys.argv) < 4:
+        print("Использование: python occupancy_bitmap.py hotel.db ГГГГ-ММ-ДД ГГГГ-ММ-ДД")
+        sys.exit(1)
+    db_filename, date_from, date_to = sys.argv[1:4]
+    conn = sqlite3.connect(db_filename)
+    bitmap = OccupancyBitmap(bitmap_path(db_filename))
+    bitmap.refresh(conn, date_from, date_to)
+    free = bitmap.free_nights(date_from, date_to)
+    print(f"Загрузка: {bitmap.occupancy_percent(date_from, date_to):.1f}%, "
+          f"свободных номеро-ночей: {int(free.sum())}, полностью свободных номеров: {int((free == to_ordinal(date_to) - to_ordinal(date_from)).sum())}")
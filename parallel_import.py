@@ -0,0 +1,263 @@
+"""
+Параллельный импорт документов заказчика (Автопарк, Данные по пробегу,
+Отчет по автопарку на дату - в XLSX или TXT) в таблицы автопарка
+Vehicles / VehicleMileage / FleetStatusReport.
+
+Каждый документ разбирается в своём процессе пула: строки листа Excel или
+выгрузки TXT приводятся к тем же кортежам, что и в fleet_txt_import, и
+пачками по BATCH_SIZE отправляются в общую очередь. Пишет в базу один поток:
+SQLite не упирается в блокировки, а гос. номера разрешаются в id_vehicle
+одним кэшем (fleet_txt_import.VehicleIds). Очередь ограничена
+QUEUE_BATCHES пачками: если запись отстаёт, разбор ждёт, и память не растёт.
+
+Внешние ключи: пробег и строки отчёта ссылаются на Vehicles, поэтому их пачки
+пишутся только после того, как все документы-справочники автомобилей
+(Автопарк) записаны целиком, - автомобили получают марку и категорию из
+справочника, а не из первой попавшейся строки пробега. До этого такие пачки
+ждут в памяти потока записи; справочник короче остальных документов, так
+что ждать приходится недолго. Документы без справочника пишутся сразу,
+недостающие автомобили создаются по их строкам.
+
+Документы разбираются одновременно, поэтому время импорта определяется
+самым большим из них, а не суммой (при достаточном числе ядер).
+
+    python parallel_import.py autopark.db "yy/Документы заказчика" [--txt] [--workers=N]
+    python parallel_import.py autopark.db Автопарк.xlsx "Данные по пробегу.xlsx" ...
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+import fleet_status_history
+import fleet_txt_import
+import migrations
+
+BATCH_SIZE = fleet_txt_import.BATCH_SIZE
+COMMIT_EVERY = fleet_txt_import.COMMIT_EVERY
+QUEUE_BATCHES = 16   # Пачек в очереди между разбором и записью
+POLL_SECONDS = 1     # Как часто поток записи проверяет, живы ли процессы разбора
+
+# Документы заказчика в порядке импорта: справочник автомобилей первым
+DOCUMENT_NAMES = ['Автопарк', 'Данные по пробегу', 'Отчет по автопарку на дату']
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+VEHICLE_KINDS = {fleet_txt_import.KIND_AUTOPARK}
+
+# Сообщения очереди: (путь, тип, данные)
+KIND = 'kind'      # Формат документа определён
+BATCH = 'batch'    # Пачка строк
+DONE = 'done'      # Документ разобран; данные - число строк
+ERROR = 'error'    # Разбор прерван; данные - текст ошибки
+
+_batches = None  # Очередь процесса пула
+
+
+def init_worker(batches):
+    global _batches
+    _batches = batches
+
+
+def cell_text(value):
+    """ Значение ячейки как поле выгрузки TXT: даты - 'ДД.ММ.ГГГГ', пусто - ''. """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime("%d.%m.%Y")
+    return str(value).strip()
+
+
+def iter_xlsx_fields(path):
+    """ Строки первого листа книги как списки полей, пустые строки пропускаются (как fleet_txt_import.iter_fields). """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            fields = [cell_text(value) for value in row]
+            if any(fields):
+                yield fields
+    finally:
+        workbook.close()
+
+
+def document_fields(path):
+    if os.path.splitext(path)[1].lower() in EXCEL_EXTENSIONS:
+        return iter_xlsx_fields(path)
+    return fleet_txt_import.iter_fields(path)
+
+
+def parse_document(path, batch_size=BATCH_SIZE):
+    """ Выполняется в процессе пула: разбирает документ path и отправляет его пачки в очередь. """
+    try:
+        rows = document_fields(path)
+        first = next(rows, [])
+        kind = fleet_txt_import.kind_of(first)
+        _batches.put((path, KIND, kind))
+        parser = fleet_txt_import.FORMATS[kind][0]
+        count = 0
+        for batch in fleet_txt_import.batched(parser(path, rows=itertools.chain([first], rows)), batch_size):
+            _batches.put((path, BATCH, batch))
+            count += len(batch)
+        _batches.put((path, DONE, count))
+    except Exception:
+        _batches.put((path, ERROR, traceback.format_exc(limit=3)))
+
+
+def write_batches(conn, batches, paths, futures, commit_every=COMMIT_EVERY):
+    """
+    Поток записи: принимает сообщения, пока не закончатся все документы paths.
+    Возвращает ({путь: записано строк}, {путь: текст ошибки}). Ошибка записи
+    откатывает транзакцию, но очередь дочитывается до конца, чтобы процессы
+    разбора не зависли на заполненной очереди; затем ошибка поднимается.
+    """
+    vehicle_ids = fleet_txt_import.VehicleIds(conn.cursor())
+    today = datetime.now().strftime("%Y-%m-%d")
+    kinds, counts, errors = {}, {}, {}
+    finished = set()
+    pending = []        # Пачки пробега и отчёта, ждущие справочник автомобилей
+    since_commit = 0
+    failure = None
+    idle_polls = 0
+
+    def vehicles_ready():
+        # Все документы объявили формат, и все справочники автомобилей дочитаны
+        return all(path in finished or (path in kinds and kinds[path] not in VEHICLE_KINDS) for path in paths)
+
+    def write(kind, batch):
+        nonlocal since_commit
+        fleet_txt_import.FORMATS[kind][1](vehicle_ids, batch, today)
+        since_commit += len(batch)
+        if since_commit >= commit_every:
+            conn.commit()
+            # Импорт меняет Vehicles: журнал статусов не должен расти без контрольных точек
+            fleet_status_history.maybe_checkpoint(conn)
+            since_commit = 0
+
+    while len(finished) < len(paths):
+        try:
+            path, message, data = batches.get(timeout=POLL_SECONDS)
+            idle_polls = 0
+        except queue.Empty:
+            # Процесс разбора завершился аварийно и не прислал DONE / ERROR
+            idle_polls += 1
+            if idle_polls >= 2 and all(future.done() for future in futures):
+                for path in set(paths) - finished:
+                    errors[path] = "процесс разбора завершился без результата"
+                    finished.add(path)
+            continue
+
+        if message == KIND:
+            kinds[path] = data
+        elif message == DONE:
+            finished.add(path)
+            counts[path] = data
+        elif message == ERROR:
+            finished.add(path)
+            errors[path] = data
+        elif failure is None:
+            pending.append((kinds[path], data))
+
+        if failure is None and pending:
+            try:
+                # Справочник пишется сразу, остальное - когда справочник готов
+                if vehicles_ready():
+                    for kind, batch in pending:
+                        write(kind, batch)
+                    pending = []
+                elif pending[-1][0] in VEHICLE_KINDS:
+                    write(*pending.pop())
+            except BaseException as error:
+                conn.rollback()
+                failure = error
+                pending = []
+
+    if failure is not None:
+        raise failure
+    try:
+        for kind, batch in pending:
+            write(kind, batch)
+        conn.commit()
+        fleet_status_history.maybe_checkpoint(conn)
+    except BaseException:
+        conn.rollback()
+        raise
+    return counts, errors
+
+
+def import_documents(db_filename, paths, workers=None, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY):
+    """
+    Импортирует документы paths в базу db_filename: разбор - в workers процессах
+    (по умолчанию по процессу на документ, не больше числа ядер), запись - в одном потоке.
+    Возвращает ({путь: записано строк}, {путь: текст ошибки разбора}); пути - абсолютные.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    if not paths:
+        return {}, {}
+    # Соединение создаётся здесь, а используется только потоком записи
+    conn = sqlite3.connect(db_filename, check_same_thread=False)
+    migrations.migrate(conn, migrations.FLEET)
+
+    batches = multiprocessing.Queue(QUEUE_BATCHES)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    result = {}
+
+    def run_writer():
+        try:
+            result['value'] = write_batches(conn, batches, paths, futures, commit_every)
+        except BaseException as error:
+            result['error'] = error
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(batches,)) as pool:
+            futures = [pool.submit(parse_document, path, batch_size) for path in paths]
+            writer = threading.Thread(target=run_writer, name='import_writer')
+            writer.start()
+            writer.join()
+    finally:
+        conn.close()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+def find_documents(folder, prefer_txt=False):
+    """
+    Абсолютные пути документов заказчика из folder, по одному файлу на документ:
+    XLSX, если есть, иначе TXT (prefer_txt - наоборот).
+    """
+    extensions = ['.txt', '.xlsx'] if prefer_txt else ['.xlsx', '.txt']
+    found = []
+    for name in DOCUMENT_NAMES:
+        path = next((os.path.abspath(os.path.join(folder, name + extension)) for extension in extensions
+                     if os.path.exists(os.path.join(folder, name + extension))), None)
+        if path:
+            found.append(path)
+    return found
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) < 2:
+        print("Использование: python parallel_import.py autopark.db папка|файл ... [--txt] [--workers=N]")
+        sys.exit(1)
+    workers = next((int(arg.split('=', 1)[1]) for arg in sys.argv if arg.startswith('--workers=')), None)
+    db_filename, sources = args[0], args[1:]
+    paths = []
+    for source in sources:
+        paths += find_documents(source, '--txt' in sys.argv) if os.path.isdir(source) else [source]
+    paths = [os.path.abspath(path) for path in paths]
+    started = datetime.now()
+    counts, errors = import_documents(db_filename, paths, workers)
+    for path in paths:
+        if path in errors:
+            print(f"{os.path.basename(path)}: ошибка\n{errors[path]}")
+        else:
+            print(f"{os.path.basename(path)}: строк {counts.get(path, 0)}")
+    print(f"Готово за {(datetime.now() - started).total_seconds():.1f} с")
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,335 @@
+"""
+Замер времени SQL-запросов и журнал медленных запросов (включается по желанию).
+
+Когда сбор включён, соединения создаются с фабрикой Connection: каждый
+выполненный запрос учитывается по нормализованному тексту (литералы заменены
+на ?, списки IN свёрнуты) - число вызовов, суммарное и максимальное время,
+гистограмма длительностей, число строк и функции, откуда запрос вызван.
+Время SELECT включает выборку строк (fetch*), но не обработку между ними.
+Запросы дольше порога пишутся в журнал медленных запросов вместе с
+EXPLAIN QUERY PLAN.
+
+Включение:
+    QUERY_STATS=1 [QUERY_STATS_SLOW_MS=50] python 3auth_app.py
+    python query_stats.py [--slow-ms 50] [--top 30] 1.py      - запуск скрипта со сводкой в конце
+    query_stats.enable(slow_ms=50)                            - из кода, до открытия соединений
+Выключенный сбор ничего не стоит: соединения остаются обычными sqlite3.Connection.
+Сводка доступна в админ-панелях приложений (summary_lines) и пишется в файл
+при выходе, если задан QUERY_STATS_DUMP=файл.
+"""
+import argparse
+import atexit
+import os
+import re
+import runpy
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+SLOW_QUERY_MS = 100              # Порог журнала медленных запросов
+SLOW_LOG = 'slow_queries.log'
+BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000]  # Верхние границы корзин гистограммы
+TOP = 20                         # Строк в сводке по умолчанию
+MAX_SQL_LENGTH = 200             # Длина текста запроса в сводке
+
+_enabled = False
+_slow_ms = SLOW_QUERY_MS
+_slow_log = SLOW_LOG
+_stats = {}
+_lock = threading.Lock()
+
+# Файлы, кадры которых пропускаются при поиске вызывающей функции
+_SKIP_FILES = {os.path.abspath(__file__)}
+
+_re_string = re.compile(r"'(?:[^']|'')*'")
+_re_comment = re.compile(r"--[^\n]*")
+_re_number = re.compile(r"\b\d+(?:\.\d+)?\b")
+_re_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_re_spaces = re.compile(r"\s+")
+
+
+def compact(sql):
+    """ Запрос одной строкой, без комментариев. """
+    return _re_spaces.sub(' ', _re_comment.sub('', sql)).strip()
+
+
+def normalize(sql):
+    """ Текст запроса без литералов и лишних пробелов: одинаковые запросы с разными значениями совпадают. """
+    sql = _re_string.sub('?', sql)
+    sql = _re_number.sub('?', sql)
+    sql = _re_in_list.sub('(...)', sql)
+    return compact(sql)
+
+
+def skip_module(filename):
+    """ Не считать кадры файла filename вызывающей функцией (например, обёртки над запросами). """
+    _SKIP_FILES.add(os.path.abspath(filename))
+
+
+def caller():
+    """ 'файл:функция' первого кадра вне служебных модулей. """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _SKIP_FILES and 'contextlib' not in filename:
+            return f"{os.path.basename(filename)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class QueryStat:
+    """ Накопленная статистика одного нормализованного запроса. """
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)  # Последняя корзина - дольше BUCKETS_MS[-1]
+        self.callers = Counter()
+
+    def add(self, duration_ms, rows, where):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += rows
+        index = 0
+        while index < len(BUCKETS_MS) and duration_ms > BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.callers[where] += 1
+
+
+def explain(conn, sql, parameters):
+    """ Строки EXPLAIN QUERY PLAN с отступами по вложенности; пустой список, если план не получить. """
+    try:
+        plan = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in plan:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def log_slow(conn, sql, parameters, duration_ms, rows, where):
+    plan = explain(conn, sql, parameters) if parameters is not None else []
+    with _lock, open(_slow_log, 'a', encoding='utf-8') as file:
+        file.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {duration_ms:.1f} мс, строк: {rows}, {where}\n")
+        file.write(f"  {compact(sql)}\n")
+        for line in plan:
+            file.write(f"  {line}\n")
+
+
+def record(conn, sql, parameters, duration_ms, rows, where):
+    key = normalize(sql)
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            stat = _stats[key] = QueryStat(key)
+        stat.add(duration_ms, rows, where)
+    if duration_ms >= _slow_ms:
+        log_slow(conn, sql, parameters, duration_ms, rows, where)
+
+
+class Cursor(sqlite3.Cursor):
+    """ Курсор, который учитывает время выполнения и выборки каждого запроса. """
+
+    _pending = None  # [sql, параметры, вызывающая функция, мс, строк] текущего SELECT
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        where = caller()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, where, (time.perf_counter() - start) * 1000, 0]
+        if self.description is None:
+            # Не выборка: строк для чтения нет, учитываем сразу
+            self._pending[4] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        where = caller()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        # План для пачки не строится: параметры уже израсходованы
+        record(self.connection, sql, None, (time.perf_counter() - start) * 1000, max(self.rowcount, 0), where)
+        return self
+
+    def executescript(self, sql_script):
+        self._finish()
+        where = caller()
+        start = time.perf_counter()
+        super().executescript(sql_script)
+        record(self.connection, sql_script, None, (time.perf_counter() - start) * 1000, 0, where)
+        return self
+
+    def _fetched(self, start, rows, exhausted):
+        pending = self._pending
+        if pending is not None:
+            pending[3] += (time.perf_counter() - start) * 1000
+            pending[4] += rows
+            if exhausted:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Выборку могли не дочитать до конца. При завершении интерпретатора модули
+        # и соединение могут быть уже разрушены - тогда запрос не учитывается
+        try:
+            if not sys.is_finalizing():
+                self._finish()
+        except Exception:
+            pass
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, parameters, where, duration_ms, rows = pending
+            record(self.connection, sql, parameters, duration_ms, rows, where)
+
+
+class Connection(sqlite3.Connection):
+    """ Соединение, все запросы которого идут через Cursor. """
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def enable(slow_ms=SLOW_QUERY_MS, slow_log=SLOW_LOG):
+    """ Включает сбор для соединений, открытых после вызова. """
+    global _enabled, _slow_ms, _slow_log
+    _enabled, _slow_ms, _slow_log = True, slow_ms, slow_log
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def connection_factory():
+    """ Класс соединения для sqlite3.connect(factory=...): с замером, если сбор включён. """
+    return Connection if _enabled else sqlite3.Connection
+
+
+def connect(database, **kwargs):
+    """ sqlite3.connect с замером запросов, если сбор включён. """
+    return sqlite3.connect(database, factory=connection_factory(), **kwargs)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot():
+    """ Копия статистики: [QueryStat], по убыванию суммарного времени. """
+    with _lock:
+        stats = list(_stats.values())
+    return sorted(stats, key=lambda stat: stat.total_ms, reverse=True)
+
+
+def summary_lines(top=TOP):
+    """ Текст сводки: самые затратные запросы с гистограммой и вызывающими функциями. """
+    if not _enabled and not _stats:
+        return ["Сбор статистики запросов выключен (запустите с QUERY_STATS=1)."]
+    stats = snapshot()
+    total_ms = sum(stat.total_ms for stat in stats)
+    lines = [f"Запросов: {sum(stat.count for stat in stats)}, различных: {len(stats)}, "
+             f"время: {total_ms:.1f} мс, порог медленных: {_slow_ms} мс ({_slow_log})", ""]
+    labels = [f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    for stat in stats[:top]:
+        sql = stat.sql if len(stat.sql) <= MAX_SQL_LENGTH else stat.sql[:MAX_SQL_LENGTH] + '...'
+        lines.append(sql)
+        lines.append(f"    вызовов {stat.count}, всего {stat.total_ms:.1f} мс, среднее {stat.total_ms / stat.count:.2f} мс, "
+                     f"макс {stat.max_ms:.1f} мс, строк {stat.rows}")
+        lines.append("    мс: " + ", ".join(f"{label}: {count}" for label, count in zip(labels, stat.buckets) if count))
+        lines.append("    из: " + ", ".join(f"{where} ({count})" for where, count in stat.callers.most_common(3)))
+    return lines
+
+
+def write_summary(path, top=TOP):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(summary_lines(top)) + '\n')
+
+
+if os.environ.get('QUERY_STATS'):
+    enable(float(os.environ.get('QUERY_STATS_SLOW_MS', SLOW_QUERY_MS)), os.environ.get('QUERY_STATS_LOG', SLOW_LOG))
+    if os.environ.get('QUERY_STATS_DUMP'):
+        atexit.register(write_summary, os.environ['QUERY_STATS_DUMP'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск скрипта с замером SQL-запросов и сводкой в конце")
+    parser.add_argument('--slow-ms', type=float, default=SLOW_QUERY_MS, help="Порог медленного запроса, мс")
+    parser.add_argument('--log', default=SLOW_LOG, help="Журнал медленных запросов")
+    parser.add_argument('--top', type=int, default=TOP, help="Запросов в сводке")
+    parser.add_argument('script', help="Скрипт Python, например 1.py")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="Аргументы скрипта")
+    args = parser.parse_args()
+
+    enable(args.slow_ms, args.log)
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    try:
+        runpy.run_path(args.script, run_name='__main__')
+    finally:
+        print('\n'.join(summary_lines(args.top)))
+
+
+if __name__ == '__main__':
+    # Скрипт и db_pool импортируют query_stats по имени - сбор должен включаться в том же модуле
+    import query_stats
+    query_stats.main()
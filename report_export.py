@@ -0,0 +1,283 @@
+"""
+Выгрузка отчётов в XLSX и CSV: отчёт по автопарку на дату (в виде, как у
+заказчика в "Отчет по автопарку на дату.xlsx"), загрузка номерного фонда,
+загрузка автомобилей и история аренд.
+
+Строки не собираются ни в DataFrame, ни в список: курсор читается пачками
+по FETCH_ROWS (fetchmany), и каждая строка сразу пишется в книгу openpyxl в
+режиме write_only (строки уходят во временный XML-файл) или в csv.writer.
+Память не зависит от числа строк - выгрузка истории аренд на миллион строк
+занимает столько же, сколько на тысячу. Таблица длиннее листа Excel
+(EXCEL_MAX_ROWS) продолжается на следующих листах с той же шапкой.
+
+Без lxml openpyxl пишет XLSX заметно медленнее CSV, поэтому ячейки со
+стилем (даты, полужирный шрифт) создаются только там, где он нужен.
+
+Формат определяется расширением файла (.xlsx или .csv; CSV - UTF-8 с BOM,
+чтобы Excel открыл кириллицу):
+    python report_export.py status autopark.db 01.03.2025 "Отчет по автопарку на дату.xlsx"
+    python report_export.py usage autopark.db usage.csv [--from 2025-01-01] [--to 2025-07-01]
+    python report_export.py utilization autopark.db 2025-06-30 utilization.xlsx [--days 30]
+    python report_export.py occupancy hotel.db 2025-03-01 2025-04-01 occupancy.xlsx [--by category]
+"""
+import argparse
+import csv
+import os
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+import fleet_status_history
+import fleet_utilization
+import occupancy
+from reports_cli import connect_readonly
+
+FETCH_ROWS = 5000           # Строк в одной выборке курсора
+EXCEL_MAX_ROWS = 1048576    # Строк на листе Excel; дальше таблица продолжается на следующем листе
+DATE_FORMAT = 'DD.MM.YYYY'
+DATETIME_FORMAT = 'DD.MM.YYYY HH:MM'
+BOLD = Font(bold=True)
+
+# Ширины столбцов отчёта на дату - как в файле заказчика
+STATUS_REPORT_WIDTHS = [28.3, 60.1, 19.4, 24.0]
+
+sql_usage_history = """
+SELECT u.id_usage, v.vehicle_number, v.model, v.category, u.start_time, u.end_time
+FROM Usage u
+LEFT JOIN Vehicles v ON v.id_vehicle = u.id_vehicle
+WHERE (:date_from IS NULL OR u.start_time >= :date_from)
+  AND (:date_to IS NULL OR u.start_time < :date_to)
+ORDER BY u.id_usage
+"""
+USAGE_HISTORY_HEADER = ['№ аренды', 'Номер', 'Модель', 'Категория', 'Начало', 'Окончание']
+
+
+def fetch_rows(cursor, size=FETCH_ROWS):
+    """ Строки курсора пачками по size: в памяти не больше одной пачки. """
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def parse_moment(value):
+    """ Текст даты из базы ('ГГГГ-ММ-ДД[ ЧЧ:ММ[:СС]]') -> datetime для ячейки Excel; иначе как есть. """
+    if not isinstance(value, str) or len(value) < 10:
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+def is_xlsx(path):
+    return os.path.splitext(path)[1].lower() == '.xlsx'
+
+
+class TableWriter:
+    """
+    Потоковая запись таблицы в XLSX (write_only) или CSV по расширению path.
+    Строки - списки значений; значения datetime в XLSX пишутся датами Excel.
+    header - шапка таблицы: пишется сразу и повторяется на листах-продолжениях.
+    Если выгрузка прервана исключением, файл не сохраняется.
+    """
+
+    def __init__(self, path, title='Лист1', widths=None, header=None):
+        self.path = path
+        self.title = title
+        self.widths = widths or []
+        self.header = header
+        self.row_count = 0      # Строк на текущем листе
+        self.sheet_count = 0
+        if is_xlsx(path):
+            self.workbook = Workbook(write_only=True)
+            self.file = None
+            self.add_sheet()
+        else:
+            self.workbook = None
+            self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+            self.csv = csv.writer(self.file, delimiter=';')
+            if header:
+                self.append(header)
+
+    def add_sheet(self):
+        self.sheet_count += 1
+        self.sheet = self.workbook.create_sheet(
+            self.title if self.sheet_count == 1 else f"{self.title} ({self.sheet_count})")
+        # Ширины задаются до первой строки: в режиме write_only лист пишется сразу
+        for index, width in enumerate(self.widths):
+            self.sheet.column_dimensions[chr(ord('A') + index)].width = width
+        self.row_count = 0
+        if self.header:
+            self.append(self.header, bold=True)
+
+    def cell(self, value, bold=False):
+        """ Значение ячейки XLSX: даты и полужирные ячейки - со стилем, остальное как есть (так быстрее). """
+        if not bold and not isinstance(value, datetime):
+            return value
+        cell = WriteOnlyCell(self.sheet, value=value)
+        if isinstance(value, datetime):
+            cell.number_format = DATE_FORMAT if value.time() == datetime.min.time() else DATETIME_FORMAT
+        if bold:
+            cell.font = BOLD
+        return cell
+
+    def append(self, values, bold=False, merge_to=None):
+        """ Добавляет строку; merge_to - номер последнего столбца, с которым объединяется первая ячейка (только XLSX). """
+        if self.workbook is not None and self.row_count == EXCEL_MAX_ROWS:
+            self.add_sheet()
+        self.row_count += 1
+        if self.workbook is None:
+            self.csv.writerow([value.strftime("%d.%m.%Y %H:%M:%S").replace(' 00:00:00', '')
+                               if isinstance(value, datetime) else value for value in values])
+            return
+        self.sheet.append([self.cell(value, bold) for value in values])
+        if merge_to:
+            self.sheet.merged_cells.add(f"A{self.row_count}:{chr(ord('A') + merge_to - 1)}{self.row_count}")
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.save(self.path)
+        else:
+            self.file.close()
+
+    def discard(self):
+        """ Прерванная выгрузка: книга XLSX не сохраняется, начатый CSV удаляется. """
+        if self.workbook is None:
+            self.file.close()
+            os.remove(self.path)
+        else:
+            # Листы пишутся во временные файлы openpyxl: закрываем их, openpyxl удалит их при выходе
+            for sheet in self.workbook.worksheets:
+                sheet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def export_status_report(conn, report_date, path):
+    """ Отчёт по состоянию автопарка на конец дня report_date (datetime / 'ДД.ММ.ГГГГ') в макете заказчика. """
+    if isinstance(report_date, str):
+        report_date = datetime.strptime(report_date, "%d.%m.%Y")
+    end_of_day = report_date.strftime("%Y-%m-%d") + " 23:59:59"
+    rows = fleet_status_history.status_on(conn, end_of_day)
+    by_category = {}
+    for _, number, model, category, status, return_date in rows:
+        by_category.setdefault(category or '', []).append(
+            [number, model, status or '', parse_moment(return_date[:10]) if return_date else None])
+
+    with TableWriter(path, widths=STATUS_REPORT_WIDTHS) as writer:
+        writer.append([f"Отчет по состоянию автопарка на {report_date.strftime('%d.%m.%Y')}", None, None, None],
+                      bold=True, merge_to=4)
+        writer.append([None, None, None, None])
+        writer.append(['Номер', 'Автомобиль', 'Статус', 'Дата возврата'], bold=True)
+        for category, vehicles in by_category.items():
+            writer.append([category, None, None, None], merge_to=2)
+            writer.extend(vehicles)
+    return len(rows)
+
+
+def export_usage_history(conn, path, date_from=None, date_to=None):
+    """ История аренд с началом в [date_from, date_to) (None - без границы). Возвращает число аренд. """
+    cursor = conn.execute(sql_usage_history, {'date_from': date_from, 'date_to': date_to})
+    count = 0
+    with TableWriter(path, title='История аренд', widths=[12, 14, 28, 18, 18, 18],
+                     header=USAGE_HISTORY_HEADER) as writer:
+        for id_usage, number, model, category, start_time, end_time in fetch_rows(cursor):
+            writer.append([id_usage, number, model, category, parse_moment(start_time), parse_moment(end_time)])
+            count += 1
+    return count
+
+
+def export_utilization(conn, as_of, path, window_days=fleet_utilization.WINDOW_DAYS):
+    """ Процент загрузки автомобилей и категорий за window_days суток до as_of. """
+    by_vehicle, by_category = fleet_utilization.utilization(conn, as_of, window_days)
+    with TableWriter(path, title='Загрузка автопарка', widths=[14, 28, 18, 14, 14, 12, 10],
+                     header=['Номер', 'Модель', 'Категория', 'Часов в аренде', 'Доступно часов', 'Загрузка, %',
+                             'Аренд']) as writer:
+        for _, number, model, category, rented, available, percent, rentals in by_vehicle:
+            writer.append([number, model, category, round(rented, 1), round(available, 1), round(percent, 1), rentals])
+        writer.append([None] * 7)
+        writer.append(['Категория', 'Автомобилей', 'Часов в аренде', 'Доступно часов', 'Загрузка, %'], bold=True)
+        for category, vehicles, rented, available, percent in by_category:
+            writer.append([category, vehicles, round(rented, 1), round(available, 1), round(percent, 1)])
+    return len(by_vehicle)
+
+
+def export_occupancy(conn, date_from, date_to, path, by=occupancy.BY_CATEGORY):
+    """ Загрузка номерного фонда за [date_from, date_to): весь фонд и разбивка by. """
+    key_title = {occupancy.BY_CATEGORY: 'Категория', occupancy.BY_FLOOR: 'Этаж'}[by]
+    with TableWriter(path, title='Загрузка номеров', widths=[24, 16, 12, 14]) as writer:
+        writer.append([f"Загрузка номерного фонда с {date_from} по {date_to} (не включая)", None, None, None],
+                      bold=True, merge_to=4)
+        writer.append([key_title, 'Продано ночей', 'Номеров', 'Загрузка, %'], bold=True)
+        rows = occupancy.occupancy(conn, date_from, date_to, by=by)
+        for name, nights, rooms, percent in rows:
+            writer.append([name, nights, rooms, percent])
+        for _, nights, rooms, percent in occupancy.occupancy(conn, date_from, date_to):
+            writer.append(['Всего', nights, rooms, percent], bold=True)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='report', required=True)
+
+    status = commands.add_parser('status', help="Отчет по автопарку на дату")
+    status.add_argument('db')
+    status.add_argument('date', help="ДД.ММ.ГГГГ")
+    status.add_argument('output')
+
+    usage = commands.add_parser('usage', help="История аренд")
+    usage.add_argument('db')
+    usage.add_argument('output')
+    usage.add_argument('--from', dest='date_from', help="Начало не раньше ГГГГ-ММ-ДД")
+    usage.add_argument('--to', dest='date_to', help="Начало раньше ГГГГ-ММ-ДД")
+
+    utilization = commands.add_parser('utilization', help="Загрузка автопарка")
+    utilization.add_argument('db')
+    utilization.add_argument('as_of', help="ГГГГ-ММ-ДД")
+    utilization.add_argument('output')
+    utilization.add_argument('--days', type=int, default=fleet_utilization.WINDOW_DAYS)
+
+    hotel = commands.add_parser('occupancy', help="Загрузка номерного фонда")
+    hotel.add_argument('db')
+    hotel.add_argument('date_from', help="ГГГГ-ММ-ДД")
+    hotel.add_argument('date_to', help="ГГГГ-ММ-ДД, не включается")
+    hotel.add_argument('output')
+    hotel.add_argument('--by', choices=[occupancy.BY_CATEGORY, occupancy.BY_FLOOR], default=occupancy.BY_CATEGORY)
+    args = parser.parse_args()
+
+    conn = connect_readonly(args.db)
+    if args.report == 'status':
+        try:
+            count = export_status_report(conn, args.date, args.output)
+        except ValueError as e:
+            # Дата раньше начала истории статусов или в неверном формате
+            conn.close()
+            parser.exit(1, f"Ошибка: {e}\n")
+    elif args.report == 'usage':
+        count = export_usage_history(conn, args.output, args.date_from, args.date_to)
+    elif args.report == 'utilization':
+        count = export_utilization(conn, args.as_of, args.output, args.days)
+    else:
+        count = export_occupancy(conn, args.date_from, args.date_to, args.output, args.by)
+    conn.close()
+    print(f"Сохранено в {args.output} (строк: {count})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Отчёты без окон: загрузка номерного фонда, загрузка и доход автопарка
+на список или диапазон дат, вывод в CSV или JSON.
+
+Каждая дата считается отдельно в пуле процессов; каждый процесс один раз
+открывает свою базу только на чтение (file:...?mode=ro) и считает те же
+функции, что и приложения (occupancy, fleet_utilization, fleet_revenue).
+Отчёты по разным датам не зависят друг от друга, поэтому год ежедневных
+отчётов идёт примерно столько, сколько 365 / число ядер отчётов по одному.
+
+    python reports_cli.py occupancy hotel.db --from 2025-01-01 --to 2025-12-31 [--by category] [--days 1]
+    python reports_cli.py utilization autopark.db --dates 2025-03-31,2025-06-30 [--by vehicle] [--days 30]
+    python reports_cli.py revenue autopark.db --from 2025-01-01 --to 2025-01-31 --format json --output revenue.json
+
+Отчёт на дату d:
+    occupancy   - загрузка за [d, d + days), days по умолчанию 1 (ночь с d на d + 1)
+    utilization - загрузка автомобилей за days суток, заканчивая днём d включительно
+    revenue     - средний доход в рабочий день за days суток, заканчивая днём d включительно
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+import fleet_revenue
+import fleet_utilization
+import occupancy
+
+# Разбивка по умолчанию и допустимые разбивки каждого отчёта
+REPORTS = {
+    'occupancy': ('total', ['total', 'category', 'floor']),
+    'utilization': ('category', ['category', 'vehicle']),
+    'revenue': ('total', ['total', 'vehicle']),
+}
+DEFAULT_DAYS = {'occupancy': 1, 'utilization': fleet_utilization.WINDOW_DAYS, 'revenue': 30}
+
+_conn = None  # Соединение процесса пула
+
+
+def connect_readonly(db_filename):
+    """ Соединение только для чтения: отчёт не может ни изменить базу, ни создать пустую вместо отсутствующей. """
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_filename))}?mode=ro", uri=True)
+
+
+def init_worker(db_filename):
+    global _conn
+    _conn = connect_readonly(db_filename)
+
+
+def occupancy_rows(conn, day, by, days):
+    date_to = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+    group = {'total': None, 'category': occupancy.BY_CATEGORY, 'floor': occupancy.BY_FLOOR}[by]
+    return [{'date': day, by: name if by != 'total' else 'Всего', 'sold_nights': nights, 'rooms': rooms, 'percent': percent}
+            for name, nights, rooms, percent in occupancy.occupancy(conn, day, date_to, by=group)]
+
+
+def utilization_rows(conn, day, by, days):
+    by_vehicle, by_category = fleet_utilization.utilization(conn, day, days)
+    if by == 'vehicle':
+        return [{'date': day, 'id_vehicle': row[0], 'vehicle_number': row[1], 'model': row[2], 'category': row[3],
+                 'rented_hours': round(row[4], 2), 'available_hours': round(row[5], 2),
+                 'percent': round(row[6], 2), 'rentals': row[7]}
+                for row in by_vehicle]
+    return [{'date': day, 'category': row[0], 'vehicles': row[1], 'rented_hours': round(row[2], 2),
+             'available_hours': round(row[3], 2), 'percent': round(row[4], 2)}
+            for row in by_category]
+
+
+def revenue_rows(conn, day, by, days):
+    by_vehicle, (total_revenue, total_days, per_day) = fleet_revenue.average_revenue_as_of(conn, day, days)
+    if by == 'vehicle':
+        return [{'date': day, 'id_vehicle': row[0], 'vehicle_number': row[1], 'model': row[2], 'category': row[3],
+                 'net_revenue': round(row[4], 2), 'working_days': row[5], 'revenue_per_day': round(row[6], 2)}
+                for row in by_vehicle]
+    return [{'date': day, 'net_revenue': round(total_revenue, 2), 'working_days': total_days,
+             'revenue_per_day': round(per_day, 2)}]
+
+
+REPORT_ROWS = {'occupancy': occupancy_rows, 'utilization': utilization_rows, 'revenue': revenue_rows}
+
+
+def run_report(task):
+    """ Строки отчёта на одну дату; выполняется в процессе пула. """
+    report, day, by, days = task
+    return REPORT_ROWS[report](_conn, day, by, days)
+
+
+def date_list(date_from=None, date_to=None, dates=None, step=1):
+    """ Даты 'YYYY-MM-DD': явный список или диапазон [date_from, date_to] включительно с шагом step дней. """
+    if dates:
+        return [datetime.strptime(day.strip(), "%Y-%m-%d").strftime("%Y-%m-%d") for day in dates.split(',') if day.strip()]
+    day = datetime.strptime(date_from, "%Y-%m-%d")
+    last = datetime.strptime(date_to or date_from, "%Y-%m-%d")
+    result = []
+    while day <= last:
+        result.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=step)
+    return result
+
+
+def run(report, db_filename, dates, by=None, days=None, workers=None):
+    """ Строки отчёта по всем датам в порядке дат. workers=1 - без пула, в текущем процессе. """
+    by = by or REPORTS[report][0]
+    days = days or DEFAULT_DAYS[report]
+    tasks = [(report, day, by, days) for day in dates]
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) or 1
+    if workers == 1:
+        init_worker(db_filename)
+        try:
+            return [row for task in tasks for row in run_report(task)]
+        finally:
+            _conn.close()
+    # Задачи раздаются пачками: меньше обменов между процессами на коротких отчётах
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(db_filename,)) as pool:
+        return [row for rows in pool.map(run_report, tasks, chunksize=chunksize) for row in rows]
+
+
+def write_rows(rows, output_format, file):
+    if output_format == 'json':
+        json.dump(rows, file, ensure_ascii=False, indent=2)
+        file.write('\n')
+        return
+    if not rows:
+        return
+    writer = csv.DictWriter(file, fieldnames=list(rows[0]), lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('report', choices=list(REPORTS), help="Отчёт")
+    parser.add_argument('db', help="Файл базы (hotel.db или autopark.db)")
+    parser.add_argument('--from', dest='date_from', help="Первая дата ГГГГ-ММ-ДД")
+    parser.add_argument('--to', dest='date_to', help="Последняя дата ГГГГ-ММ-ДД (включительно)")
+    parser.add_argument('--step', type=int, default=1, help="Шаг диапазона дат, дней")
+    parser.add_argument('--dates', help="Даты через запятую вместо диапазона")
+    parser.add_argument('--by', help="Разбивка: occupancy - total/category/floor, "
+                                     "utilization - category/vehicle, revenue - total/vehicle")
+    parser.add_argument('--days', type=int, help="Длина периода отчёта, дней")
+    parser.add_argument('--workers', type=int, help="Процессов (по умолчанию - число ядер)")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', help="Формат вывода")
+    parser.add_argument('--output', help="Файл результата (по умолчанию - стандартный вывод)")
+    args = parser.parse_args()
+
+    if not args.dates and not args.date_from:
+        parser.error("нужны --dates или --from")
+    if args.by and args.by not in REPORTS[args.report][1]:
+        parser.error(f"для {args.report} --by может быть: {', '.join(REPORTS[args.report][1])}")
+    if not os.path.exists(args.db):
+        parser.error(f"база {args.db} не найдена")
+    try:
+        dates = date_list(args.date_from, args.date_to, args.dates, args.step)
+    except ValueError:
+        parser.error("даты должны быть в формате ГГГГ-ММ-ДД")
+
+    try:
+        rows = run(args.report, args.db, dates, args.by, args.days, args.workers)
+    except sqlite3.Error as e:
+        print(f"Ошибка базы данных: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as file:
+            write_rows(rows, args.format, file)
+    else:
+        write_rows(rows, args.format, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Пакетный импорт номерного фонда из DataFrame (столбцы 'Этаж', 'Номер', 'Категория').
+
+Вместо построчного df.iterrows() с SELECT на каждую строку существующие номера
+и справочник категорий читаются один раз, строки готовятся векторными
+операциями pandas, а вставка идёт через executemany в одной транзакции.
+
+import_rooms_batches() - то же для пачек строк потокового чтения
+(excel_stream): номера каждой пачки ищутся в базе по индексу
+idx_rooms_number, так что в памяти не держится ни файл, ни список всех номеров.
+"""
+import itertools
+
+import pandas as pd
+
+EXPECTED_COLUMNS = ['Этаж', 'Номер', 'Категория']
+LOOKUP_CHUNK = 500  # Номеров в одном запросе IN (...)
+
+
+def import_rooms_bulk(conn, df, status='Чистый'):
+    """
+    Добавляет в Rooms номера из df, которых ещё нет в базе (по room_number).
+    Недостающие категории создаются в RoomCategories.
+    Возвращает (добавлено, пропущено). Фиксацию транзакции выполняет вызывающий код.
+    """
+    cursor = begin_immediate(conn)
+    rooms = _prepare(df)
+
+    # Номер пропускается, если он уже есть в базе или встречался выше в этом же файле
+    existing = {row[0] for row in cursor.execute("SELECT room_number FROM Rooms")}
+    new_rooms = rooms[~rooms['room_number'].isin(existing) & ~rooms['room_number'].duplicated()]
+
+    categories = dict(cursor.execute("SELECT name, id_category FROM RoomCategories"))
+    _insert(cursor, new_rooms, categories, status)
+
+    added = len(new_rooms)
+    return added, len(rooms) - added
+
+
+def import_rooms_batches(conn, frames, status='Чистый'):
+    """
+    То же, что import_rooms_bulk, для последовательности DataFrame (например,
+    excel_stream.iter_batches): каждая пачка записывается сразу после чтения.
+    Возвращает (добавлено, пропущено). Фиксацию транзакции выполняет вызывающий код.
+    """
+    cursor = begin_immediate(conn)
+    categories = dict(cursor.execute("SELECT name, id_category FROM RoomCategories"))
+    added = skipped = 0
+    for df in frames:
+        rooms = _prepare(df)
+        numbers = rooms['room_number'].unique().tolist()
+        existing = set()
+        # Номера предыдущих пачек уже вставлены в этой транзакции и тоже находятся запросом
+        for i in range(0, len(numbers), LOOKUP_CHUNK):
+            chunk = numbers[i:i + LOOKUP_CHUNK]
+            existing.update(row[0] for row in cursor.execute(
+                f"SELECT room_number FROM Rooms WHERE room_number IN ({', '.join('?' * len(chunk))})", chunk))
+        new_rooms = rooms[~rooms['room_number'].isin(existing) & ~rooms['room_number'].duplicated()]
+        _insert(cursor, new_rooms, categories, status)
+        added += len(new_rooms)
+        skipped += len(rooms) - len(new_rooms)
+    return added, skipped
+
+
+def begin_immediate(conn):
+    """ Курсор в транзакции: новая открывается BEGIN IMMEDIATE, уже начатая вызывающим кодом продолжается. """
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        # Блокируем запись сразу, чтобы между чтением справочников и вставкой никто не вклинился
+        cursor.execute("BEGIN IMMEDIATE")
+    return cursor
+
+
+def _prepare(df):
+    return pd.DataFrame({
+        'room_number': df['Номер'].astype(str).str.strip(),
+        'floor': df['Этаж'].astype(str).str.strip(),
+        'category': df['Категория'].astype(str).str.strip(),
+    })
+
+
+def _insert(cursor, new_rooms, categories, status):
+    """ Вставляет new_rooms, при необходимости дополняя categories ({название: id}) новыми категориями. """
+    missing = [name for name in new_rooms['category'].unique() if name not in categories]
+    if missing:
+        cursor.executemany("INSERT INTO RoomCategories (name) VALUES (?)", [(name,) for name in missing])
+        categories.update(cursor.execute("SELECT name, id_category FROM RoomCategories"))
+
+    category_ids = new_rooms['category'].map(categories).tolist()
+    cursor.executemany(
+        "INSERT INTO Rooms (room_number, floor, id_category, status) VALUES (?, ?, ?, ?)",
+        zip(new_rooms['room_number'].tolist(), new_rooms['floor'].tolist(), category_ids, itertools.repeat(status))
+    )
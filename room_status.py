@@ -0,0 +1,142 @@
+"""
+Сводка номерного фонда RoomStatusSummary: число номеров по (категория, этаж, статус).
+
+Сводку ведут триггеры на INSERT / UPDATE / DELETE таблицы Rooms, поэтому окно
+"Загруженность номеров" читает O(категорий * этажей * статусов) строк вместо
+трёх агрегирующих проходов по Rooms. check_consistency() сверяет сводку с
+Rooms и при расхождении пересобирает её с нуля.
+
+    python room_status.py [hotel.db]   - проверить и при необходимости пересобрать
+"""
+import sqlite3
+import sys
+
+OCCUPIED_STATUS = 'Занят'
+
+sql_create_summary = """
+CREATE TABLE IF NOT EXISTS RoomStatusSummary (
+    id_category INTEGER NOT NULL,
+    floor TEXT NOT NULL,    -- Rooms.floor, NULL хранится как ''
+    status TEXT NOT NULL,   -- Rooms.status, NULL хранится как ''
+    room_count INTEGER NOT NULL,
+    PRIMARY KEY (id_category, floor, status)
+) WITHOUT ROWID;
+"""
+
+
+def _count_room_sql(room, sign):
+    """ Учитывает номер room (NEW / OLD) в его строке сводки со знаком sign. """
+    return f"""
+        INSERT INTO RoomStatusSummary (id_category, floor, status, room_count)
+        VALUES ({room}.id_category, COALESCE({room}.floor, ''), COALESCE({room}.status, ''), {sign})
+        ON CONFLICT (id_category, floor, status) DO UPDATE SET room_count = room_count + excluded.room_count;
+    """
+
+
+def _drop_empty_sql(room):
+    """ Удаляет строку сводки номера room, если в ней не осталось номеров. """
+    return f"""
+        DELETE FROM RoomStatusSummary
+        WHERE id_category = {room}.id_category AND floor = COALESCE({room}.floor, '')
+          AND status = COALESCE({room}.status, '') AND room_count = 0;
+    """
+
+
+sql_create_triggers = f"""
+CREATE TRIGGER IF NOT EXISTS trg_room_status_insert AFTER INSERT ON Rooms
+BEGIN
+    {_count_room_sql('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_room_status_delete AFTER DELETE ON Rooms
+BEGIN
+    {_count_room_sql('OLD', -1)}
+    {_drop_empty_sql('OLD')}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_room_status_update AFTER UPDATE OF id_category, floor, status ON Rooms
+BEGIN
+    {_count_room_sql('OLD', -1)}
+    {_count_room_sql('NEW', 1)}
+    {_drop_empty_sql('OLD')}
+END;
+"""
+
+sql_actual_counts = """
+SELECT id_category, COALESCE(floor, ''), COALESCE(status, ''), COUNT(*)
+FROM Rooms
+GROUP BY 1, 2, 3
+"""
+
+
+def install(conn):
+    """ Создаёт RoomStatusSummary и триггеры; новая сводка сразу заполняется по Rooms. """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='RoomStatusSummary'"
+    ).fetchone()
+    conn.execute(sql_create_summary)
+    conn.executescript(sql_create_triggers)
+    if not exists:
+        rebuild(conn)
+    conn.commit()
+
+
+def rebuild(conn):
+    """ Пересобирает сводку с нуля. Фиксацию выполняет вызывающий код. """
+    conn.execute("DELETE FROM RoomStatusSummary")
+    conn.execute(f"INSERT INTO RoomStatusSummary (id_category, floor, status, room_count) {sql_actual_counts}")
+
+
+def check_consistency(conn, repair=True):
+    """
+    Сравнивает сводку с фактическими данными Rooms.
+    Возвращает список расхождений ((категория, этаж, статус), в сводке, в Rooms);
+    при repair=True и наличии расхождений сводка пересобирается и фиксируется.
+    """
+    stored = {row[:3]: row[3] for row in conn.execute("SELECT * FROM RoomStatusSummary")}
+    actual = {row[:3]: row[3] for row in conn.execute(sql_actual_counts)}
+    differences = [(key, stored.get(key, 0), actual.get(key, 0))
+                   for key in sorted(stored.keys() | actual.keys(), key=repr)
+                   if stored.get(key, 0) != actual.get(key, 0)]
+    if differences and repair:
+        rebuild(conn)
+        conn.commit()
+    return differences
+
+
+def occupancy_summary(conn, occupied_status=OCCUPIED_STATUS):
+    """
+    Загруженность по сводке: (общий процент, [(категория, всего, занято)], [(этаж, всего, занято)]).
+    Формат совпадает с прежним calculate_occupancy.
+    """
+    occupied = "SUM(CASE WHEN s.status = ? THEN s.room_count ELSE 0 END)"
+
+    total_rooms, occupied_rooms = conn.execute(
+        f"SELECT SUM(s.room_count), {occupied} FROM RoomStatusSummary s", (occupied_status,)
+    ).fetchone()
+    total_occupancy = (occupied_rooms / total_rooms * 100) if total_rooms else 0
+
+    category_occupancy = conn.execute(f"""
+        SELECT rc.name, SUM(s.room_count), {occupied}
+        FROM RoomStatusSummary s
+        JOIN RoomCategories rc ON s.id_category = rc.id_category
+        GROUP BY rc.name
+    """, (occupied_status,)).fetchall()
+
+    floor_occupancy = conn.execute(
+        f"SELECT s.floor, SUM(s.room_count), {occupied} FROM RoomStatusSummary s GROUP BY s.floor",
+        (occupied_status,)
+    ).fetchall()
+
+    return total_occupancy, category_occupancy, floor_occupancy
+
+
+if __name__ == "__main__":
+    db_filename = sys.argv[1] if len(sys.argv) > 1 else 'hotel.db'
+    conn = sqlite3.connect(db_filename)
+    install(conn)
+    differences = check_consistency(conn)
+    for (id_category, floor, status), stored_count, actual_count in differences:
+        print(f"Категория {id_category}, этаж '{floor}', статус '{status}': в сводке {stored_count}, в Rooms {actual_count}")
+    print("Сводка пересобрана" if differences else "Сводка соответствует таблице Rooms")
+    conn.close()
@@ -0,0 +1,396 @@
+"""
+Генератор синтетических данных для замеров производительности.
+
+Создаёт базу гостиницы (RoomCategories, Rooms, Guests, Bookings, Payments,
+Employees, Cleaning, Users) или автопарка (Users, Vehicles, Usage,
+RentalPayments, VehicleMileage, журнал статусов VehicleStatusEvents), а также
+файлы для импорта: "Номерной фонд" в Excel и выгрузки "Автопарк" /
+"Данные по пробегу" в TXT. Журнал статусов строится по арендам, поэтому
+отчёт по автопарку на дату работает на всём сгенерированном периоде.
+
+Данные полностью определяются параметрами и seed: один и тот же вызов даёт
+ту же базу, поэтому замеры разных версий кода сравнимы. Объём задаётся
+числом номеров / автомобилей и длиной периода: 10000 номеров за 730 дней -
+это около полутора миллионов бронирований. Строки пишутся пачками через
+executemany, сводки (RoomNightsDaily, RoomStatusSummary, VehicleDailyStats)
+строятся один раз после загрузки, а не триггерами на каждую строку.
+
+    python synthetic_data.py hotel hotel.db [--rooms 2000] [--days 365] [--seed 1]
+    python synthetic_data.py fleet autopark.db [--vehicles 500] [--days 365] [--seed 1]
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import fleet_revenue
+import fleet_status_history
+import migrations
+import occupancy
+
+SEED = 1
+PERIOD_END = '2025-07-01'  # Данные заканчиваются этой датой, чтобы не зависеть от дня запуска
+BATCH_SIZE = 10000         # Строк в одном executemany
+
+ROOM_CATEGORIES = [('Стандарт', 3500, 2), ('Комфорт', 5000, 2), ('Люкс', 9000, 3), ('Апартаменты', 14000, 4)]
+ROOM_STATUSES = ['Чистый', 'Грязный', 'Назначен к уборке']
+ROOMS_PER_FLOOR = 50
+PAYMENT_TYPES = ['Наличные', 'Карта']
+FIRST_NAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Алексей', 'Елена', 'Дмитрий', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов']
+
+VEHICLE_MODELS = {
+    'На каждый день': ['Geely Coolray Flagship', 'Renault Duster', 'Kia Rio', 'Hyundai Solaris'],
+    'Бизнес': ['Toyota Camry', 'Kia K5', 'Skoda Superb'],
+    'Премиум': ['BMW 5', 'Mercedes-Benz E', 'Audi A6'],
+    'Минивэн': ['Kia Carnival', 'Hyundai Staria'],
+}
+PLATE_LETTERS = 'авекмнорстух'
+PLATE_REGIONS = ['77', '97', '99', '177', '197', '797', '799']
+
+def insert_batched(conn, sql, rows, batch_size=BATCH_SIZE):
+    """ Вставляет поток строк пачками по batch_size. """
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        conn.executemany(sql, batch)
+
+
+def add_users(conn, users_count):
+    """ admin / admin и пользователи user1..userN с паролем, равным логину. """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [('admin', 'admin', 'Администратор')] + [(f'user{i}', f'user{i}', 'Пользователь') for i in range(1, users_count + 1)]
+    conn.executemany(
+        "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, 0, ?)",
+        [row + (now,) for row in rows]
+    )
+
+
+def person_name(rng):
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+
+
+# --- Гостиница ---
+
+def room_numbers(rooms_count):
+    """ (номер, этаж) по ROOMS_PER_FLOOR номеров на этаже: 101, 102, ... 201, ... """
+    for i in range(rooms_count):
+        floor = i // ROOMS_PER_FLOOR + 1
+        yield f"{floor}{i % ROOMS_PER_FLOOR + 1:02d}", str(floor)
+
+
+def generate_bookings(rng, rooms_count, period_start, period_end, guests_count):
+    """
+    Бронирования каждого номера друг за другом без пересечений:
+    (id_room, заезд, выезд, статус, id_guest). Отменённые ночей не занимают,
+    поэтому после них номер продаётся заново.
+    """
+    for id_room in range(1, rooms_count + 1):
+        day = period_start + timedelta(days=rng.randint(0, 3))
+        while day < period_end:
+            check_out = day + timedelta(days=rng.randint(1, 7))
+            if rng.random() < 0.05:
+                status = occupancy.CANCELLED_STATUS
+            elif check_out <= period_end:
+                status = 'Завершено'
+            else:
+                status = 'Активно'
+            yield id_room, day, check_out, status, rng.randint(1, guests_count)
+            if status != occupancy.CANCELLED_STATUS:
+                day = check_out + timedelta(days=rng.randint(0, 3))
+
+
+def generate_hotel(path, rooms=500, days=365, users=10, seed=SEED, period_end=PERIOD_END):
+    """
+    Создаёт базу гостиницы path с rooms номерами и бронированиями за days дней до period_end.
+    Возвращает {таблица: число строк}.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"База {path} уже существует")
+    rng = random.Random(seed)
+    end = datetime.strptime(period_end, "%Y-%m-%d")
+    start = end - timedelta(days=days)
+    conn = sqlite3.connect(path)
+    # Только таблицы: индексы и сводки создаются после загрузки
+    migrations.migrate(conn, migrations.HOTEL, target=1)
+
+    conn.executemany(
+        "INSERT INTO RoomCategories (name, description, base_price, capacity) VALUES (?, ?, ?, ?)",
+        [(name, f"Номер категории {name}", price, capacity) for name, price, capacity in ROOM_CATEGORIES]
+    )
+    prices = {i + 1: price for i, (_, price, _) in enumerate(ROOM_CATEGORIES)}
+    room_categories = [rng.randint(1, len(ROOM_CATEGORIES)) for _ in range(rooms)]
+
+    guests_count = max(rooms * days // 15, 1)
+    insert_batched(conn, "INSERT INTO Guests (full_name, contact_info, passport_info) VALUES (?, ?, ?)", (
+        (person_name(rng), f"+7 9{rng.randint(0, 10 ** 9 - 1):09d}", f"{rng.randint(1000, 9999)} {rng.randint(100000, 999999)}")
+        for _ in range(guests_count)
+    ))
+    employees_count = max(rooms // 25, 1)
+    conn.executemany("INSERT INTO Employees (full_name, position, schedule) VALUES (?, 'Горничная', '2/2')",
+                     [(person_name(rng),) for _ in range(employees_count)])
+
+    occupied_rooms = set()
+    bookings = payments = cleanings = 0
+    booking_rows, payment_rows, cleaning_rows = [], [], []
+
+    def flush():
+        conn.executemany("INSERT INTO Bookings (id_booking, check_in, check_out, status, id_guest, id_room) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", booking_rows)
+        conn.executemany("INSERT INTO Payments (payment_date, amount, payment_type, id_booking) VALUES (?, ?, ?, ?)",
+                         payment_rows)
+        conn.executemany("INSERT INTO Cleaning (cleaning_date, status, id_room, id_employee) VALUES (?, ?, ?, ?)",
+                         cleaning_rows)
+        booking_rows.clear(), payment_rows.clear(), cleaning_rows.clear()
+
+    for id_room, check_in, check_out, status, id_guest in generate_bookings(rng, rooms, start, end, guests_count):
+        bookings += 1
+        booking_rows.append((bookings, check_in.strftime("%Y-%m-%d"), check_out.strftime("%Y-%m-%d"),
+                             status, id_guest, id_room))
+        if status != occupancy.CANCELLED_STATUS:
+            nights = (check_out - check_in).days
+            payment_rows.append((check_in.strftime("%Y-%m-%d"), prices[room_categories[id_room - 1]] * nights,
+                                 rng.choice(PAYMENT_TYPES), bookings))
+            if status == 'Завершено':
+                cleaning_rows.append((check_out.strftime("%Y-%m-%d"), 'Выполнено', id_room,
+                                      rng.randint(1, employees_count)))
+            else:
+                occupied_rooms.add(id_room)
+        if len(booking_rows) >= BATCH_SIZE:
+            payments += len(payment_rows)
+            cleanings += len(cleaning_rows)
+            flush()
+    payments += len(payment_rows)
+    cleanings += len(cleaning_rows)
+    flush()
+
+    conn.executemany("INSERT INTO Rooms (id_room, room_number, floor, status, id_category) VALUES (?, ?, ?, ?, ?)", [
+        (i, number, floor, 'Занят' if i in occupied_rooms else rng.choice(ROOM_STATUSES), room_categories[i - 1])
+        for i, (number, floor) in enumerate(room_numbers(rooms), start=1)
+    ])
+    add_users(conn, users)
+    conn.commit()
+
+    # Индексы и сводки строятся по готовым данным один раз
+    migrations.migrate(conn, migrations.HOTEL)
+    conn.close()
+    return {'Rooms': rooms, 'Guests': guests_count, 'Bookings': bookings, 'Payments': payments,
+            'Employees': employees_count, 'Cleaning': cleanings, 'Users': users + 1}
+
+
+# --- Автопарк ---
+
+def vehicle_plate(rng, used):
+    """ Уникальный номерной знак вида а123бв77. """
+    while True:
+        plate = (rng.choice(PLATE_LETTERS) + f"{rng.randint(1, 999):03d}" + rng.choice(PLATE_LETTERS)
+                 + rng.choice(PLATE_LETTERS) + rng.choice(PLATE_REGIONS))
+        if plate not in used:
+            used.add(plate)
+            return plate
+
+
+def generate_vehicles(rng, vehicles_count):
+    """ [(номер, марка, категория)] """
+    used = set()
+    categories = list(VEHICLE_MODELS)
+    vehicles = []
+    for _ in range(vehicles_count):
+        category = rng.choice(categories)
+        vehicles.append((vehicle_plate(rng, used), rng.choice(VEHICLE_MODELS[category]), category))
+    return vehicles
+
+
+def generate_usage(rng, vehicles_count, period_start, period_end):
+    """
+    Аренды каждого автомобиля друг за другом: (id_vehicle, начало, конец).
+    Аренда, которая не закончилась к period_end, остаётся открытой (конец None).
+    """
+    for id_vehicle in range(1, vehicles_count + 1):
+        moment = period_start + timedelta(hours=rng.randint(0, 48))
+        while moment < period_end:
+            end = moment + timedelta(hours=rng.randint(2, 96))
+            yield id_vehicle, moment, end if end <= period_end else None
+            if end > period_end:
+                break
+            moment = end + timedelta(hours=rng.randint(1, 72))
+
+
+# Аренда - событие 'Занят' в начале и 'Свободен' в конце; окончание раньше начала в ту же секунду
+sql_seed_status_events = """
+INSERT INTO VehicleStatusEvents (id_vehicle, changed_at, vehicle_number, model, category, status, return_date)
+SELECT e.id_vehicle, e.changed_at, v.vehicle_number, v.model, v.category, e.status, e.return_date
+FROM (
+    SELECT id_usage, id_vehicle, start_time AS changed_at, 'Занят' AS status, substr(end_time, 1, 10) AS return_date, 1 AS step
+    FROM Usage
+    UNION ALL
+    SELECT id_usage, id_vehicle, end_time, 'Свободен', NULL, 0 FROM Usage WHERE end_time IS NOT NULL
+) e
+JOIN Vehicles v ON v.id_vehicle = e.id_vehicle
+ORDER BY e.changed_at, e.step, e.id_usage
+"""
+
+
+def seed_status_history(conn, period_start, every=fleet_status_history.CHECKPOINT_EVERY):
+    """
+    Журнал статусов за период, как если бы он вёлся с period_start: начальная
+    контрольная точка (все автомобили свободны), события аренд в порядке времени
+    и точки через каждые every событий. Вызывается до установки триггеров журнала.
+    Возвращает число событий.
+    """
+    conn.executescript(fleet_status_history.sql_create_tables)
+
+    def add_checkpoint(taken_at, last_event_id, rows):
+        id_checkpoint = conn.execute("INSERT INTO VehicleStatusCheckpoints (taken_at, last_event_id) VALUES (?, ?)",
+                                     (taken_at, last_event_id)).lastrowid
+        conn.executemany("INSERT INTO VehicleStatusCheckpointRows "
+                         "(id_checkpoint, id_vehicle, vehicle_number, model, category, status, return_date) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", ((id_checkpoint,) + tuple(row) for row in rows))
+
+    add_checkpoint(period_start.strftime("%Y-%m-%d %H:%M:%S"), 0, conn.execute(
+        "SELECT id_vehicle, vehicle_number, model, category, 'Свободен', NULL FROM Vehicles ORDER BY id_vehicle"
+    ).fetchall())
+    events = conn.execute(sql_seed_status_events).rowcount
+
+    last_event_id = every
+    while last_event_id < events:
+        taken_at = conn.execute("SELECT changed_at FROM VehicleStatusEvents WHERE id_event = ?",
+                                (last_event_id,)).fetchone()[0]
+        # Точка включает все события своей секунды: события идут по времени, дальше - только более поздние
+        later = conn.execute("SELECT id_event FROM VehicleStatusEvents WHERE id_event > ? AND changed_at > ? "
+                             "ORDER BY id_event LIMIT 1", (last_event_id, taken_at)).fetchone()
+        last_event_id = later[0] - 1 if later is not None else events
+        add_checkpoint(taken_at, last_event_id, fleet_status_history.status_on(conn, taken_at))
+        last_event_id += every
+    return events
+
+
+def generate_fleet(path, vehicles=200, days=365, users=10, seed=SEED, period_end=PERIOD_END):
+    """
+    Создаёт базу автопарка path с vehicles автомобилями, арендами, оплатами и
+    ежемесячными показаниями пробега за days дней до period_end.
+    Возвращает {таблица: число строк}.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"База {path} уже существует")
+    rng = random.Random(seed)
+    end = datetime.strptime(period_end, "%Y-%m-%d")
+    start = end - timedelta(days=days)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, migrations.FLEET, target=1)
+    # Оплаты создаются вместе с таблицей RentalPayments, сводка - после загрузки
+    conn.executescript(fleet_revenue.sql_create_tables)
+
+    fleet = generate_vehicles(rng, vehicles)
+    usage_rows, payment_rows = [], []
+    usage_count = payments = 0
+    open_rentals = set()
+    hours = [0.0] * (vehicles + 1)
+
+    def flush():
+        conn.executemany("INSERT INTO Usage (id_usage, id_vehicle, start_time, end_time) VALUES (?, ?, ?, ?)", usage_rows)
+        conn.executemany("INSERT INTO RentalPayments (id_usage, id_vehicle, payment_date, amount, discount, tax) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", payment_rows)
+        usage_rows.clear(), payment_rows.clear()
+
+    for id_vehicle, begin, finish in generate_usage(rng, vehicles, start, end):
+        usage_count += 1
+        usage_rows.append((usage_count, id_vehicle, begin.strftime("%Y-%m-%d %H:%M:%S"),
+                           finish.strftime("%Y-%m-%d %H:%M:%S") if finish else None))
+        if finish is None:
+            open_rentals.add(id_vehicle)
+            continue
+        rented = (finish - begin).total_seconds() / 3600
+        hours[id_vehicle] += rented
+        amount = round(rented * rng.choice((500, 700, 1200)), 2)
+        payment_rows.append((usage_count, id_vehicle, finish.strftime("%Y-%m-%d %H:%M:%S"),
+                             amount, round(amount * rng.choice((0, 0, 0.05, 0.1)), 2), round(amount * 0.2 / 1.2, 2)))
+        payments += 1
+        if len(usage_rows) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    conn.executemany(
+        "INSERT INTO Vehicles (id_vehicle, vehicle_number, model, category, status, total_hours) VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, number, model, category, 'Занят' if i in open_rentals else 'Свободен', round(hours[i], 1))
+         for i, (number, model, category) in enumerate(fleet, start=1)]
+    )
+
+    # Показания пробега раз в 30 дней
+    months = max(days // 30, 1)
+    mileage_count = vehicles * months
+
+    def mileage_rows():
+        for id_vehicle in range(1, vehicles + 1):
+            mileage = rng.randint(1000, 150000)
+            for month in range(months):
+                mileage += rng.randint(500, 5000)
+                yield id_vehicle, float(mileage), (start + timedelta(days=30 * (month + 1))).strftime("%Y-%m-%d")
+    insert_batched(conn, "INSERT INTO VehicleMileage (id_vehicle, mileage, recorded_on) VALUES (?, ?, ?)", mileage_rows())
+
+    add_users(conn, users)
+    status_events = seed_status_history(conn, start)
+    conn.commit()
+
+    migrations.migrate(conn, migrations.FLEET)
+    # VehicleDailyStats создана до загрузки вместе с RentalPayments, install() её не пересчитывает
+    fleet_revenue.rebuild(conn)
+    conn.commit()
+    conn.close()
+    return {'Vehicles': vehicles, 'Usage': usage_count, 'RentalPayments': payments,
+            'VehicleMileage': mileage_count, 'VehicleStatusEvents': status_events, 'Users': users + 1}
+
+
+# --- Файлы для импорта ---
+
+def write_rooms_excel(path, rooms=500, seed=SEED):
+    """ "Номерной фонд" в Excel: столбцы Этаж / Номер / Категория. """
+    import pandas as pd
+
+    rng = random.Random(seed)
+    rows = [(floor, number, rng.choice(ROOM_CATEGORIES)[0]) for number, floor in room_numbers(rooms)]
+    pd.DataFrame(rows, columns=['Этаж', 'Номер', 'Категория']).to_excel(path, index=False)
+
+
+def write_autopark_txt(path, vehicles=200, seed=SEED):
+    """ Выгрузка "Автопарк" в TXT заказчика: Категория / Марка / Номерной знак. """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as file:
+        file.write("Категория\tМарка\tНомерной знак\n")
+        for number, model, category in generate_vehicles(rng, vehicles):
+            file.write(f"{category}\t{model}\t{number}\n")
+
+
+def write_mileage_txt(path, vehicles=200, seed=SEED):
+    """ Выгрузка "Данные по пробегу" в TXT заказчика; пробег с запятой, как в Excel. """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as file:
+        file.write("Категория\tМарка\tНомерной знак\tПробег\t\n")
+        for number, model, category in generate_vehicles(rng, vehicles):
+            file.write(f"{category}\t{model}\t{number}\t{rng.randint(1000, 250000)},0\t\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=['hotel', 'fleet'], help="Какую базу создать")
+    parser.add_argument('path', help="Файл базы (не должен существовать)")
+    parser.add_argument('--rooms', type=int, default=500, help="Номеров в гостинице")
+    parser.add_argument('--vehicles', type=int, default=200, help="Автомобилей в автопарке")
+    parser.add_argument('--days', type=int, default=365, help="Длина периода истории, дней")
+    parser.add_argument('--seed', type=int, default=SEED, help="Начальное значение генератора")
+    args = parser.parse_args()
+
+    if args.kind == 'hotel':
+        counts = generate_hotel(args.path, rooms=args.rooms, days=args.days, seed=args.seed)
+    else:
+        counts = generate_fleet(args.path, vehicles=args.vehicles, days=args.days, seed=args.seed)
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Атомарная проверка входа пользователя.
+
+Поиск пользователя, подсчёт неудачных попыток, блокировка по неактивности
+и отметка last_login выполняются одним выражением UPDATE ... RETURNING внутри
+транзакции BEGIN IMMEDIATE. Поэтому одновременные входы с разных рабочих мест
+не затирают счётчики друг друга, а на вход уходит одно обращение к базе.
+"""
+from datetime import datetime, timedelta
+
+import db_pool
+
+MAX_FAILED_ATTEMPTS = 3  # После стольких неверных паролей подряд учётная запись блокируется
+INACTIVE_DAYS = 30       # Блокировка, если пользователь не входил дольше этого срока
+
+# Результаты попытки входа
+LOGIN_OK = 'ok'
+LOGIN_NOT_FOUND = 'not_found'
+LOGIN_WRONG_PASSWORD = 'wrong_password'
+LOGIN_LOCKED = 'locked'      # Заблокирован из-за неверных паролей
+LOGIN_INACTIVE = 'inactive'  # Заблокирован из-за долгого отсутствия
+LOGIN_BLOCKED = 'blocked'    # Заблокирован (администратором или ранее)
+
+# Все выражения в SET видят значения строки ДО обновления, а RETURNING - после.
+# last_login хранится как текст 'YYYY-MM-DD HH:MM:SS', поэтому сравнение строк
+# с :cutoff эквивалентно сравнению дат.
+LOGIN_SQL = """
+UPDATE Users SET
+    is_blocked = CASE
+        WHEN is_blocked THEN is_blocked
+        WHEN last_login < :cutoff THEN 1
+        WHEN password = :password THEN 0
+        WHEN COALESCE(failed_attempts, 0) + 1 >= :max_attempts THEN 1
+        ELSE 0
+    END,
+    failed_attempts = CASE
+        WHEN is_blocked OR last_login < :cutoff THEN failed_attempts
+        WHEN password = :password THEN 0
+        ELSE COALESCE(failed_attempts, 0) + 1
+    END,
+    last_login = CASE
+        WHEN is_blocked OR last_login < :cutoff THEN last_login
+        WHEN password = :password THEN :now
+        ELSE last_login
+    END
+WHERE login = :login
+RETURNING id, role, must_change_password, is_blocked, failed_attempts,
+          password = :password, last_login < :cutoff
+"""
+
+
+def authenticate(db_filename, login, password, max_attempts=MAX_FAILED_ATTEMPTS, inactive_days=INACTIVE_DAYS):
+    """
+    Проверяет логин и пароль и сразу обновляет состояние учётной записи.
+    inactive_days=None отключает блокировку по неактивности.
+    Возвращает (статус, (user_id, role, must_change_password) или None).
+    """
+    now = datetime.now()
+    # NULL в :cutoff делает условие "last_login < :cutoff" ложным для всех строк
+    cutoff = (now - timedelta(days=inactive_days)).strftime("%Y-%m-%d %H:%M:%S") if inactive_days is not None else None
+    params = {
+        'login': login,
+        'password': password,
+        'now': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'cutoff': cutoff,
+        'max_attempts': max_attempts,
+    }
+
+    with db_pool.connection(db_filename) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(LOGIN_SQL, params).fetchall()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    if not rows:
+        return LOGIN_NOT_FOUND, None
+
+    user_id, role, must_change_password, is_blocked, failed_attempts, password_ok, inactive = rows[0]
+    if inactive:
+        return LOGIN_INACTIVE, None
+    if is_blocked:
+        if not password_ok and (failed_attempts or 0) >= max_attempts:
+            return LOGIN_LOCKED, None
+        return LOGIN_BLOCKED, None
+    if password_ok:
+        return LOGIN_OK, (user_id, role, must_change_password)
+    return LOGIN_WRONG_PASSWORD, None
@@ -1,6 +1,16 @@
+import itertools
 import sqlite3
-import pandas as pd
 import os
+import sys
+
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import excel_cache
+import excel_stream
+import fleet_import
+import fleet_utilization
+import parallel_import
+import query_stats
 
 # Имя файла базы данных
 db_file = 'autopark.db'
@@ -52,7 +62,7 @@ def create_connection(db_file):
     """ Создает соединение с базой данных SQLite """
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
+        conn = query_stats.connect(db_file)
         # Включаем поддержку внешних ключей (по умолчанию отключена в старых версиях SQLite)
         conn.execute('PRAGMA foreign_keys = ON;')
         print(f"Подключено к базе данных SQLite: {db_file}")
@@ -69,21 +79,29 @@ def create_table(conn, create_table_sql):
     except sqlite3.Error as e:
         print(e)
 
-def import_data_from_excel(conn, excel_path, table_name):
-    """ Импортирует данные из Excel в указанную таблицу """
+def import_data_from_excel(conn, excel_path, table_name, stream=False):
+    """
+    Импортирует данные из Excel в указанную таблицу.
+    stream=True - лист читается пачками (excel_stream) и каждая пачка сразу пишется в базу:
+    для очень больших книг, которые не помещаются в память целиком.
+    """
     if not os.path.exists(excel_path):
         print(f"Ошибка: файл Excel не найден по пути {excel_path}")
         return
 
     try:
-        df = pd.read_excel(excel_path)
-
         # Приводим имена колонок DataFrame для соответствия именам в базе данных
-        # Удаляем пробелы и точки, заменяем пробелы на подчеркивания, приводим к нижнему регистру
-        df.columns = df.columns.str.strip()
-        df.columns = df.columns.str.replace('.', '', regex=False)
-        df.columns = df.columns.str.replace(' ', '_', regex=False)
-        df.columns = df.columns.str.lower()
+        # Удаляем пробелы и точки, заменяем пробелы на подчеркивания, приводим к нижнему регистру.
+        if stream:
+            # Первая пачка нужна для проверки колонок, остальные пишутся по мере чтения листа
+            batches = excel_stream.iter_batches(excel_path, normalize=True)
+            df = next(batches, None)
+            if df is None:
+                print(f"Ошибка: в файле Excel {excel_path} нет данных")
+                return
+        else:
+            # Неизменённая книга берётся из кэша уже с приведёнными именами, без разбора Excel
+            df = excel_cache.read_excel(excel_path, normalize=True)
 
         # Сопоставление имен колонок Excel (в нижнем регистре) с именами колонок БД
         # !!! ВАЖНО: Убедитесь, что эти сопоставления верны для ваших файлов Excel !!!
@@ -127,8 +145,24 @@ def import_data_from_excel(conn, excel_path, table_name):
 
 
         # Запись данных в таблицу
-        df.to_sql(table_name, conn, if_exists='replace', index=False) # Используем 'replace' для простоты при повторных запусках
-        print(f"Данные успешно импортированы из {excel_path} в таблицу {table_name}.")
+        if stream:
+            frames = itertools.chain([df], (batch.rename(columns=column_map) for batch in batches))
+        if table_name == 'Автопарк':
+            # Инкрементальная синхронизация по гос. номеру: схема, ключи и ID автомобилей сохраняются
+            if stream:
+                counts = fleet_import.sync_table_batches(conn, table_name, 'Гос. номер', frames)
+            else:
+                counts = fleet_import.sync_table(conn, table_name, 'Гос. номер', df)
+            print(f"Данные из {excel_path} синхронизированы с таблицей {table_name}: "
+                  f"добавлено {counts['inserted']}, обновлено {counts['updated']}, "
+                  f"удалено {counts['deleted']}, без изменений {counts['unchanged']}.")
+        elif stream:
+            for number, batch in enumerate(frames):
+                batch.to_sql(table_name, conn, if_exists='replace' if number == 0 else 'append', index=False)
+            print(f"Данные успешно импортированы из {excel_path} в таблицу {table_name}.")
+        else:
+            df.to_sql(table_name, conn, if_exists='replace', index=False) # Используем 'replace' для простоты при повторных запусках
+            print(f"Данные успешно импортированы из {excel_path} в таблицу {table_name}.")
 
     except FileNotFoundError:
         print(f"Ошибка: файл Excel не найден по пути {excel_path}")
@@ -184,7 +218,44 @@ def calculate_vehicle_utilization_approximate(conn):
         print(f"Произошла неожиданная ошибка при расчете загрузки: {e}")
 
 
+def calculate_vehicle_utilization(conn, as_of=None, window_days=fleet_utilization.WINDOW_DAYS):
+    """
+    Процент загрузки автомобилей по брифингу: арендованные часы / доступные часы
+    за window_days суток до as_of. Нужны таблицы Vehicles и Usage; если их нет
+    (база только с таблицей Автопарк), используется приближенный расчет по статусу.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN ('Vehicles', 'Usage')")
+    if cur.fetchone()[0] < 2:
+        calculate_vehicle_utilization_approximate(conn)
+        return
+
+    print(f"\n--- Процент загрузки автомобилей за {window_days} дн. (по таблице Usage) ---")
+    by_vehicle, by_category = fleet_utilization.utilization(conn, as_of, window_days)
+    print("Гос. номер | Часов в аренде | Процент загрузки (%)")
+    print("----------|----------------|---------------------")
+    for _, gos_number, _, _, rented_hours, _, utilization_percentage, _ in by_vehicle:
+        print(f"{gos_number:<10}| {rented_hours:<15.1f}| {utilization_percentage:.2f}")
+    for category, vehicles_count, _, _, utilization_percentage in by_category:
+        print(f"Категория {category} ({vehicles_count} авт.): {utilization_percentage:.2f}%")
+
+
+def import_all_documents():
+    """ Все документы заказчика сразу: разбор в параллельных процессах, запись в Vehicles / VehicleMileage / FleetStatusReport. """
+    paths = parallel_import.find_documents('Документы заказчика')
+    counts, errors = parallel_import.import_documents(db_file, paths)
+    for path in paths:
+        if path in errors:
+            print(f"Ошибка при импорте {os.path.basename(path)}:\n{errors[path]}")
+        else:
+            print(f"{os.path.basename(path)}: импортировано строк {counts.get(path, 0)}")
+
 def main():
+    if '--parallel' in sys.argv:
+        # python 1.py --parallel - импорт всех документов заказчика одновременно
+        import_all_documents()
+        return
+
     # Создаем или подключаемся к базе данных
     conn = create_connection(db_file)
 
@@ -197,7 +268,8 @@ def main():
 
         # Импортируем данные из Excel в таблицу Автопарк
         # Убедитесь, что файл "Автопарк.xlsx" находится в папке "Документы заказчика"
-        import_data_from_excel(conn, excel_file_autopark, 'Автопарк')
+        # python 1.py --stream - потоковое чтение листа для очень больших книг
+        import_data_from_excel(conn, excel_file_autopark, 'Автопарк', stream='--stream' in sys.argv)
 
         # !!! ВАЖНО !!!
         # Если у вас есть данные для таблиц Данные_по_пробегу и Отчет_по_автопарку
@@ -207,8 +279,8 @@ def main():
         # import_data_from_excel(conn, excel_file_report, 'Отчет_по_автопарку')
         # Импорт для таблицы Аренда удален
 
-        # Вычисляем приближенный процент загрузки автомобилей
-        calculate_vehicle_utilization_approximate(conn)
+        # Вычисляем процент загрузки автомобилей (приближенно, если нет истории аренд)
+        calculate_vehicle_utilization(conn)
 
         # Закрываем соединение
         conn.close()
@@ -1,89 +1,108 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 import sqlite3
 from datetime import datetime, timedelta
 import os
+import sys
+
+# Общие модули (db_pool и др.) лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import change_watch
+import db_pool
+import db_worker
+import fleet_revenue
+import fleet_status_history
+import fleet_utilization
+import gui_widgets
+import migrations
+import query_stats
+import report_export
+import user_auth
 
 DB_FILENAME = 'autopark.db'
+UTILIZATION_WINDOW_DAYS = 30 # Окно расчёта процента загрузки, суток до текущего момента
+REVENUE_PERIOD_DAYS = 30 # Период расчёта среднего дохода, суток до текущей даты включительно
 
 # --- Функции для работы с базой данных Users ---
 def get_user(login):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
-    user = cursor.fetchone()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, password, role, is_blocked, failed_attempts, last_login, must_change_password FROM Users WHERE login=?", (login,))
+        user = cursor.fetchone()
     return user
 
 def update_user(user_id, **kwargs):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    for key, value in kwargs.items():
-        cursor.execute(f"UPDATE Users SET {key}=? WHERE id=?", (value, user_id))
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        for key, value in kwargs.items():
+            cursor.execute(f"UPDATE Users SET {key}=? WHERE id=?", (value, user_id))
+        conn.commit()
 
 def add_user(login, password, role):
     if get_user(login):
         return False, "Пользователь с таким логином уже существует"
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, ?, ?)",
-        (login, password, role, 1, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    )
-    conn.commit()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Users (login, password, role, must_change_password, last_login) VALUES (?, ?, ?, ?, ?)",
+            (login, password, role, 1, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+        conn.commit()
     return True, "Пользователь успешно добавлен"
 
 # --- Функции для работы с базой данных Vehicles ---
 def get_vehicles_info():
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id_vehicle, vehicle_number, model, category, status, total_hours
-        FROM Vehicles
-        ORDER BY vehicle_number
-    """)
-    vehicles = cursor.fetchall()
-    conn.close()
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id_vehicle, vehicle_number, model, category, status, total_hours
+            FROM Vehicles
+            ORDER BY vehicle_number
+        """)
+        vehicles = cursor.fetchall()
     return vehicles
 
 def update_vehicle_status(vehicle_id, new_status):
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE Vehicles SET status=? WHERE id_vehicle=?", (new_status, vehicle_id))
-        conn.commit()
-        return True, "Статус автомобиля успешно обновлен"
-    except sqlite3.Error as e:
-        conn.rollback()
-        return False, f"Ошибка при обновлении статуса: {e}"
-    finally:
-        conn.close()
-
-def calculate_vehicle_usage():
-    conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    
-    # Получаем общую статистику использования
-    cursor.execute("""
-        SELECT 
-            v.vehicle_number,
-            v.model,
-            v.total_hours,
-            COUNT(u.id_usage) as usage_count,
-            SUM(strftime('%s', COALESCE(u.end_time, datetime('now'))) - strftime('%s', u.start_time)) / 3600.0 as total_hours_used
-        FROM Vehicles v
-        LEFT JOIN Usage u ON v.id_vehicle = u.id_vehicle
-        GROUP BY v.id_vehicle
-    """)
-    usage_stats = cursor.fetchall()
-    
-    conn.close()
-    return usage_stats
+    with db_pool.connection(DB_FILENAME) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE Vehicles SET status=? WHERE id_vehicle=?", (new_status, vehicle_id))
+            conn.commit()
+            return True, "Статус автомобиля успешно обновлен"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Ошибка при обновлении статуса: {e}"
+
+def calculate_vehicle_usage(as_of=None, window_days=UTILIZATION_WINDOW_DAYS):
+    """ Процент загрузки по автомобилям и категориям за window_days суток до as_of (None - сейчас). """
+    with db_pool.connection(DB_FILENAME) as conn:
+        # Арендованные часы / доступные часы, интервалы Usage обрезаются по окну
+        by_vehicle, by_category = fleet_utilization.utilization(conn, as_of, window_days)
+
+    return by_vehicle, by_category
+
+def calculate_vehicle_revenue(as_of=None, period_days=REVENUE_PERIOD_DAYS):
+    """ Средний доход в рабочий день по автомобилям за period_days суток до as_of (None - сегодня). """
+    as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+    with db_pool.connection(DB_FILENAME) as conn:
+        # Считается по суточной сводке VehicleDailyStats, оплаты заново не просматриваются
+        by_vehicle, total = fleet_revenue.average_revenue_as_of(conn, as_of, period_days)
+
+    return by_vehicle, total
 
 # --- GUI функции ---
+def load_live(window, tables, key, query, fill):
+    """
+    Заполняет окно результатом query() в фоне и перезапрашивает его при каждом
+    изменении таблиц tables, пока окно открыто.
+    """
+    def load(loading_text):
+        worker.submit(query, on_done=fill, on_error=lambda e: show_query_error(window, e),
+                      key=(key, str(window)), loading_parent=window, loading_text=loading_text)
+
+    load(db_worker.LOADING_TEXT)
+    watcher.watch_window(window, tables, lambda changed: load(None))
+
 def show_vehicles_list_window():
     vehicles_win = tk.Toplevel(root)
     vehicles_win.title("Список автомобилей")
@@ -98,10 +117,13 @@ def show_vehicles_list_window():
         tree.heading(col, text=col)
         tree.column(col, width=100)
     
-    # Добавляем данные
-    vehicles = get_vehicles_info()
-    for vehicle in vehicles:
-        tree.insert('', 'end', values=vehicle[1:])
+    # Добавляем данные, когда запрос выполнится в фоне; при изменениях
+    # в Vehicles меняются только строки изменившихся автомобилей
+    shown = {}
+    def fill(vehicles):
+        gui_widgets.sync_tree(tree, shown, vehicles, lambda vehicle: vehicle[0], lambda vehicle: vehicle[1:])
+    
+    load_live(vehicles_win, ('Vehicles',), 'vehicles', get_vehicles_info, fill)
     
     # Добавляем скроллбар
     scrollbar = ttk.Scrollbar(vehicles_win, orient=tk.VERTICAL, command=tree.yview)
@@ -113,11 +135,11 @@ def show_vehicles_list_window():
 
 def show_usage_stats_window():
     stats_win = tk.Toplevel(root)
-    stats_win.title("Статистика использования")
-    stats_win.geometry("600x400")
+    stats_win.title(f"Статистика использования за {UTILIZATION_WINDOW_DAYS} дн.")
+    stats_win.geometry("700x500")
     
-    # Создаем таблицу
-    columns = ('Номер', 'Модель', 'Всего часов', 'Количество использований', 'Процент загрузки')
+    # Создаем таблицу по автомобилям
+    columns = ('Номер', 'Модель', 'Категория', 'Часов в аренде', 'Количество использований', 'Процент загрузки')
     tree = ttk.Treeview(stats_win, columns=columns, show='headings')
     
     # Настраиваем заголовки
@@ -125,31 +147,180 @@ def show_usage_stats_window():
         tree.heading(col, text=col)
         tree.column(col, width=100)
     
-    # Добавляем данные
-    usage_stats = calculate_vehicle_usage()
-    for stat in usage_stats:
-        total_hours = stat[3] * 24  # Предполагаем, что каждый день использования = 24 часа
-        usage_percent = (stat[4] / total_hours * 100) if total_hours > 0 else 0
-        tree.insert('', 'end', values=(
-            stat[0],  # Номер
-            stat[1],  # Модель
-            f"{stat[2]:.1f}",  # Всего часов
-            stat[3],  # Количество использований
-            f"{usage_percent:.1f}%"  # Процент загрузки
+    # Итоги по категориям
+    category_columns = ('Категория', 'Автомобилей', 'Часов в аренде', 'Доступно часов', 'Процент загрузки')
+    category_tree = ttk.Treeview(stats_win, columns=category_columns, show='headings', height=5)
+    for col in category_columns:
+        category_tree.heading(col, text=col)
+        category_tree.column(col, width=100)
+    
+    # Добавляем данные, когда расчёт выполнится в фоне; пересчёт при изменении
+    # автомобилей или аренд меняет только строки с другими значениями
+    shown, category_shown = {}, {}
+    def fill(result):
+        usage_stats, category_stats = result
+        gui_widgets.sync_tree(tree, shown, usage_stats, lambda row: row[0], lambda row: (
+            row[1],
+            row[2],
+            row[3],
+            f"{row[4]:.1f}",
+            row[7],
+            f"{row[6]:.1f}%"
         ))
+        gui_widgets.sync_tree(category_tree, category_shown, category_stats, lambda row: row[0], lambda row: (
+            row[0],
+            row[1],
+            f"{row[2]:.1f}",
+            f"{row[3]:.1f}",
+            f"{row[4]:.1f}%"
+        ))
+    
+    load_live(stats_win, ('Vehicles', 'Usage'), 'usage_stats', calculate_vehicle_usage, fill)
+    
+    def export_utilization(path):
+        with db_pool.connection(DB_FILENAME) as conn:
+            report_export.export_utilization(conn, None, path, UTILIZATION_WINDOW_DAYS)
+    
+    def export_usage_history(path):
+        with db_pool.connection(DB_FILENAME) as conn:
+            report_export.export_usage_history(conn, path)
+    
+    buttons = tk.Frame(stats_win)
+    buttons.pack(side=tk.BOTTOM, fill='x')
+    tk.Button(buttons, text="Сохранить в Excel", command=lambda: save_report(
+        stats_win, f"Загрузка автопарка на {datetime.now().strftime('%d.%m.%Y')}", export_utilization
+    )).pack(side=tk.LEFT, padx=5, pady=5)
+    tk.Button(buttons, text="История аренд", command=lambda: save_report(
+        stats_win, "История аренд", export_usage_history
+    )).pack(side=tk.LEFT, padx=5, pady=5)
     
     # Добавляем скроллбар
     scrollbar = ttk.Scrollbar(stats_win, orient=tk.VERTICAL, command=tree.yview)
     tree.configure(yscrollcommand=scrollbar.set)
     
+    # Размещаем элементы
+    category_tree.pack(side=tk.BOTTOM, fill=tk.X)
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+def show_revenue_stats_window():
+    revenue_win = tk.Toplevel(root)
+    revenue_win.title(f"Средний доход за {REVENUE_PERIOD_DAYS} дн.")
+    revenue_win.geometry("600x400")
+    
+    # Создаем таблицу
+    columns = ('Номер', 'Модель', 'Доход', 'Рабочих дней', 'Доход в день')
+    tree = ttk.Treeview(revenue_win, columns=columns, show='headings')
+    
+    # Настраиваем заголовки
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=100)
+    
+    total_label = tk.Label(revenue_win)
+    total_label.pack(side=tk.BOTTOM, pady=5)
+    
+    # Добавляем данные, когда расчёт выполнится в фоне; обновляются при новых оплатах и арендах
+    shown = {}
+    def fill(result):
+        by_vehicle, (total_revenue, total_days, total_per_day) = result
+        gui_widgets.sync_tree(tree, shown, by_vehicle, lambda row: row[0],
+                              lambda row: (row[1], row[2], f"{row[4]:.2f}", row[5], f"{row[6]:.2f}"))
+        total_label.config(text=f"По автопарку: доход {total_revenue:.2f}, автомобиле-дней {total_days}, "
+                                f"в среднем {total_per_day:.2f} в день")
+    
+    load_live(revenue_win, ('Vehicles', 'Usage', 'RentalPayments'), 'revenue_stats', calculate_vehicle_revenue, fill)
+    
+    # Добавляем скроллбар
+    scrollbar = ttk.Scrollbar(revenue_win, orient=tk.VERTICAL, command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+    
     # Размещаем элементы
     tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+def show_status_report_window():
+    report_date = simpledialog.askstring("Отчет по автопарку", "Дата отчета (ДД.ММ.ГГГГ):",
+                                         initialvalue=datetime.now().strftime("%d.%m.%Y"), parent=root)
+    if not report_date:
+        return
+    try:
+        report_date = datetime.strptime(report_date.strip(), "%d.%m.%Y")
+    except ValueError:
+        messagebox.showerror("Ошибка", "Дата должна быть в формате ДД.ММ.ГГГГ")
+        return
+    
+    report_win = tk.Toplevel(root)
+    report_win.title(f"Отчет по автопарку на {report_date.strftime('%d.%m.%Y')}")
+    report_win.geometry("600x400")
+    
+    def build():
+        with db_pool.connection(DB_FILENAME) as conn:
+            # Ближайшая контрольная точка + события журнала после неё
+            return fleet_status_history.build_report(conn, report_date)
+    
+    def fill(lines):
+        text_widget.insert(tk.END, '\n'.join(lines))
+        text_widget.config(state="disabled")
+    
+    worker.submit(build, on_done=fill, on_error=lambda e: show_query_error(report_win, e),
+                  key='status_report', loading_parent=report_win)
+    
+    def export(path):
+        with db_pool.connection(DB_FILENAME) as conn:
+            report_export.export_status_report(conn, report_date, path)
+    
+    tk.Button(report_win, text="Сохранить в Excel", command=lambda: save_report(
+        report_win, f"Отчет по автопарку на {report_date.strftime('%d.%m.%Y')}", export
+    )).pack(side=tk.BOTTOM, pady=5)
+    
+    text_widget = tk.Text(report_win, wrap="none")
+    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
+
+def save_report(window, name, export):
+    """ Спрашивает файл (XLSX или CSV) и выгружает в него отчёт export(path) в фоне. """
+    path = filedialog.asksaveasfilename(parent=window, initialfile=f"{name}.xlsx", defaultextension=".xlsx",
+                                        filetypes=[("Книга Excel", "*.xlsx"), ("CSV", "*.csv")])
+    if not path:
+        return
+    worker.submit(export, path,
+                  on_done=lambda _: messagebox.showinfo("Отчет", f"Отчет сохранен в {path}", parent=window),
+                  on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось сохранить отчет: {e}", parent=window),
+                  key=('save_report', path), loading_parent=window, loading_text="Сохранение...")
+
+def show_query_error(window, error):
+    """ Сообщение об ошибке фонового запроса поверх окна, для которого он выполнялся. """
+    messagebox.showerror("Ошибка", f"Ошибка при загрузке данных: {error}", parent=window)
+
+def show_query_stats_window():
+    """ Сводка замеров SQL-запросов (query_stats); сбор включается переменной QUERY_STATS=1. """
+    stats_win = tk.Toplevel(root)
+    stats_win.title("Статистика запросов")
+    stats_win.geometry("800x500")
+    
+    text_widget = tk.Text(stats_win, wrap="none")
+    
+    def refresh():
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert(tk.END, '\n'.join(query_stats.summary_lines()))
+        text_widget.config(state="disabled")
+    
+    def reset():
+        query_stats.reset()
+        refresh()
+    
+    buttons = tk.Frame(stats_win)
+    buttons.pack(side=tk.BOTTOM, fill='x')
+    tk.Button(buttons, text="Обновить", command=refresh).pack(side=tk.LEFT, padx=5, pady=5)
+    tk.Button(buttons, text="Сбросить", command=reset).pack(side=tk.LEFT, padx=5, pady=5)
+    text_widget.pack(expand=True, fill="both", padx=10, pady=10)
+    refresh()
+
 def show_admin_panel_window():
     admin_win = tk.Toplevel(root)
     admin_win.title("Админ-панель")
-    admin_win.geometry("300x250")
+    admin_win.geometry("300x370")
     
     tk.Label(admin_win, text="Выберите действие:").pack(pady=10)
     
@@ -157,8 +328,14 @@ def show_admin_panel_window():
               command=show_vehicles_list_window).pack(pady=5, padx=20, fill='x')
     tk.Button(admin_win, text="Статистика использования", 
               command=show_usage_stats_window).pack(pady=5, padx=20, fill='x')
+    tk.Button(admin_win, text="Средний доход", 
+              command=show_revenue_stats_window).pack(pady=5, padx=20, fill='x')
+    tk.Button(admin_win, text="Отчет по автопарку на дату", 
+              command=show_status_report_window).pack(pady=5, padx=20, fill='x')
     tk.Button(admin_win, text="Добавить пользователя", 
               command=add_user_action).pack(pady=5, padx=20, fill='x')
+    tk.Button(admin_win, text="Статистика запросов", 
+              command=show_query_stats_window).pack(pady=5, padx=20, fill='x')
 
 def add_user_action():
     add_win = tk.Toplevel(root)
@@ -204,28 +381,23 @@ def login_action():
         messagebox.showerror("Ошибка", "Введите логин и пароль")
         return
     
-    user = get_user(login)
-    if not user:
+    # Проверка пароля и обновление счётчиков одной транзакцией (без блокировки по неактивности),
+    # в фоновом потоке, чтобы окно входа не замирало
+    login_button.config(state=tk.DISABLED)
+    worker.submit(user_auth.authenticate, DB_FILENAME, login, password, inactive_days=None,
+                  on_done=on_login_checked, on_error=on_login_error, key='login')
+
+def on_login_checked(result):
+    login_button.config(state=tk.NORMAL)
+    status, user = result
+    if status in (user_auth.LOGIN_NOT_FOUND, user_auth.LOGIN_WRONG_PASSWORD):
         messagebox.showerror("Ошибка", "Неверный логин или пароль")
         return
-    
-    user_id, db_password, role, is_blocked, failed_attempts, last_login, must_change_password = user
-    
-    if is_blocked:
+    if status != user_auth.LOGIN_OK:
         messagebox.showerror("Ошибка", "Аккаунт заблокирован")
         return
     
-    if password != db_password:
-        failed_attempts += 1
-        if failed_attempts >= 3:
-            update_user(user_id, is_blocked=1)
-            messagebox.showerror("Ошибка", "Аккаунт заблокирован")
-        else:
-            update_user(user_id, failed_attempts=failed_attempts)
-            messagebox.showerror("Ошибка", "Неверный логин или пароль")
-        return
-    
-    update_user(user_id, failed_attempts=0, last_login=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    user_id, role, must_change_password = user
     
     if must_change_password:
         show_change_password(user_id)
@@ -234,6 +406,10 @@ def login_action():
     else:
         messagebox.showinfo("Успех", "Вход выполнен успешно")
 
+def on_login_error(error):
+    login_button.config(state=tk.NORMAL)
+    messagebox.showerror("Ошибка", f"Ошибка при входе: {error}")
+
 def show_change_password(user_id):
     win = tk.Toplevel(root)
     win.title("Смена пароля")
@@ -260,31 +436,52 @@ def show_change_password(user_id):
     
     tk.Button(win, text="Изменить пароль", command=do_change).pack(pady=10)
 
+def checkpoint_status_history():
+    """ Контрольная точка журнала статусов, если после прошлой накопилось достаточно событий. """
+    with db_pool.connection(DB_FILENAME) as conn:
+        return fleet_status_history.maybe_checkpoint(conn)
+
+def on_closing():
+    if messagebox.askokcancel("Выход", "Вы уверены, что хотите выйти?"):
+        watcher.close()
+        worker.shutdown()
+        checkpoint_status_history()
+        root.destroy()
+
 # --- Основное окно ---
-root = tk.Tk()
-root.title("Автопарк - Авторизация")
-root.geometry("300x150")
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Автопарк - Авторизация")
+    root.geometry("300x150")
+    # Запросы из обработчиков кнопок выполняются вне главного потока
+    worker = db_worker.DbWorker(root)
 
-# Центрируем окно
-screen_width = root.winfo_screenwidth()
-screen_height = root.winfo_screenheight()
-x = (screen_width - 300) // 2
-y = (screen_height - 150) // 2
-root.geometry(f"300x150+{x}+{y}")
+    # Схема базы: таблицы, индексы, сводка дохода, журнал статусов и счётчики изменений
+    migrations.ensure_schema(DB_FILENAME, migrations.FLEET)
+    checkpoint_status_history()
+    # Окна автопарка обновляются сами при изменении данных
+    watcher = change_watch.ChangeWatcher(root, DB_FILENAME)
+    # Изменения автопарка (в том числе с других рабочих мест) пополняют журнал статусов
+    watcher.subscribe(('Vehicles',), lambda tables: worker.submit(
+        checkpoint_status_history, key='status_checkpoint', loading_text=None))
 
-tk.Label(root, text="Логин:").pack(pady=5)
-entry_login = tk.Entry(root)
-entry_login.pack(pady=5)
+    # Центрируем окно
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x = (screen_width - 300) // 2
+    y = (screen_height - 150) // 2
+    root.geometry(f"300x150+{x}+{y}")
 
-tk.Label(root, text="Пароль:").pack(pady=5)
-entry_password = tk.Entry(root, show="*")
-entry_password.pack(pady=5)
+    tk.Label(root, text="Логин:").pack(pady=5)
+    entry_login = tk.Entry(root)
+    entry_login.pack(pady=5)
 
-tk.Button(root, text="Войти", command=login_action).pack(pady=10)
+    tk.Label(root, text="Пароль:").pack(pady=5)
+    entry_password = tk.Entry(root, show="*")
+    entry_password.pack(pady=5)
 
-def on_closing():
-    if messagebox.askokcancel("Выход", "Вы уверены, что хотите выйти?"):
-        root.destroy()
+    login_button = tk.Button(root, text="Войти", command=login_action)
+    login_button.pack(pady=10)
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop() 
\ No newline at end of file
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop() 
\ No newline at end of file
@@ -1,6 +1,14 @@
 import sqlite3
+import os
+import sys
+
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import occupancy
 
 conn = sqlite3.connect('hotel.db')
+# Триггеры должны появиться до вставки бронирований, чтобы ночи учлись сразу
+occupancy.install(conn)
 cursor = conn.cursor()
 
 # Добавим гостя
@@ -22,26 +30,8 @@ cursor.executemany(
 )
 conn.commit()
 
-# Количество номеров
-cursor.execute("SELECT COUNT(*) FROM Rooms")
-room_count = cursor.fetchone()[0]
-
-# Количество проданных ночей в марте 2025
-cursor.execute('''
-    SELECT SUM(
-        JULIANDAY(
-            MIN(check_out, '2025-03-31')
-        ) - JULIANDAY(
-            MAX(check_in, '2025-03-01')
-        )
-    )
-    FROM Bookings
-    WHERE check_in < '2025-03-31' AND check_out > '2025-03-01'
-''')
-sold_nights = cursor.fetchone()[0] or 0
-
-days_in_march = 31
-occupancy = (sold_nights / (room_count * days_in_march)) * 100 if room_count > 0 else 0
+# Загрузка за март 2025: [01.03, 01.04) - 31 ночь
+occupancy_percent = occupancy.occupancy_percent(conn, '2025-03-01', '2025-04-01')
 
-print(f"Процент загрузки номерного фонда за март 2025: {occupancy:.2f}%")
-conn.close() 
\ No newline at end of file
+print(f"Процент загрузки номерного фонда за март 2025: {occupancy_percent:.2f}%")
+conn.close()
\ No newline at end of file
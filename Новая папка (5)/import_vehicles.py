@@ -1,39 +1,42 @@
 import sqlite3
-from datetime import datetime
+import os
+import sys
+
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fleet_txt_import
 
 DB_FILENAME = 'autopark.db'
+DOCS_SUBFOLDER = 'Документы заказчика'
+# Выгрузки заказчика в порядке импорта: сначала справочник автомобилей
+TXT_FILES = ['Автопарк.txt', 'Данные по пробегу.txt', 'Отчет по автопарку на дату.txt']
+
+def find_file(filename):
+    """ Ищет файл в текущей папке, затем в папке с документами заказчика. """
+    for path in (filename, os.path.join(DOCS_SUBFOLDER, filename)):
+        if os.path.exists(path):
+            return path
+    return None
 
 def import_vehicles_from_txt():
     conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    
+
     try:
-        with open('Автопарк.txt', 'r', encoding='utf-8') as file:
-            # Пропускаем заголовок
-            next(file)
-            
-            # Читаем и импортируем данные
-            for line in file:
-                number, model, category = line.strip().split(',')
-                try:
-                    cursor.execute('''
-                    INSERT INTO Vehicles (vehicle_number, model, category)
-                    VALUES (?, ?, ?)
-                    ''', (number, model, category))
-                except sqlite3.IntegrityError:
-                    print(f"Автомобиль с номером {number} уже существует")
-                except Exception as e:
-                    print(f"Ошибка при импорте автомобиля {number}: {e}")
-        
-        conn.commit()
+        for filename in TXT_FILES:
+            path = find_file(filename)
+            if path is None:
+                print(f"Файл {filename} не найден")
+                continue
+            # Файл читается потоково, пачками по fleet_txt_import.BATCH_SIZE строк
+            count = fleet_txt_import.import_txt(conn, path)
+            print(f"{filename}: импортировано строк: {count}")
+
         print("Импорт данных успешно завершен")
-        
-    except FileNotFoundError:
-        print("Файл Автопарк.txt не найден")
+
     except Exception as e:
         print(f"Произошла ошибка при импорте: {e}")
     finally:
         conn.close()
 
 if __name__ == "__main__":
-    import_vehicles_from_txt() 
\ No newline at end of file
+    import_vehicles_from_txt()
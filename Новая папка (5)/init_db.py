@@ -143,50 +143,23 @@ def show_admin_panel_window():
 #         # ... показать рабочий стол пользователя
 
 import sqlite3
+import os
+import sys
 from datetime import datetime
 
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import migrations
+import query_stats
+
 DB_FILENAME = 'autopark.db'
 
 def init_database():
-    conn = sqlite3.connect(DB_FILENAME)
+    conn = query_stats.connect(DB_FILENAME)
     cursor = conn.cursor()
     
-    # Создаем таблицу Users
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        login TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL,
-        is_blocked INTEGER DEFAULT 0,
-        failed_attempts INTEGER DEFAULT 0,
-        last_login TEXT,
-        must_change_password INTEGER DEFAULT 0
-    )
-    ''')
-    
-    # Создаем таблицу Vehicles
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Vehicles (
-        id_vehicle INTEGER PRIMARY KEY AUTOINCREMENT,
-        vehicle_number TEXT UNIQUE NOT NULL,
-        model TEXT NOT NULL,
-        category TEXT NOT NULL,
-        status TEXT DEFAULT 'Свободен',
-        total_hours REAL DEFAULT 0
-    )
-    ''')
-    
-    # Создаем таблицу Usage для отслеживания использования
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Usage (
-        id_usage INTEGER PRIMARY KEY AUTOINCREMENT,
-        id_vehicle INTEGER,
-        start_time TEXT NOT NULL,
-        end_time TEXT,
-        FOREIGN KEY (id_vehicle) REFERENCES Vehicles (id_vehicle)
-    )
-    ''')
+    # Таблицы, индексы, оплаты и сводка дохода, журнал статусов - через миграции схемы
+    migrations.migrate(conn, migrations.FLEET)
     
     # Проверяем, существует ли администратор
     cursor.execute("SELECT id FROM Users WHERE login='admin'")
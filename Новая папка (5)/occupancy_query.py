@@ -1,32 +1,22 @@
 import sqlite3
+import os
+import sys
+
+# Общие модули лежат в корне проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import occupancy
+
+# Период [начало, конец): конец не включается, в марте 31 ночь
+DATE_FROM = '2025-03-01'
+DATE_TO = '2025-04-01'
 
 conn = sqlite3.connect('hotel.db')
-cursor = conn.cursor()
+occupancy.install(conn)
 
-query = '''
-SELECT
-    ROUND(
-        (
-            (
-                SELECT SUM(
-                    JULIANDAY(
-                        MIN(check_out, '2025-03-31')
-                    ) - JULIANDAY(
-                        MAX(check_in, '2025-03-01')
-                    )
-                )
-                FROM Bookings
-                WHERE check_in < '2025-03-31' AND check_out > '2025-03-01'
-            )
-        ) * 100.0 /
-        (
-            (SELECT COUNT(*) FROM Rooms) * 31
-        )
-    , 2) AS occupancy_percent
-;'''
+result = occupancy.occupancy_percent(conn, DATE_FROM, DATE_TO)
+print(f"Процент загрузки номерного фонда за март 2025: {result}%")
 
-cursor.execute(query)
-result = cursor.fetchone()[0]
-print(f"Процент загрузки номерного фонда за март 2025: {result if result is not None else 0}%")
+for name, nights, rooms, percent in occupancy.occupancy(conn, DATE_FROM, DATE_TO, by=occupancy.BY_CATEGORY):
+    print(f"  {name}: {nights} ночей, номеров: {rooms}, загрузка {percent}%")
 conn.close()
-input("Нажмите Enter для выхода...") 
\ No newline at end of file
+input("Нажмите Enter для выхода...")
\ No newline at end of file